@@ -18,6 +18,7 @@ from chatsky.core import (
     MISC,
     PRE_RESPONSE,
     PRE_TRANSITION,
+    PREFETCH,
     BaseCondition,
     AnyCondition,
     BaseResponse,
@@ -5,12 +5,12 @@ This module provides LLM-based conditions.
 """
 
 from pydantic import Field
-from typing import Optional
+from typing import List, Optional
 
 from chatsky.core import BaseCondition, Context
 from chatsky.core.script_function import AnyResponse
 from chatsky.llm.methods import BaseMethod
-from chatsky.llm.langchain_context import get_langchain_context
+from chatsky.llm.langchain_context import get_langchain_context, get_history_prefetch_hints
 from chatsky.llm.filters import BaseHistoryFilter, DefaultFilter
 from chatsky.llm.prompt import PositionConfig, Prompt
 
@@ -56,6 +56,9 @@ class LLMCondition(BaseCondition):
     Method that takes model's output and returns boolean.
     """
 
+    def get_prefetch_hints(self) -> List[str]:
+        return get_history_prefetch_hints(self.history)
+
     async def call(self, ctx: Context) -> bool:
         model = ctx.pipeline.models[self.llm_model_name]
 
@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 
-from .database import DBContextStorage, context_storage_factory
+from .database import DBContextStorage, ConcurrentModificationError, context_storage_factory
+from .retention import RetentionPolicy, RetentionStats
+from .subscripts import AdaptiveSubscriptPolicy, SubscriptStats
 from .file import JSONContextStorage, PickleContextStorage, ShelveContextStorage, json_available, pickle_available
+from .log import LogContextStorage, log_available
 from .sql import SQLContextStorage, postgres_available, mysql_available, sqlite_available, sqlalchemy_available
 from .ydb import YDBContextStorage, ydb_available
 from .redis import RedisContextStorage, redis_available
-from .memory import MemoryContextStorage
+from .memory import MemoryContextStorage, MemoryStats
+from .cached import CachedContextStorage
+from .sharded import ShardedContextStorage
 from .mongo import MongoContextStorage, mongo_available
 from .protocol import PROTOCOLS, get_protocol_install_suggestion
+from .migrate import ContextRecord, MigrationStats, migrate
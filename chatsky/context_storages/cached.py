@@ -0,0 +1,491 @@
+"""
+Cached
+------
+The Cached module provides a caching wrapper for any :py:class:`.DBContextStorage`.
+
+The wrapper keeps the recently used contexts in process memory and serves reads from there,
+while all the writes are passed through to the wrapped storage.
+With sticky routing (all the requests of a dialog handled by the same worker),
+the wrapped storage receives almost only writes, that reduces its load significantly.
+"""
+
+from asyncio import Lock
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from logging import getLogger
+from time import monotonic
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
+from weakref import WeakValueDictionary
+
+from chatsky.core.ctx_utils import ContextMainInfo
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import DBContextStorage, _CONTEXT_BUNDLE, _CONTEXT_UPDATE, NameConfig
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
+
+logger = getLogger(__name__)
+
+_UNKNOWN = object()
+"""
+Marker for main context information that is not cached yet.
+"""
+
+
+@dataclass
+class _CachedField:
+    """
+    Cached data of one context field.
+    """
+
+    keys: Optional[Set[int]] = None
+    """
+    All the keys of the field, `None` if they are not known.
+    """
+    values: Dict[int, bytes] = field(default_factory=dict)
+    """
+    Serialized values of some of the field keys.
+    """
+
+
+@dataclass
+class _CachedContext:
+    """
+    Cached data of one context.
+    """
+
+    created_at: float
+    main: Any = _UNKNOWN
+    fields: Dict[str, _CachedField] = field(
+        default_factory=lambda: {f: _CachedField() for f in NameConfig.get_turns_fields}
+    )
+    size: int = 0
+
+
+class CachedContextStorage(DBContextStorage):
+    """
+    Implements :py:class:`.DBContextStorage` as a read-through and write-through cache over another storage.
+
+    Main context information is cached in its serialized form and turn items are cached as bytes,
+    so that the loaded contexts can not modify the cache.
+    The least recently used contexts are evicted once either `max_contexts` or `max_bytes` is exceeded,
+    only turn values and serialized `misc` and `framework_data` are accounted as the context size.
+    Every cached context expires after `ttl` seconds, that limits staleness if the wrapped storage
+    is also modified by other processes.
+
+    Subscripts are shared with the wrapped storage.
+    Expired contexts swept through the wrapper are also evicted from cache,
+    while native expiration (if supported) should be configured in the wrapped storage retention policy.
+    Numbers of cache hits and misses are counted in `hits` and `misses` attributes.
+
+    :param backend: Context storage to wrap.
+    :param max_contexts: Maximum number of contexts kept in cache.
+    :param max_bytes: Maximum total size of the cached data in bytes, `None` for no limit.
+    :param ttl: Time (in seconds) for cached contexts to expire, `None` for no expiration.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    """
+
+    is_concurrent: bool = True
+
+    def __init__(
+        self,
+        backend: DBContextStorage,
+        max_contexts: int = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+    ):
+        DBContextStorage.__init__(
+            self,
+            backend.full_path,
+            backend.rewrite_existing,
+            compression=compression,
+            serialization=serialization,
+            retention=retention,
+            subscript_policy=subscript_policy,
+        )
+        if max_contexts < 1:
+            raise ValueError(f"Invalid max contexts value: {max_contexts}")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"Invalid max bytes value: {max_bytes}")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Invalid TTL value: {ttl}")
+
+        self.backend = backend
+        self.max_contexts = max_contexts
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._subscripts = backend._subscripts
+
+        self._cache: OrderedDict[str, _CachedContext] = OrderedDict()
+        self._cache_size = 0
+        self._epoch = 0
+        self._context_locks: WeakValueDictionary[str, Lock] = WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    async def _connect(self):
+        if not self.backend.connected:
+            await self.backend.connect()
+
+    def _context_lock(self, ctx_id: str) -> Lock:
+        """
+        Get lock for the given context, that prevents concurrent updates from being overwritten
+        by the data loaded from the wrapped storage.
+        """
+
+        lock = self._context_locks.get(ctx_id, None)
+        if lock is None:
+            lock = self._context_locks[ctx_id] = Lock()
+        return lock
+
+    @asynccontextmanager
+    async def _context_locks_many(self, ctx_ids: Iterable[str]) -> AsyncIterator[None]:
+        """
+        Acquire locks for several contexts, in a sorted order to avoid deadlocks.
+        """
+
+        async with AsyncExitStack() as stack:
+            for ctx_id in sorted(set(ctx_ids)):
+                await stack.enter_async_context(self._context_lock(ctx_id))
+            yield
+
+    def _get(self, ctx_id: str) -> Optional[_CachedContext]:
+        entry = self._cache.get(ctx_id, None)
+        if entry is None:
+            return None
+        if self.ttl is not None and monotonic() - entry.created_at > self.ttl:
+            self._evict(ctx_id)
+            return None
+        self._cache.move_to_end(ctx_id)
+        return entry
+
+    def _get_or_create(self, ctx_id: str) -> _CachedContext:
+        entry = self._get(ctx_id)
+        if entry is None:
+            entry = self._cache[ctx_id] = _CachedContext(created_at=monotonic())
+        return entry
+
+    def _evict(self, ctx_id: str) -> None:
+        entry = self._cache.pop(ctx_id, None)
+        if entry is not None:
+            self._cache_size -= entry.size
+
+    def _resize(self, entry: _CachedContext, delta: int) -> None:
+        entry.size += delta
+        self._cache_size += delta
+
+    def _shrink(self) -> None:
+        """
+        Evict the least recently used contexts until the cache fits into the limits.
+        """
+
+        while len(self._cache) > self.max_contexts or (
+            self.max_bytes is not None and self._cache_size > self.max_bytes
+        ):
+            ctx_id = next(iter(self._cache))
+            logger.debug(f"Evicting context {ctx_id} from cache")
+            self._evict(ctx_id)
+
+    @staticmethod
+    def _main_size(main: Any) -> int:
+        if main is _UNKNOWN or main is None:
+            return 0
+        return len(main[NameConfig._misc_column]) + len(main[NameConfig._framework_data_column])
+
+    def _set_main(self, entry: _CachedContext, ctx_info: Optional[ContextMainInfo]) -> None:
+        old_size = self._main_size(entry.main)
+        entry.main = None if ctx_info is None else ctx_info.model_dump()
+        self._resize(entry, self._main_size(entry.main) - old_size)
+
+    def _set_values(self, entry: _CachedContext, field_name: str, items: List[Tuple[int, Optional[bytes]]]) -> None:
+        cached = entry.fields[field_name]
+        for k, v in items:
+            old = cached.values.pop(k, None)
+            self._resize(entry, -len(old) if old is not None else 0)
+            if v is not None:
+                cached.values[k] = v
+                self._resize(entry, len(v))
+
+    def _get_main(self, entry: _CachedContext) -> Optional[ContextMainInfo]:
+        return None if entry.main is None else ContextMainInfo.model_validate(entry.main)
+
+    def _get_latest(self, entry: _CachedContext, field_name: str) -> Optional[List[Tuple[int, bytes]]]:
+        cached = entry.fields[field_name]
+        if cached.keys is None:
+            return None
+        select = sorted(cached.keys, reverse=True)
+        if isinstance(self._subscripts[field_name], int):
+            select = select[: self._subscripts[field_name]]
+        elif isinstance(self._subscripts[field_name], set):
+            select = [k for k in select if k in self._subscripts[field_name]]
+        if any(k not in cached.values for k in select):
+            return None
+        return [(k, cached.values[k]) for k in select]
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
+        entry = self._get(ctx_id)
+        self._record(entry is not None and entry.main is not _UNKNOWN)
+        if entry is None or entry.main is _UNKNOWN:
+            async with self._context_lock(ctx_id):
+                epoch = self._epoch
+                main_info = await self.backend.load_main_info(ctx_id)
+                if epoch == self._epoch:
+                    self._set_main(self._get_or_create(ctx_id), main_info)
+                    self._shrink()
+            return main_info
+        return self._get_main(entry)
+
+    async def _load_main_info_many(self, ctx_ids: List[str]) -> Dict[str, Optional[ContextMainInfo]]:
+        result, missing = dict(), list()
+        for ctx_id in ctx_ids:
+            entry = self._get(ctx_id)
+            self._record(entry is not None and entry.main is not _UNKNOWN)
+            if entry is None or entry.main is _UNKNOWN:
+                missing += [ctx_id]
+            else:
+                result[ctx_id] = self._get_main(entry)
+        if len(missing) > 0:
+            async with self._context_locks_many(missing):
+                epoch = self._epoch
+                loaded = await self.backend.load_main_info_many(missing)
+                if epoch == self._epoch:
+                    for ctx_id, main_info in loaded.items():
+                        self._set_main(self._get_or_create(ctx_id), main_info)
+                    self._shrink()
+            result.update(loaded)
+        return result
+
+    def _apply_update(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        """
+        Apply context update, that was written to the wrapped storage, to the cache.
+        """
+
+        entry = self._get_or_create(ctx_id)
+        if ctx_info is not None:
+            self._set_main(entry, ctx_info)
+        for field_name, items in field_info:
+            self._set_values(entry, field_name, items)
+            cached_keys = entry.fields[field_name].keys
+            if cached_keys is not None:
+                cached_keys.update(k for k, v in items if v is not None)
+                cached_keys.difference_update(k for k, v in items if v is None)
+
+    @staticmethod
+    def _split_field_info(
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> List[Tuple[str, List[Tuple[int, bytes]], List[int]]]:
+        return [
+            (f, [(k, v) for k, v in items if v is not None], [k for k, v in items if v is None])
+            for f, items in field_info
+        ]
+
+    async def _update_context(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        async with self._context_lock(ctx_id):
+            try:
+                await self.backend.update_context(ctx_id, ctx_info, self._split_field_info(field_info))
+            except Exception:
+                self._evict(ctx_id)
+                raise
+            self._apply_update(ctx_id, ctx_info, field_info)
+            self._shrink()
+
+    async def _update_context_conditional(
+        self,
+        ctx_id: str,
+        ctx_info: ContextMainInfo,
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+        expected_turn_id: int,
+    ) -> None:
+        async with self._context_lock(ctx_id):
+            try:
+                await self.backend.update_context(
+                    ctx_id, ctx_info, self._split_field_info(field_info), expected_turn_id
+                )
+            except Exception:
+                self._evict(ctx_id)
+                raise
+            self._apply_update(ctx_id, ctx_info, field_info)
+            self._shrink()
+
+    async def _update_context_many(self, updates: List[_CONTEXT_UPDATE]) -> None:
+        async with self._context_locks_many(c for c, _, _ in updates):
+            try:
+                await self.backend.update_context_many([(c, i, self._split_field_info(f)) for c, i, f in updates])
+            except Exception:
+                for ctx_id, _, _ in updates:
+                    self._evict(ctx_id)
+                raise
+            for ctx_id, ctx_info, field_info in updates:
+                self._apply_update(ctx_id, ctx_info, field_info)
+            self._shrink()
+
+    async def _delete_context(self, ctx_id: str) -> None:
+        async with self._context_lock(ctx_id):
+            self._evict(ctx_id)
+            await self.backend.delete_context(ctx_id)
+            entry = self._get_or_create(ctx_id)
+            entry.main = None
+            for cached in entry.fields.values():
+                cached.keys = set()
+            self._shrink()
+
+    async def _delete_turns(self, ctx_id: str, keys: List[int]) -> None:
+        async with self._context_lock(ctx_id):
+            try:
+                await self.backend._delete_turns(ctx_id, keys)
+            except Exception:
+                self._evict(ctx_id)
+                raise
+            self._apply_update(ctx_id, None, [(f, [(k, None) for k in keys]) for f in NameConfig.get_turns_fields])
+
+    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+        entry = self._get(ctx_id)
+        latest = None if entry is None else self._get_latest(entry, field_name)
+        self._record(latest is not None)
+        if latest is None:
+            async with self._context_lock(ctx_id):
+                epoch = self._epoch
+                latest = await self.backend.load_field_latest(ctx_id, field_name)
+                if epoch == self._epoch:
+                    self._set_values(self._get_or_create(ctx_id), field_name, latest)
+                    self._shrink()
+        return latest
+
+    async def _load_field_latest_many(self, ctx_ids: List[str], field_name: str) -> Dict[str, List[Tuple[int, bytes]]]:
+        result, missing = dict(), list()
+        for ctx_id in ctx_ids:
+            entry = self._get(ctx_id)
+            latest = None if entry is None else self._get_latest(entry, field_name)
+            self._record(latest is not None)
+            if latest is None:
+                missing += [ctx_id]
+            else:
+                result[ctx_id] = latest
+        if len(missing) > 0:
+            async with self._context_locks_many(missing):
+                epoch = self._epoch
+                loaded = await self.backend.load_field_latest_many(missing, field_name)
+                if epoch == self._epoch:
+                    for ctx_id, latest in loaded.items():
+                        self._set_values(self._get_or_create(ctx_id), field_name, latest)
+                    self._shrink()
+            result.update(loaded)
+        return result
+
+    async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
+        entry = self._get(ctx_id)
+        keys = None if entry is None else entry.fields[field_name].keys
+        self._record(keys is not None)
+        if keys is None:
+            async with self._context_lock(ctx_id):
+                epoch = self._epoch
+                keys = await self.backend.load_field_keys(ctx_id, field_name)
+                if epoch == self._epoch:
+                    self._get_or_create(ctx_id).fields[field_name].keys = set(keys)
+                    self._shrink()
+            return keys
+        return sorted(keys)
+
+    async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        entry = self._get(ctx_id)
+        if entry is not None and entry.fields[field_name].keys is not None:
+            cached = entry.fields[field_name]
+            select = sorted(k for k in set(keys) if k in cached.keys)
+            if all(k in cached.values for k in select):
+                self._record(True)
+                return [(k, cached.values[k]) for k in select]
+        self._record(False)
+        async with self._context_lock(ctx_id):
+            epoch = self._epoch
+            items = await self.backend.load_field_items(ctx_id, field_name, keys)
+            if epoch == self._epoch:
+                self._set_values(self._get_or_create(ctx_id), field_name, items)
+                self._shrink()
+        return items
+
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        entry = self._get(ctx_id)
+        if entry is not None and entry.main is not _UNKNOWN:
+            fields_info = dict()
+            for field_name in NameConfig.get_turns_fields:
+                latest = self._get_latest(entry, field_name)
+                if latest is None:
+                    break
+                fields_info[field_name] = (sorted(entry.fields[field_name].keys), latest)
+            else:
+                self._record(True)
+                return self._get_main(entry), fields_info
+        self._record(False)
+        async with self._context_lock(ctx_id):
+            epoch = self._epoch
+            main_info, fields_info = await self.backend.load_context_bundle(ctx_id)
+            if epoch == self._epoch:
+                entry = self._get_or_create(ctx_id)
+                self._set_main(entry, main_info)
+                for field_name, (keys, latest) in fields_info.items():
+                    entry.fields[field_name].keys = set(keys)
+                    self._set_values(entry, field_name, latest)
+                self._shrink()
+        return main_info, fields_info
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        return await self.backend.load_misc_keys(ctx_id)
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return await self.backend.load_misc_items(ctx_id, keys)
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        added = [(k, v) for k, v in items if v is not None]
+        await self.backend.update_misc(ctx_id, added, [k for k, v in items if v is None])
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return await self.backend._load_blobs(keys)
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        await self.backend._store_blobs(items)
+
+    async def _list_blob_keys(self) -> List[str]:
+        return await self.backend._list_blob_keys()
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        await self.backend._delete_blobs(keys)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        return await self.backend.list_context_ids(after, limit)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        expired = await self.backend.delete_expired(until, limit)
+        for ctx_id in expired:
+            async with self._context_lock(ctx_id):
+                self._evict(ctx_id)
+        return expired
+
+    async def _clear_all(self) -> None:
+        await self.backend.clear_all()
+        self._epoch += 1
+        self._cache = OrderedDict()
+        self._cache_size = 0
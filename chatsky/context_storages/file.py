@@ -6,14 +6,20 @@ such as json, pickle and shelve.
 """
 
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from itertools import islice
 from pickle import loads, dumps
 from shelve import DbfilenameShelf
-from typing import List, Set, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Union
 
 from pydantic import BaseModel, Field
 
 from chatsky.core.ctx_utils import ContextMainInfo
-from .database import DBContextStorage, _SUBSCRIPT_DICT
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import DBContextStorage, _CONTEXT_BUNDLE, _SUBSCRIPT_DICT, NameConfig
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
 
 try:
     from aiofiles import open
@@ -35,6 +41,8 @@ class SerializableStorage(BaseModel):
 
     main: Dict[str, ContextMainInfo] = Field(default_factory=dict)
     turns: List[Tuple[str, str, int, Optional[bytes]]] = Field(default_factory=list)
+    misc: Dict[str, Dict[str, bytes]] = Field(default_factory=dict)
+    blobs: Dict[str, bytes] = Field(default_factory=dict)
 
 
 class FileContextStorage(DBContextStorage, ABC):
@@ -44,6 +52,11 @@ class FileContextStorage(DBContextStorage, ABC):
     :param path: Target file URI.
     :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
     is_concurrent: bool = False
@@ -53,8 +66,23 @@ class FileContextStorage(DBContextStorage, ABC):
         path: str = "",
         rewrite_existing: bool = False,
         partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
     ):
-        DBContextStorage.__init__(self, path, rewrite_existing, partial_read_config)
+        DBContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
 
     @abstractmethod
     async def _save(self, data: SerializableStorage) -> None:
@@ -93,21 +121,30 @@ class FileContextStorage(DBContextStorage, ABC):
     async def _delete_context(self, ctx_id: str) -> None:
         storage = await self._load()
         storage.main.pop(ctx_id, None)
+        storage.misc.pop(ctx_id, None)
         storage.turns = [(c, f, k, v) for c, f, k, v in storage.turns if c != ctx_id]
         await self._save(storage)
 
-    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+    async def _delete_turns(self, ctx_id: str, keys: List[int]) -> None:
+        storage = await self._load()
+        keys = set(keys)
+        storage.turns = [(c, f, k, v) for c, f, k, v in storage.turns if c != ctx_id or k not in keys]
+        await self._save(storage)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
         storage = await self._load()
-        select = sorted(
-            [(k, v) for c, f, k, v in storage.turns if c == ctx_id and f == field_name and v is not None],
-            key=lambda e: e[0],
-            reverse=True,
+        expired = set(islice((c for c, i in storage.main.items() if i.updated_at < until), limit))
+        if len(expired) > 0:
+            storage.main = {c: i for c, i in storage.main.items() if c not in expired}
+            storage.misc = {c: i for c, i in storage.misc.items() if c not in expired}
+            storage.turns = [(c, f, k, v) for c, f, k, v in storage.turns if c not in expired]
+            await self._save(storage)
+        return list(expired)
+
+    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+        return self._select_latest_items(
+            field_name, [(k, v) for c, f, k, v in (await self._load()).turns if c == ctx_id and f == field_name]
         )
-        if isinstance(self._subscripts[field_name], int):
-            select = select[: self._subscripts[field_name]]
-        elif isinstance(self._subscripts[field_name], Set):
-            select = [(k, v) for k, v in select if k in self._subscripts[field_name]]
-        return select
 
     async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
         return [k for c, f, k, v in (await self._load()).turns if c == ctx_id and f == field_name and v is not None]
@@ -119,6 +156,56 @@ class FileContextStorage(DBContextStorage, ABC):
             if c == ctx_id and f == field_name and k in keys and v is not None
         ]
 
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        storage = await self._load()
+        field_items = {field_name: list() for field_name in NameConfig.get_turns_fields}
+        for c, f, k, v in storage.turns:
+            if c == ctx_id:
+                field_items[f] += [(k, v)]
+        fields_info = {
+            f: ([k for k, v in items if v is not None], self._select_latest_items(f, items))
+            for f, items in field_items.items()
+        }
+        return storage.main.get(ctx_id, None), fields_info
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        return list((await self._load()).misc.get(ctx_id, dict()).keys())
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        items = (await self._load()).misc.get(ctx_id, dict())
+        return [(k, items[k]) for k in keys if k in items]
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        storage = await self._load()
+        stored = storage.misc.setdefault(ctx_id, dict())
+        for k, v in items:
+            if v is None:
+                stored.pop(k, None)
+            else:
+                stored[k] = v
+        await self._save(storage)
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        blobs = (await self._load()).blobs
+        return [(k, blobs[k]) for k in keys if k in blobs]
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        storage = await self._load()
+        storage.blobs.update(items)
+        await self._save(storage)
+
+    async def _list_blob_keys(self) -> List[str]:
+        return list((await self._load()).blobs.keys())
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        storage = await self._load()
+        for k in keys:
+            storage.blobs.pop(k, None)
+        await self._save(storage)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        return self._select_context_ids((await self._load()).main.keys(), after, limit)
+
     async def _clear_all(self) -> None:
         await self._save(SerializableStorage())
 
@@ -126,12 +213,46 @@ class FileContextStorage(DBContextStorage, ABC):
 class JSONContextStorage(FileContextStorage):
     """
     Implements :py:class:`.DBContextStorage` with `json` as the storage format.
+    Only text data can be stored in JSON files, so neither compression, binary serialization nor archival
+    is supported.
 
     :param path: Target file URI. Example: `json://file.json`.
     :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param compression: Should be `None`.
+    :param serialization: Should be `json`.
+    :param retention: Retention policy for the stored contexts, should not enable archival.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
+    def __init__(
+        self,
+        path: str = "",
+        rewrite_existing: bool = False,
+        partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
+    ):
+        FileContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
+        if self.compression is not None or self.serializer.format != "json":
+            raise ValueError("JSON context storage does not support compression and binary serialization formats")
+        if self._archival_enabled:
+            raise ValueError("JSON context storage does not support archival")
+
     async def _save(self, data: SerializableStorage) -> None:
         if not await isfile(self.path) or (await stat(self.path)).st_size == 0:
             await makedirs(self.path.parent, exist_ok=True)
@@ -155,6 +276,11 @@ class PickleContextStorage(FileContextStorage):
     :param path: Target file URI. Example: `pickle://file.pkl`.
     :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
     async def _save(self, data: SerializableStorage) -> None:
@@ -173,34 +299,231 @@ class PickleContextStorage(FileContextStorage):
         return storage
 
 
-class ShelveContextStorage(FileContextStorage):
+class ShelveContextStorage(DBContextStorage):
     """
     Implements :py:class:`.DBContextStorage` with `shelve` as the storage format.
 
+    Unlike the other file storages, the data is not stored as a single object:
+    every context main info, every field key list and every turn item are stored under separate shelve keys,
+    so that every operation reads and writes only the keys it requires.
+
+    That's how MAIN table fields are stored:
+    `"main:ctx_id": "DATA"`
+    That's how TURNS table keys are stored:
+    `"keys:ctx_id:FIELD_NAME": "KEYS"`
+    That's how TURNS table fields are stored:
+    `"turns:ctx_id:FIELD_NAME:KEY": "DATA"`
+    That's how MISC table keys are stored:
+    `"misc_keys:ctx_id": "KEYS"`
+    That's how MISC table items are stored:
+    `"misc:ctx_id:KEY": "DATA"`
+    That's how blobs are stored:
+    `"blobs:BLOB_KEY": "DATA"`
+
+    IDs of the stored contexts are collected upon connection and kept sorted in memory (with their update times),
+    so that listing contexts and deleting expired ones doesn't require scanning all the shelve keys.
+
     :param path: Target file URI. Example: `shelve://file.shlv`.
     :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
-    _SHELVE_ROOT = "root"
+    _KEYS_PREFIX = "keys"
+    _MISC_KEYS_PREFIX = "misc_keys"
+
+    is_concurrent: bool = False
 
     def __init__(
         self,
         path: str = "",
         rewrite_existing: bool = False,
         partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
     ):
         self._storage = None
-        FileContextStorage.__init__(self, path, rewrite_existing, partial_read_config)
+        self._context_ids: List[str] = list()
+        """
+        IDs of the contexts that have main info stored, sorted in ascending order.
+        """
+        self._updated_at: Dict[str, int] = dict()
+        """
+        Dictionary, mapping the IDs of the contexts that have main info stored to their update times.
+        """
+        DBContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
 
-    async def _save(self, data: SerializableStorage) -> None:
-        self._storage[self._SHELVE_ROOT] = data.model_dump()
+    def _main_key(self, ctx_id: str) -> str:
+        return f"{NameConfig._main_table}:{ctx_id}"
 
-    async def _load(self) -> SerializableStorage:
+    def _keys_key(self, ctx_id: str, field_name: str) -> str:
+        return f"{self._KEYS_PREFIX}:{ctx_id}:{field_name}"
+
+    def _item_key(self, ctx_id: str, field_name: str, key: int) -> str:
+        return f"{NameConfig._turns_table}:{ctx_id}:{field_name}:{key}"
+
+    def _misc_keys_key(self, ctx_id: str) -> str:
+        return f"{self._MISC_KEYS_PREFIX}:{ctx_id}"
+
+    def _misc_item_key(self, ctx_id: str, key: str) -> str:
+        return f"{NameConfig._misc_table}:{ctx_id}:{key}"
+
+    def _blob_key(self, key: str) -> str:
+        return f"{NameConfig._blobs_table}:{key}"
+
+    def _get_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        return [(k, self._storage[self._item_key(ctx_id, field_name, k)]) for k in keys]
+
+    async def _connect(self):
         if self._storage is None:
-            content = SerializableStorage()
-            self._storage = DbfilenameShelf(str(self.path.absolute()), writeback=True)
-            await self._save(content)
-        else:
-            content = SerializableStorage.model_validate(self._storage[self._SHELVE_ROOT])
-        return content
+            self._storage = DbfilenameShelf(str(self.path.absolute()), writeback=False)
+            main_prefix = self._main_key("")
+            self._updated_at = {
+                k.partition(":")[2]: self._storage[k][NameConfig._updated_at_column]
+                for k in self._storage.keys()
+                if k.startswith(main_prefix)
+            }
+            self._context_ids = sorted(self._updated_at.keys())
+
+    async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
+        main_info = self._storage.get(self._main_key(ctx_id), None)
+        return None if main_info is None else ContextMainInfo.model_validate(main_info)
+
+    async def _update_context(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        if ctx_info is not None:
+            self._storage[self._main_key(ctx_id)] = ctx_info.model_dump()
+            if ctx_id not in self._updated_at:
+                self._context_ids.insert(bisect_left(self._context_ids, ctx_id), ctx_id)
+            self._updated_at[ctx_id] = ctx_info.updated_at
+        for field_name, items in field_info:
+            if len(items) == 0:
+                continue
+            keys = set(self._storage.get(self._keys_key(ctx_id, field_name), list()))
+            for k, v in items:
+                if v is None:
+                    keys.discard(k)
+                    self._storage.pop(self._item_key(ctx_id, field_name, k), None)
+                else:
+                    keys.add(k)
+                    self._storage[self._item_key(ctx_id, field_name, k)] = v
+            self._storage[self._keys_key(ctx_id, field_name)] = sorted(keys)
+
+    async def _delete_context(self, ctx_id: str) -> None:
+        self._storage.pop(self._main_key(ctx_id), None)
+        if self._updated_at.pop(ctx_id, None) is not None:
+            self._context_ids.pop(bisect_left(self._context_ids, ctx_id))
+        for field_name in NameConfig.get_turns_fields:
+            for k in self._storage.pop(self._keys_key(ctx_id, field_name), list()):
+                self._storage.pop(self._item_key(ctx_id, field_name, k), None)
+        for k in self._storage.pop(self._misc_keys_key(ctx_id), list()):
+            self._storage.pop(self._misc_item_key(ctx_id, k), None)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        expired = list(islice((c for c, u in self._updated_at.items() if u < until), limit))
+        for ctx_id in expired:
+            await self._delete_context(ctx_id)
+        return expired
+
+    def _select_latest_keys(self, field_name: str, keys: List[int]) -> List[int]:
+        select = keys[::-1]
+        if isinstance(self._subscripts[field_name], int):
+            select = select[: self._subscripts[field_name]]
+        elif isinstance(self._subscripts[field_name], set):
+            select = [k for k in select if k in self._subscripts[field_name]]
+        return select
+
+    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+        keys = await self._load_field_keys(ctx_id, field_name)
+        return self._get_items(ctx_id, field_name, self._select_latest_keys(field_name, keys))
+
+    async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
+        return self._storage.get(self._keys_key(ctx_id, field_name), list())
+
+    async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        stored = set(await self._load_field_keys(ctx_id, field_name))
+        return self._get_items(ctx_id, field_name, [k for k in sorted(set(keys)) if k in stored])
+
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        fields_info = dict()
+        for field_name in NameConfig.get_turns_fields:
+            keys = await self._load_field_keys(ctx_id, field_name)
+            fields_info[field_name] = (
+                keys,
+                self._get_items(ctx_id, field_name, self._select_latest_keys(field_name, keys)),
+            )
+        return await self._load_main_info(ctx_id), fields_info
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        return self._storage.get(self._misc_keys_key(ctx_id), list())
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        stored = set(await self._load_misc_keys(ctx_id))
+        return [(k, self._storage[self._misc_item_key(ctx_id, k)]) for k in keys if k in stored]
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        keys = set(await self._load_misc_keys(ctx_id))
+        for k, v in items:
+            if v is None:
+                keys.discard(k)
+                self._storage.pop(self._misc_item_key(ctx_id, k), None)
+            else:
+                keys.add(k)
+                self._storage[self._misc_item_key(ctx_id, k)] = v
+        self._storage[self._misc_keys_key(ctx_id)] = sorted(keys)
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return [(k, self._storage[self._blob_key(k)]) for k in keys if self._blob_key(k) in self._storage]
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        for k, v in items:
+            self._storage[self._blob_key(k)] = v
+
+    async def _list_blob_keys(self) -> List[str]:
+        blob_prefix = self._blob_key("")
+        return [k[len(blob_prefix) :] for k in self._storage.keys() if k.startswith(blob_prefix)]  # noqa: E203
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        for k in keys:
+            self._storage.pop(self._blob_key(k), None)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        start = 0 if after is None else bisect_right(self._context_ids, after)
+        return self._context_ids[start : start + limit]  # noqa: E203
+
+    async def _clear_all(self) -> None:
+        self._storage.clear()
+        self._context_ids = list()
+        self._updated_at = dict()
+
+    async def close(self) -> None:
+        """
+        Close the underlying shelve file.
+        The storage can be used again after reconnection.
+        """
+
+        await DBContextStorage.close(self)
+        if self._storage is not None:
+            self._storage.close()
+            self._storage = None
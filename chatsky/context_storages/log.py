@@ -0,0 +1,438 @@
+"""
+Log
+---
+The Log module provides an append-only log-based version of the :py:class:`.DBContextStorage` class.
+
+All the changes are appended to segment files as separate records,
+while an in-memory index maps every stored value to its location on disk.
+That way, every update costs only the size of the changed data and every read costs only a seek,
+unlike the file storages (json, pickle, shelve), that read and rewrite all the contexts on every operation.
+Outdated records are removed by periodic compaction, performed in background.
+
+This storage is intended for single-node deployments that can not run a database server.
+"""
+
+from asyncio import CancelledError, Task, create_task, sleep
+from logging import getLogger
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from struct import Struct
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    from aiofiles import open
+    from aiofiles.os import listdir, makedirs, remove, rename
+
+    log_available = True
+except ImportError:
+    log_available = False
+
+from chatsky.core.ctx_utils import ContextMainInfo
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import DBContextStorage, _CONTEXT_BUNDLE, _SUBSCRIPT_DICT, NameConfig
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
+from .protocol import get_protocol_install_suggestion
+
+logger = getLogger(__name__)
+
+_Location = Tuple[int, int, int]
+"""
+Location of a record payload on disk: segment number, payload offset and payload length.
+"""
+
+
+class LogContextStorage(DBContextStorage):
+    """
+    Implements :py:class:`.DBContextStorage` with an append-only log as the storage format.
+
+    The storage occupies a directory, containing numbered segment files.
+    Every segment is a sequence of records, every record is a length-prefixed pickled tuple
+    `(ctx_id, field_name, key, value)`:
+
+    - `MAIN` table data is stored with `main` field name and `None` key;
+    - `TURNS` table data is stored with the turn field name and the turn key,
+      deleted turn items are stored with `None` value;
+    - key-addressable `misc` items are stored with `misc` field name and the item key,
+      deleted items are stored with `None` value;
+    - blobs are stored with empty context identifier, `blobs` field name and the blob key,
+      deleted blobs are stored with `None` value;
+    - context deletion is stored with `None` field name.
+
+    New records are always appended to the last segment, once it grows larger than `segment_size`,
+    a new one is started.
+    All the segments are read on connection, in order to restore the in-memory index.
+    Once the size of outdated records exceeds `compaction_threshold` of the total size,
+    all the segments are merged into one, containing only the actual records.
+
+    :param path: Target directory URI. Example: `log://path_to_the_dir`.
+    :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
+    :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param segment_size: Size of one segment file (in bytes), when it is exceeded, a new segment is started.
+    :param compaction_interval: Interval (in seconds) between the compaction checks, `None` disables compaction.
+    :param compaction_threshold: Minimal share of outdated records size in the total size for compaction to start.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
+    """
+
+    _MAIN_FIELD = NameConfig._main_table
+    _MISC_FIELD = NameConfig._misc_table
+    _BLOBS_FIELD = NameConfig._blobs_table
+    _SEGMENT_SUFFIX = ".log"
+    _COMPACTION_SUFFIX = ".compact"
+    _HEADER = Struct(">I")
+
+    is_concurrent: bool = False
+
+    def __init__(
+        self,
+        path: str,
+        rewrite_existing: bool = False,
+        partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        segment_size: int = 64 * 1024 * 1024,
+        compaction_interval: Optional[float] = 60.0,
+        compaction_threshold: float = 0.5,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
+    ):
+        DBContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
+
+        if not log_available:
+            install_suggestion = get_protocol_install_suggestion("log")
+            raise ImportError("`aiofiles` package is missing.\n" + install_suggestion)
+        if segment_size < 1:
+            raise ValueError(f"Invalid segment size value: {segment_size}")
+        if not 0 < compaction_threshold < 1:
+            raise ValueError(f"Invalid compaction threshold value: {compaction_threshold}")
+
+        self.segment_size = segment_size
+        self.compaction_interval = compaction_interval
+        self.compaction_threshold = compaction_threshold
+
+        self._main_index: Dict[str, _Location] = dict()
+        self._turns_index: Dict[str, Dict[str, Dict[Union[int, str], _Location]]] = dict()
+        self._blobs_index: Dict[str, _Location] = dict()
+        self._total_size = 0
+        self._live_size = 0
+        self._segments: List[int] = list()
+        self._writer = None
+        self._readers = dict()
+        self._compaction_task: Optional[Task] = None
+
+    def _segment_path(self, segment: int, suffix: str = _SEGMENT_SUFFIX) -> str:
+        return str(self.path / f"{segment:08d}{suffix}")
+
+    def _encode(self, ctx_id: str, field: Optional[str], key: Optional[int], value: Optional[bytes]) -> bytes:
+        payload = dumps((ctx_id, field, key, value), protocol=HIGHEST_PROTOCOL)
+        return self._HEADER.pack(len(payload)) + payload
+
+    def _forget(self, location: Optional[_Location]) -> None:
+        if location is not None:
+            self._live_size -= self._HEADER.size + location[2]
+
+    def _apply(self, ctx_id: str, field: Optional[str], key: Optional[int], value: Optional[bytes], loc: _Location):
+        """
+        Apply a record to the in-memory index.
+
+        :param ctx_id: Context identifier.
+        :param field: Field name, `main` for `MAIN` table record, `blobs` for blob record
+            or `None` for context deletion record.
+        :param key: Turn key (or `misc` item key or blob key), for `TURNS` (and `MISC` and blob) records only.
+        :param value: Record value, `None` for deleted turn (and `misc` and blob) items.
+        :param loc: Location of the record payload.
+        """
+
+        record_size = self._HEADER.size + loc[2]
+        self._total_size += record_size
+        if field is None:
+            self._forget(self._main_index.pop(ctx_id, None))
+            for field_index in self._turns_index.pop(ctx_id, dict()).values():
+                for location in field_index.values():
+                    self._forget(location)
+        elif field == self._MAIN_FIELD:
+            self._forget(self._main_index.get(ctx_id, None))
+            self._main_index[ctx_id] = loc
+            self._live_size += record_size
+        elif field == self._BLOBS_FIELD:
+            self._forget(self._blobs_index.pop(key, None))
+            if value is not None:
+                self._blobs_index[key] = loc
+                self._live_size += record_size
+        else:
+            field_index = self._turns_index.setdefault(ctx_id, dict()).setdefault(field, dict())
+            self._forget(field_index.pop(key, None))
+            if value is not None:
+                field_index[key] = loc
+                self._live_size += record_size
+
+    async def _read_segment(self, segment: int) -> None:
+        """
+        Read all the records of a segment into the in-memory index.
+        If the segment ends with an incomplete record (e.g. after a crash), it is truncated.
+
+        :param segment: Segment number.
+        """
+
+        async with open(self._segment_path(segment), "rb") as file_stream:
+            data = await file_stream.read()
+        offset = 0
+        while offset + self._HEADER.size <= len(data):
+            (length,) = self._HEADER.unpack_from(data, offset)
+            payload_offset = offset + self._HEADER.size
+            if payload_offset + length > len(data):
+                break
+            ctx_id, field, key, value = loads(data[payload_offset : payload_offset + length])  # noqa: E203
+            self._apply(ctx_id, field, key, value, (segment, payload_offset, length))
+            offset = payload_offset + length
+        if offset < len(data):
+            logger.warning(f"Segment {segment} has an incomplete record at {offset}, truncating")
+            async with open(self._segment_path(segment), "r+b") as file_stream:
+                await file_stream.truncate(offset)
+
+    async def _open_segment(self, segment: int) -> None:
+        if self._writer is not None:
+            await self._writer.close()
+        self._writer = await open(self._segment_path(segment), "ab")
+        if segment not in self._segments:
+            self._segments += [segment]
+
+    async def _close_files(self) -> None:
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        for reader in self._readers.values():
+            await reader.close()
+        self._readers = dict()
+
+    async def _connect(self):
+        await makedirs(self.path, exist_ok=True)
+        await self._close_files()
+        self._main_index, self._turns_index, self._blobs_index = dict(), dict(), dict()
+        self._total_size = self._live_size = 0
+        self._segments = sorted(
+            int(name[: -len(self._SEGMENT_SUFFIX)])
+            for name in await listdir(self.path)
+            if name.endswith(self._SEGMENT_SUFFIX)
+        )
+        for segment in self._segments:
+            await self._read_segment(segment)
+        await self._open_segment(self._segments[-1] if len(self._segments) > 0 else 0)
+        if self.compaction_interval is not None and self._compaction_task is None:
+            self._compaction_task = create_task(self._compaction_loop())
+
+    async def _append(self, records: List[Tuple[str, Optional[str], Optional[int], Optional[bytes]]]) -> None:
+        """
+        Append records to the active segment and apply them to the in-memory index.
+
+        :param records: List of records: tuples `(ctx_id, field_name, key, value)`.
+        """
+
+        offset = await self._writer.tell()
+        if offset >= self.segment_size:
+            await self._open_segment(self._segments[-1] + 1)
+            offset = 0
+        segment = self._segments[-1]
+        data, locations = list(), list()
+        for record in records:
+            encoded = self._encode(*record)
+            locations += [(segment, offset + self._HEADER.size, len(encoded) - self._HEADER.size)]
+            offset += len(encoded)
+            data += [encoded]
+        await self._writer.write(b"".join(data))
+        await self._writer.flush()
+        for record, location in zip(records, locations):
+            self._apply(*record, location)
+
+    async def _read(self, location: _Location) -> Tuple[str, Optional[str], Optional[int], Optional[bytes]]:
+        segment, offset, length = location
+        reader = self._readers.get(segment, None)
+        if reader is None:
+            reader = self._readers[segment] = await open(self._segment_path(segment), "rb")
+        await reader.seek(offset)
+        return loads(await reader.read(length))
+
+    async def _read_values(self, locations: List[Tuple[int, _Location]]) -> List[Tuple[int, bytes]]:
+        result = list()
+        for key, location in sorted(locations, key=lambda e: e[1]):
+            result += [(key, (await self._read(location))[3])]
+        return sorted(result, key=lambda e: e[0])
+
+    async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
+        location = self._main_index.get(ctx_id, None)
+        if location is None:
+            return None
+        return ContextMainInfo.model_validate(loads((await self._read(location))[3]))
+
+    async def _update_context(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        records = list()
+        if ctx_info is not None:
+            records += [(ctx_id, self._MAIN_FIELD, None, dumps(ctx_info.model_dump(), protocol=HIGHEST_PROTOCOL))]
+        for field_name, items in field_info:
+            records += [(ctx_id, field_name, k, v) for k, v in items]
+        if len(records) > 0:
+            await self._append(records)
+
+    async def _delete_context(self, ctx_id: str) -> None:
+        if ctx_id in self._main_index or ctx_id in self._turns_index:
+            await self._append([(ctx_id, None, None, None)])
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        expired = list()
+        for ctx_id, location in list(self._main_index.items()):
+            if len(expired) >= limit:
+                break
+            if loads((await self._read(location))[3])[NameConfig._updated_at_column] < until:
+                expired += [ctx_id]
+        if len(expired) > 0:
+            await self._append([(ctx_id, None, None, None) for ctx_id in expired])
+        return expired
+
+    def _get_field_index(self, ctx_id: str, field_name: str) -> Dict[int, _Location]:
+        return self._turns_index.get(ctx_id, dict()).get(field_name, dict())
+
+    def _select_latest_locations(self, ctx_id: str, field_name: str) -> List[Tuple[int, _Location]]:
+        field_index = self._get_field_index(ctx_id, field_name)
+        select = sorted(field_index.keys(), reverse=True)
+        if isinstance(self._subscripts[field_name], int):
+            select = select[: self._subscripts[field_name]]
+        elif isinstance(self._subscripts[field_name], set):
+            select = [k for k in select if k in self._subscripts[field_name]]
+        return [(k, field_index[k]) for k in select]
+
+    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+        return (await self._read_values(self._select_latest_locations(ctx_id, field_name)))[::-1]
+
+    async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
+        return list(self._get_field_index(ctx_id, field_name).keys())
+
+    async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        field_index = self._get_field_index(ctx_id, field_name)
+        return await self._read_values([(k, field_index[k]) for k in set(keys) if k in field_index])
+
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        fields_info = dict()
+        for field_name in NameConfig.get_turns_fields:
+            keys = await self._load_field_keys(ctx_id, field_name)
+            fields_info[field_name] = (keys, await self._load_field_latest(ctx_id, field_name))
+        return await self._load_main_info(ctx_id), fields_info
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        return list(self._get_field_index(ctx_id, self._MISC_FIELD).keys())
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        misc_index = self._get_field_index(ctx_id, self._MISC_FIELD)
+        return await self._read_values([(k, misc_index[k]) for k in set(keys) if k in misc_index])
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        await self._append([(ctx_id, self._MISC_FIELD, k, v) for k, v in items])
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return await self._read_values([(k, self._blobs_index[k]) for k in set(keys) if k in self._blobs_index])
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        records = [("", self._BLOBS_FIELD, k, v) for k, v in items if k not in self._blobs_index]
+        if len(records) > 0:
+            await self._append(records)
+
+    async def _list_blob_keys(self) -> List[str]:
+        return list(self._blobs_index.keys())
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        records = [("", self._BLOBS_FIELD, k, None) for k in keys if k in self._blobs_index]
+        if len(records) > 0:
+            await self._append(records)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        return self._select_context_ids(self._main_index.keys(), after, limit)
+
+    async def _clear_all(self) -> None:
+        await self._close_files()
+        for segment in self._segments:
+            await remove(self._segment_path(segment))
+        self._main_index, self._turns_index, self._blobs_index = dict(), dict(), dict()
+        self._total_size = self._live_size = 0
+        self._segments = list()
+        await self._open_segment(0)
+
+    async def _compact(self) -> None:
+        """
+        Merge all the segments into a new one, containing only the actual records.
+        The new segment is written to a temporary file first and renamed only when it is complete,
+        so that the storage stays consistent if compaction is interrupted.
+        """
+
+        logger.debug(f"Compacting log storage: {self._live_size} of {self._total_size} bytes are actual...")
+        segment = self._segments[-1] + 1
+        compacted, offset = dict(), 0
+        async with open(self._segment_path(segment, self._COMPACTION_SUFFIX), "wb") as file_stream:
+            locations = [((c, self._MAIN_FIELD, None), loc) for c, loc in self._main_index.items()]
+            locations += [(("", self._BLOBS_FIELD, k), loc) for k, loc in self._blobs_index.items()]
+            for ctx_id, field_index in self._turns_index.items():
+                for field_name, key_index in field_index.items():
+                    locations += [((ctx_id, field_name, k), loc) for k, loc in key_index.items()]
+            for record_id, location in sorted(locations, key=lambda e: e[1]):
+                encoded = self._encode(*await self._read(location))
+                await file_stream.write(encoded)
+                compacted[record_id] = (segment, offset + self._HEADER.size, len(encoded) - self._HEADER.size)
+                offset += len(encoded)
+        await self._close_files()
+        await rename(self._segment_path(segment, self._COMPACTION_SUFFIX), self._segment_path(segment))
+        for old_segment in self._segments:
+            await remove(self._segment_path(old_segment))
+        self._segments = list()
+        for (ctx_id, field_name, key), location in compacted.items():
+            if field_name == self._MAIN_FIELD:
+                self._main_index[ctx_id] = location
+            elif field_name == self._BLOBS_FIELD:
+                self._blobs_index[key] = location
+            else:
+                self._turns_index[ctx_id][field_name][key] = location
+        self._total_size = self._live_size = offset
+        await self._open_segment(segment)
+        logger.debug(f"Log storage compacted into segment {segment}: {offset} bytes")
+
+    async def close(self) -> None:
+        """
+        Stop background compaction and close all the segment files.
+        The storage can be used again after reconnection.
+        """
+
+        await DBContextStorage.close(self)
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        await self._close_files()
+
+    async def _compaction_loop(self) -> None:
+        try:
+            while True:
+                await sleep(self.compaction_interval)
+                async with self._sync_lock:
+                    garbage_size = self._total_size - self._live_size
+                    if self._total_size > 0 and garbage_size / self._total_size >= self.compaction_threshold:
+                        await self._compact()
+        except CancelledError:
+            pass
+        except Exception as e:
+            logger.exception("Log storage compaction failed", exc_info=e)
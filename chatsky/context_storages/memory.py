@@ -2,49 +2,275 @@
 Memory
 ------
 The Memory module provides an in-RAM version of the :py:class:`.DBContextStorage` class.
+
+The storage can be bounded with `max_contexts` and `max_bytes` limits: the least recently used contexts
+are evicted once a limit is exceeded. Evicted contexts can be spilled over to a secondary storage,
+they are restored from there transparently once they are requested again.
 """
 
-from typing import List, Optional, Set, Tuple
+from asyncio import Lock, gather
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple, Union
+from weakref import WeakValueDictionary
+
+from pydantic import BaseModel
 
 from chatsky.core.ctx_utils import ContextMainInfo
-from .database import DBContextStorage, _SUBSCRIPT_DICT, NameConfig
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import DBContextStorage, _CONTEXT_BUNDLE, _SUBSCRIPT_DICT, NameConfig, context_storage_factory
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
+
+
+def _get_size(value: Optional[bytes]) -> int:
+    return len(value) if isinstance(value, bytes) else 0
+
+
+class MemoryStats(BaseModel):
+    """
+    Memory usage statistics of :py:class:`MemoryContextStorage`.
+    """
+
+    contexts: int = 0
+    """
+    Number of the contexts currently kept in memory.
+    """
+    field_bytes: Dict[str, int]
+    """
+    Total size (in bytes) of the turn items kept in memory for every field.
+    """
+    evictions: int = 0
+    """
+    Number of the contexts evicted from memory.
+    """
+    restorations: int = 0
+    """
+    Number of the contexts restored from the spill-over storage.
+    """
 
 
 class MemoryContextStorage(DBContextStorage):
     """
     Implements :py:class:`.DBContextStorage` storing contexts in memory, without file backend.
-    Does not serialize any data. By default, it sets path to an empty string.
+    By default, it sets path to an empty string.
 
-    Keeps data in a dictionary and two dictionaries:
+    If `serialization` is `None`, the storage keeps validated objects instead of serialized data,
+    skipping serialization, deserialization and modification hashing altogether.
+    Objects are copied upon writing and reading (frozen objects, e.g. labels, are shared),
+    so that the stored data stays isolated from the contexts.
+
+    Only the turn items are accounted in the context size (objects kept without serialization are not accounted).
+    Expired contexts are swept from the spill-over storage together with the ones kept in memory.
+    Memory usage can be inspected with :py:meth:`get_stats`.
+
+    Keeps data in a dictionary and four dictionaries:
 
     - `main`: {context_id: context_info}
     - `turns`: {context_id: {labels, requests, responses}}
+    - `misc`: {context_id: {key: value}}
+    - `blobs`: {blob_key: value}
+
+    Blobs are shared by the contexts, so they are neither accounted in the context size nor evicted,
+    the evicted contexts are written to the spill-over storage with the referenced values inline.
 
     :param path: Any string, won't be used.
     :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param max_contexts: Maximum number of contexts kept in memory, `None` for no limit.
+    :param max_bytes: Maximum total size of the turn items kept in memory in bytes, `None` for no limit.
+    :param spill_storage: Storage (or its path) the evicted contexts are written to, `None` for dropping them.
+        Requires serialization.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data,
+        `None` for keeping the validated objects (incompatible with compression and archival).
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
     is_concurrent: bool = True
 
+    _keeps_objects: bool = True
+
     def __init__(
         self,
         path: str = "",
         rewrite_existing: bool = False,
         partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        max_contexts: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        spill_storage: Optional[Union[str, DBContextStorage]] = None,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Optional[Union[str, Serializer]] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
     ):
-        DBContextStorage.__init__(self, path, rewrite_existing, partial_read_config)
+        DBContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
+        if self.serializer is None and (
+            self.compression is not None
+            or (retention is not None and retention.archive_turns is not None)
+            or spill_storage is not None
+        ):
+            raise ValueError("Compression, archival and spilling over require serialization")
+        if max_contexts is not None and max_contexts < 1:
+            raise ValueError(f"Invalid max contexts value: {max_contexts}")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"Invalid max bytes value: {max_bytes}")
+        if isinstance(spill_storage, str):
+            spill_storage = context_storage_factory(spill_storage)
+
+        self.max_contexts = max_contexts
+        self.max_bytes = max_bytes
+        self.spill_storage = spill_storage
         self._main_storage = dict()
-        self._aux_storage = {
-            NameConfig._labels_field: dict(),
-            NameConfig._requests_field: dict(),
-            NameConfig._responses_field: dict(),
-        }
+        self._aux_storage = {field: dict() for field in NameConfig.get_turns_fields}
+        self._misc_storage: Dict[str, Dict[str, bytes]] = dict()
+        self._blob_storage: Dict[str, bytes] = dict()
+        self._contexts: OrderedDict[str, None] = OrderedDict()
+        """
+        IDs of the contexts kept in memory, ordered from the least recently used to the most recently used one.
+        """
+        self._context_locks: WeakValueDictionary[str, Lock] = WeakValueDictionary()
+        """
+        Locks of the contexts that are being evicted, restored or deleted.
+        """
+        self._field_bytes = {field: 0 for field in NameConfig.get_turns_fields}
+        self._evictions = 0
+        self._restorations = 0
+
+    def get_stats(self) -> MemoryStats:
+        """
+        Get the memory usage statistics.
+
+        :return: Current number of contexts and size of every field kept in memory and eviction counters.
+        """
+
+        return MemoryStats(
+            contexts=len(self._contexts),
+            field_bytes=dict(self._field_bytes),
+            evictions=self._evictions,
+            restorations=self._restorations,
+        )
 
     async def _connect(self):
-        pass
+        if self.spill_storage is not None and not self.spill_storage.connected:
+            await self.spill_storage.connect()
+
+    def _context_lock(self, ctx_id: str) -> Lock:
+        """
+        Get lock for the given context, that is held while the context is moved to or from the spill-over storage,
+        so that it is neither read nor modified halfway through.
+        """
+
+        lock = self._context_locks.get(ctx_id, None)
+        if lock is None:
+            lock = self._context_locks[ctx_id] = Lock()
+        return lock
+
+    async def _touch(self, ctx_id: str, create: bool = False) -> bool:
+        """
+        Mark the context as the most recently used one, restore it from the spill-over storage if it was evicted.
+        Waits for the context eviction to finish if it is being evicted.
+        The context is kept in memory until the caller yields control.
+
+        :param ctx_id: Context identifier.
+        :param create: Whether to start tracking the context if it is not found.
+        :return: Whether the context is kept in memory.
+        """
+
+        while True:
+            async with self._context_lock(ctx_id):
+                if ctx_id in self._contexts:
+                    self._contexts.move_to_end(ctx_id)
+                    return True
+                elif self.spill_storage is None or not await self._restore(ctx_id):
+                    if create:
+                        self._contexts[ctx_id] = None
+                    return create
+            # The restored context is checked again, as it might have been evicted by a concurrent shrinking
+            await self._shrink()
+
+    async def _restore(self, ctx_id: str) -> bool:
+        """
+        Move the context from the spill-over storage to memory.
+        Should be called with the context lock acquired.
+
+        :param ctx_id: Context identifier.
+        :return: Whether the context was found in the spill-over storage.
+        """
+
+        (main_info, fields_info), misc_keys = await gather(
+            self.spill_storage.load_context_bundle(ctx_id), self.spill_storage.load_misc_keys(ctx_id)
+        )
+        if main_info is None and all(len(keys) == 0 for keys, _ in fields_info.values()) and len(misc_keys) == 0:
+            return False
+        misc_items, *fields_items = await gather(
+            self.spill_storage.load_misc_items(ctx_id, misc_keys),
+            *[self.spill_storage.load_field_items(ctx_id, f, keys) for f, (keys, _) in fields_info.items()],
+        )
+        if len(misc_items) > 0:
+            self._misc_storage[ctx_id] = dict(misc_items)
+        self._store(ctx_id, main_info, list(zip(fields_info.keys(), fields_items)))
+        await self.spill_storage.delete_context(ctx_id)
+        self._contexts[ctx_id] = None
+        self._restorations += 1
+        return True
+
+    async def _evict(self, ctx_id: str) -> None:
+        """
+        Remove the context from memory, write it to the spill-over storage if it is set.
+        The context data is kept until it is written, the context is not accounted in the limits since the start.
+
+        :param ctx_id: Context identifier.
+        """
+
+        self._contexts.pop(ctx_id, None)
+        for field_name, storage in self._aux_storage.items():
+            self._field_bytes[field_name] -= sum(_get_size(v) for v in storage.get(ctx_id, dict()).values())
+        async with self._context_lock(ctx_id):
+            if self.spill_storage is not None:
+                fields = {f: s.get(ctx_id, dict()) for f, s in self._aux_storage.items()}
+                field_info = [
+                    (f, await self._resolve_blobs([(k, v) for k, v in items.items() if v is not None]), list())
+                    for f, items in fields.items()
+                ]
+                main_info = self._main_storage.get(ctx_id, None)
+                misc_items = self._misc_storage.get(ctx_id, dict())
+                await self.spill_storage.update_context(ctx_id, main_info, field_info)
+                await self.spill_storage.update_misc(ctx_id, list(misc_items.items()), list())
+            self._main_storage.pop(ctx_id, None)
+            self._misc_storage.pop(ctx_id, None)
+            for storage in self._aux_storage.values():
+                storage.pop(ctx_id, None)
+
+    async def _shrink(self) -> None:
+        """
+        Evict the least recently used contexts until the storage fits into the limits.
+        The most recently used context is never evicted.
+        """
+
+        while len(self._contexts) > 1 and (
+            (self.max_contexts is not None and len(self._contexts) > self.max_contexts)
+            or (self.max_bytes is not None and sum(self._field_bytes.values()) > self.max_bytes)
+        ):
+            await self._evict(next(iter(self._contexts)))
+            self._evictions += 1
 
     async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
+        await self._touch(ctx_id)
         return self._main_storage.get(ctx_id, None)
 
     async def _update_context(
@@ -53,35 +279,143 @@ class MemoryContextStorage(DBContextStorage):
         ctx_info: Optional[ContextMainInfo],
         field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
     ) -> None:
+        await self._touch(ctx_id, create=True)
+        self._store(ctx_id, ctx_info, field_info)
+        await self._shrink()
+
+    def _store(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        """
+        Write the context data to memory, accounting the size of the turn items.
+
+        :param ctx_id: Context identifier.
+        :param ctx_info: Context main information, `None` if it is not updated.
+        :param field_info: Context turns information.
+        """
+
         if ctx_info is not None:
             self._main_storage[ctx_id] = ctx_info
         for field_name, items in field_info:
-            self._aux_storage[field_name].setdefault(ctx_id, dict()).update(items)
+            stored = self._aux_storage[field_name].setdefault(ctx_id, dict())
+            delta = sum(_get_size(v) - _get_size(stored.get(k, None)) for k, v in items)
+            stored.update(items)
+            self._field_bytes[field_name] += delta
 
     async def _delete_context(self, ctx_id: str) -> None:
-        self._main_storage.pop(ctx_id, None)
-        for storage in self._aux_storage.values():
-            storage.pop(ctx_id, None)
+        async with self._context_lock(ctx_id):
+            if ctx_id in self._contexts:
+                self._contexts.pop(ctx_id)
+                self._main_storage.pop(ctx_id, None)
+                self._misc_storage.pop(ctx_id, None)
+                for field_name, storage in self._aux_storage.items():
+                    self._field_bytes[field_name] -= sum(_get_size(v) for v in storage.pop(ctx_id, dict()).values())
+            elif self.spill_storage is not None:
+                await self.spill_storage.delete_context(ctx_id)
+
+    async def _delete_turns(self, ctx_id: str, keys: List[int]) -> None:
+        await self._touch(ctx_id)
+        for field_name, storage in self._aux_storage.items():
+            stored = storage.get(ctx_id, dict())
+            self._field_bytes[field_name] -= sum(_get_size(stored.pop(k, None)) for k in keys)
 
     async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
-        select = sorted(
-            [k for k, v in self._aux_storage[field_name].get(ctx_id, dict()).items() if v is not None], reverse=True
-        )
-        if isinstance(self._subscripts[field_name], int):
-            select = select[: self._subscripts[field_name]]
-        elif isinstance(self._subscripts[field_name], Set):
-            select = [k for k in select if k in self._subscripts[field_name]]
-        return [(k, self._aux_storage[field_name][ctx_id][k]) for k in select]
+        await self._touch(ctx_id)
+        return self._select_latest_items(field_name, self._aux_storage[field_name].get(ctx_id, dict()).items())
 
     async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
+        await self._touch(ctx_id)
         return [k for k, v in self._aux_storage[field_name].get(ctx_id, dict()).items() if v is not None]
 
     async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        await self._touch(ctx_id)
         return [
             (k, v) for k, v in self._aux_storage[field_name].get(ctx_id, dict()).items() if k in keys and v is not None
         ]
 
+    async def _load_field_range(self, ctx_id: str, field_name: str, first: int, last: int) -> List[Tuple[int, bytes]]:
+        await self._touch(ctx_id)
+        return [
+            (k, v)
+            for k, v in self._aux_storage[field_name].get(ctx_id, dict()).items()
+            if first <= k <= last and v is not None
+        ]
+
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        await self._touch(ctx_id)
+        fields_info = dict()
+        for field_name, storage in self._aux_storage.items():
+            items = storage.get(ctx_id, dict())
+            keys = [k for k, v in items.items() if v is not None]
+            fields_info[field_name] = (keys, self._select_latest_items(field_name, items.items()))
+        return self._main_storage.get(ctx_id, None), fields_info
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        await self._touch(ctx_id)
+        return list(self._misc_storage.get(ctx_id, dict()).keys())
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        await self._touch(ctx_id)
+        items = self._misc_storage.get(ctx_id, dict())
+        return [(k, items[k]) for k in keys if k in items]
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        await self._touch(ctx_id, create=True)
+        stored = self._misc_storage.setdefault(ctx_id, dict())
+        for k, v in items:
+            if v is None:
+                stored.pop(k, None)
+            else:
+                stored[k] = v
+        await self._shrink()
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return [(k, self._blob_storage[k]) for k in keys if k in self._blob_storage]
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        self._blob_storage.update(items)
+
+    async def _list_blob_keys(self) -> List[str]:
+        return list(self._blob_storage.keys())
+
+    async def _load_blob_references(self, ctx_id: str) -> Set[str]:
+        # Blob references are resolved on eviction, so the evicted contexts are not restored
+        references = set()
+        for storage in self._aux_storage.values():
+            items = {k: v for k, v in storage.get(ctx_id, dict()).items() if k >= 0 or k == self._ARCHIVE_KEY}
+            archive = items.pop(self._ARCHIVE_KEY, None)
+            archived = dict() if archive is None else self._unpack(archive)
+            references |= self._get_blob_keys([*items.values(), *archived.values()])
+        return references
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        for k in keys:
+            self._blob_storage.pop(k, None)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        ctx_ids = list(self._main_storage.keys())
+        if self.spill_storage is not None:
+            ctx_ids += await self.spill_storage.list_context_ids(after, limit)
+        return self._select_context_ids(ctx_ids, after, limit)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        expired = list(islice((c for c, i in self._main_storage.items() if i.updated_at < until), limit))
+        for ctx_id in expired:
+            await self._delete_context(ctx_id)
+        if self.spill_storage is not None and len(expired) < limit:
+            expired += await self.spill_storage.delete_expired(until, limit - len(expired))
+        return expired
+
     async def _clear_all(self) -> None:
         self._main_storage = dict()
+        self._misc_storage = dict()
+        self._blob_storage = dict()
         for key in self._aux_storage.keys():
             self._aux_storage[key] = dict()
+        self._contexts = OrderedDict()
+        self._field_bytes = {field: 0 for field in NameConfig.get_turns_fields}
+        if self.spill_storage is not None:
+            await self.spill_storage.clear_all()
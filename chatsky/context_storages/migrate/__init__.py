@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from .migration import ContextRecord, MigrationStats, migrate, read_context, write_context
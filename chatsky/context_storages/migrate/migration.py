@@ -0,0 +1,345 @@
+"""
+Migration
+---------
+The Migration module implements streaming transfer of contexts between context storages and dumps.
+
+Contexts are read from the source page by page (using :py:meth:`~.DBContextStorage.list_context_ids`)
+and transferred by a number of concurrent workers, so that only a bounded number of contexts
+is kept in memory at a time.
+After every page the migration state is written to a checkpoint file (if it is provided),
+so that an interrupted migration can be resumed from the last completed page.
+
+A dump is a JSON lines file (gzip-compressed if its name ends with ``.gz``),
+every line contains a single context: its main information, all its turn items
+and key-addressable `misc` items (base64-encoded).
+"""
+
+import gzip
+from asyncio import Lock, Semaphore, gather, to_thread
+from base64 import b64decode, b64encode
+from json import dumps, loads
+from logging import getLogger
+from os import replace
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, IO, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+from chatsky.core.ctx_utils import ContextMainInfo
+from ..database import DBContextStorage, NameConfig, context_storage_factory
+
+logger = getLogger(__name__)
+
+
+class ContextRecord(BaseModel):
+    """
+    All the stored data of a single context, as it is transferred during migration.
+    """
+
+    id: str
+    """
+    Context identifier.
+    """
+    main_info: ContextMainInfo
+    """
+    Context main information.
+    """
+    fields: Dict[str, List[Tuple[int, bytes]]] = Field(default_factory=dict)
+    """
+    Dictionary mapping field names to lists of tuples (step number, serialized value).
+    """
+    misc_items: List[Tuple[str, bytes]] = Field(default_factory=list)
+    """
+    List of tuples (key, serialized value) of the key-addressable `misc` items.
+    """
+
+    def to_json(self) -> str:
+        """
+        Serialize the record to a single line of JSON, as it is written to dumps.
+
+        :return: JSON string.
+        """
+
+        main_info = self.main_info.model_dump(mode="python")
+        return dumps(
+            {
+                "id": self.id,
+                "main_info": {
+                    f: b64encode(v).decode("ascii") if isinstance(v, bytes) else v
+                    for f, v in main_info.items()
+                    if f in NameConfig.get_context_main_fields
+                },
+                "fields": {
+                    f: [(k, b64encode(v).decode("ascii")) for k, v in items] for f, items in self.fields.items()
+                },
+                "misc_items": [(k, b64encode(v).decode("ascii")) for k, v in self.misc_items],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "ContextRecord":
+        """
+        Deserialize the record from a line of JSON written by :py:meth:`to_json`.
+
+        :param data: JSON string.
+        :return: Context record.
+        """
+
+        record = loads(data)
+        main_info = {
+            f: b64decode(v) if f in (NameConfig._misc_column, NameConfig._framework_data_column) else v
+            for f, v in record["main_info"].items()
+        }
+        return cls(
+            id=record["id"],
+            main_info=ContextMainInfo.model_validate(main_info),
+            fields={f: [(k, b64decode(v)) for k, v in items] for f, items in record["fields"].items()},
+            misc_items=[(k, b64decode(v)) for k, v in record.get("misc_items", list())],
+        )
+
+
+class MigrationStats(BaseModel):
+    """
+    Throughput metrics of a migration.
+    """
+
+    contexts: int = 0
+    """
+    Number of the migrated contexts.
+    """
+    skipped: int = 0
+    """
+    Number of the listed contexts that were not found in the source (e.g. deleted during migration).
+    """
+    items: int = 0
+    """
+    Number of the migrated turn items.
+    """
+    item_bytes: int = 0
+    """
+    Total size of the migrated turn items in bytes.
+    """
+    elapsed: float = 0.0
+    """
+    Time (in seconds) spent on migration.
+    """
+
+    @property
+    def contexts_per_second(self) -> float:
+        """
+        Average number of contexts migrated per second.
+        """
+
+        return self.contexts / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """
+        Average size of turn items (in bytes) migrated per second.
+        """
+
+        return self.item_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class _Checkpoint(BaseModel):
+    """
+    Migration state, that is saved after every page.
+    """
+
+    after: Optional[str] = None
+    """
+    Identifier of the last migrated context (for storage sources).
+    """
+    position: int = 0
+    """
+    Number of the migrated records (for dump sources).
+    """
+
+
+async def read_context(storage: DBContextStorage, ctx_id: str) -> Optional[ContextRecord]:
+    """
+    Read all the stored data of a context.
+
+    :param storage: Context storage to read from.
+    :param ctx_id: Context identifier.
+    :return: Context record, `None` if the context main information is not found.
+    """
+
+    main_info, fields_info = await storage.load_context_bundle(ctx_id)
+    if main_info is None:
+        return None
+    fields = list(fields_info.keys())
+    items = await gather(*[storage.load_field_items(ctx_id, f, fields_info[f][0]) for f in fields])
+    misc_items = await storage.load_misc_items(ctx_id, await storage.load_misc_keys(ctx_id))
+    return ContextRecord(id=ctx_id, main_info=main_info, fields=dict(zip(fields, items)), misc_items=misc_items)
+
+
+async def write_context(storage: DBContextStorage, record: ContextRecord) -> None:
+    """
+    Write all the data of a context, existing context data is overwritten.
+
+    :param storage: Context storage to write to.
+    :param record: Context record.
+    """
+
+    await storage.update_context(record.id, record.main_info, [(f, i, list()) for f, i in record.fields.items()])
+    await storage.update_misc(record.id, record.misc_items, list())
+
+
+def _open_dump(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _read_dump_page(dump: IO[str], size: int) -> List[ContextRecord]:
+    page = list()
+    while len(page) < size:
+        line = dump.readline()
+        if line == "":
+            break
+        elif line.strip() != "":
+            page += [ContextRecord.from_json(line)]
+    return page
+
+
+def _skip_dump_records(dump: IO[str], count: int) -> None:
+    while count > 0:
+        line = dump.readline()
+        if line == "":
+            break
+        elif line.strip() != "":
+            count -= 1
+
+
+def _write_dump_record(dump: IO[str], record: ContextRecord) -> None:
+    dump.write(record.to_json() + "\n")
+
+
+def _load_checkpoint(path: Optional[Path]) -> _Checkpoint:
+    if path is None or not path.is_file():
+        return _Checkpoint()
+    return _Checkpoint.model_validate_json(path.read_text(encoding="utf-8"))
+
+
+def _save_checkpoint(path: Path, checkpoint: _Checkpoint) -> None:
+    temporary = path.with_name(f"{path.name}.tmp")
+    temporary.write_text(checkpoint.model_dump_json(), encoding="utf-8")
+    replace(temporary, path)
+
+
+def _resolve_endpoint(endpoint: Union[str, Path, DBContextStorage], **kwargs: Any) -> Union[Path, DBContextStorage]:
+    """
+    Convert migration source or destination to either a dump path or a context storage.
+    Strings containing ``://`` are considered to be context storage URIs, other strings are dump paths.
+
+    :param endpoint: Context storage, its URI or a dump path.
+    :param kwargs: Context storage constructor arguments, used if the storage is created from URI.
+    :return: Dump path or context storage.
+    """
+
+    if isinstance(endpoint, DBContextStorage):
+        storage = endpoint
+    elif isinstance(endpoint, Path) or "://" not in endpoint:
+        return Path(endpoint)
+    else:
+        storage = context_storage_factory(endpoint, **kwargs)
+    if storage.serializer is None:
+        raise ValueError(f"{type(storage).__name__} without serialization can not be migrated")
+    return storage
+
+
+async def migrate(
+    source: Union[str, Path, DBContextStorage],
+    destination: Union[str, Path, DBContextStorage],
+    workers: int = 8,
+    page_size: int = 256,
+    checkpoint: Optional[Union[str, Path]] = None,
+    destination_kwargs: Optional[Dict[str, Any]] = None,
+) -> MigrationStats:
+    """
+    Copy all the contexts from the source to the destination.
+    Both source and destination can be either context storages (or their URIs) or dump paths.
+    Storages that are created from URIs are connected and closed by the function itself.
+
+    :param source: Source context storage, its URI or a dump path.
+    :param destination: Destination context storage, its URI or a dump path.
+    :param workers: Number of the contexts transferred concurrently.
+    :param page_size: Number of the contexts listed (or read from dump) at once, checkpoint is saved after every page.
+    :param checkpoint: Path to the checkpoint file, `None` for no checkpointing.
+        If the file exists, migration is resumed from the saved state.
+        The destination dump is appended to in that case.
+    :param destination_kwargs: Constructor arguments for the destination storage, if it is created from URI.
+    :return: Migration throughput metrics.
+    """
+
+    if workers < 1:
+        raise ValueError(f"Invalid workers value: {workers}")
+    if page_size < 1:
+        raise ValueError(f"Invalid page size value: {page_size}")
+    checkpoint = Path(checkpoint) if checkpoint is not None else None
+    state = _load_checkpoint(checkpoint)
+    source_endpoint = _resolve_endpoint(source)
+    destination_endpoint = _resolve_endpoint(destination, **(destination_kwargs or dict()))
+    owned = [e for e, o in ((source_endpoint, source), (destination_endpoint, destination)) if isinstance(o, str)]
+
+    dump_files: List[IO[str]] = list()
+    for endpoint in (source_endpoint, destination_endpoint):
+        if isinstance(endpoint, DBContextStorage) and not endpoint.connected:
+            await endpoint.connect()
+    if isinstance(source_endpoint, Path):
+        source_dump = _open_dump(source_endpoint, "r")
+        dump_files += [source_dump]
+        await to_thread(_skip_dump_records, source_dump, state.position)
+    if isinstance(destination_endpoint, Path):
+        destination_dump = _open_dump(destination_endpoint, "a" if state.position > 0 else "w")
+        dump_files += [destination_dump]
+
+    stats, start = MigrationStats(), perf_counter()
+    semaphore, dump_lock = Semaphore(workers), Lock()
+
+    async def transfer(item: Union[str, ContextRecord]) -> None:
+        async with semaphore:
+            record = await read_context(source_endpoint, item) if isinstance(item, str) else item
+            if record is None:
+                stats.skipped += 1
+                return
+            if isinstance(destination_endpoint, DBContextStorage):
+                await write_context(destination_endpoint, record)
+            else:
+                async with dump_lock:
+                    await to_thread(_write_dump_record, destination_dump, record)
+            stats.contexts += 1
+            stats.items += sum(len(items) for items in record.fields.values())
+            stats.item_bytes += sum(len(v) for items in record.fields.values() for _, v in items)
+
+    try:
+        while True:
+            if isinstance(source_endpoint, DBContextStorage):
+                page = await source_endpoint.list_context_ids(state.after, page_size)
+            else:
+                page = await to_thread(_read_dump_page, source_dump, page_size)
+            if len(page) == 0:
+                break
+            await gather(*[transfer(item) for item in page])
+            last = page[-1]
+            state.after = last if isinstance(last, str) else last.id
+            state.position += len(page)
+            if checkpoint is not None:
+                if isinstance(destination_endpoint, Path):
+                    await to_thread(destination_dump.flush)
+                _save_checkpoint(checkpoint, state)
+            stats.elapsed = perf_counter() - start
+            logger.info(
+                f"Migrated {stats.contexts} contexts, {stats.items} items "
+                f"({stats.contexts_per_second:.1f} contexts/s, {stats.bytes_per_second / 1e6:.2f} MB/s)"
+            )
+    finally:
+        for dump in dump_files:
+            dump.close()
+        for storage in owned:
+            if isinstance(storage, DBContextStorage):
+                await storage.close()
+    stats.elapsed = perf_counter() - start
+    return stats
@@ -0,0 +1,85 @@
+"""
+Retention
+---------
+The Retention module defines the retention policy, that limits the lifetime and the size of the stored contexts.
+
+Contexts that were not updated for longer than :py:attr:`~.RetentionPolicy.ttl` expire.
+The backends that support expiration natively (e.g. `Redis` and `MongoDB`) expire the data by themselves,
+other backends delete expired contexts in batches with a background sweeper task.
+Turns older than :py:attr:`~.RetentionPolicy.max_turns` are removed from the context every time it is stored.
+Turns older than :py:attr:`~.RetentionPolicy.archive_turns` are periodically packed into a single compressed
+archive item per context field, that reduces number of rows (or keys) in the database significantly.
+Archived turns are unpacked transparently when they are requested.
+
+The retention policy can be passed to any :py:class:`~.DBContextStorage`:
+
+.. code-block:: python
+
+    context_storage_factory("redis://:pass@localhost:6379/0", retention=RetentionPolicy(ttl=86400, max_turns=50))
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class RetentionPolicy(BaseModel, frozen=True):
+    """
+    Retention policy of a context storage.
+    """
+
+    ttl: Optional[float] = Field(default=None, gt=0)
+    """
+    Time (in seconds) since the last context update after which the context expires, `None` for no expiration.
+    """
+    max_turns: Optional[int] = Field(default=None, ge=1)
+    """
+    Maximum number of the latest turns kept in every context, `None` for no limit.
+    """
+    archive_turns: Optional[int] = Field(default=None, ge=1)
+    """
+    Number of the latest turns kept as separate items, `None` disables archival.
+    Every `archive_turns` turns the older turns are packed into the context field archive,
+    so that at most `2 * archive_turns` turns are stored separately.
+    Archives are only read while archival is enabled.
+    """
+    sweep_interval: Optional[float] = Field(default=60.0, gt=0)
+    """
+    Interval (in seconds) between the background sweeps of expired contexts, `None` disables background sweeping.
+    Only used if `ttl` is set and the backend doesn't support expiration natively.
+    """
+    batch_size: int = Field(default=1000, ge=1)
+    """
+    Maximum number of contexts deleted in one batch during a sweep.
+    """
+
+
+class RetentionStats(BaseModel):
+    """
+    Metrics of the expired contexts sweeping.
+    """
+
+    sweeps: int = 0
+    """
+    Number of the sweeps performed.
+    """
+    deleted_contexts: int = 0
+    """
+    Total number of the expired contexts deleted.
+    """
+    sweep_time: float = 0.0
+    """
+    Total time (in seconds) spent on sweeping.
+    """
+    last_sweep_time: float = 0.0
+    """
+    Time (in seconds) spent on the last sweep.
+    """
+    last_deleted_contexts: int = 0
+    """
+    Number of the expired contexts deleted during the last sweep.
+    """
+    deleted_blobs: int = 0
+    """
+    Total number of the blobs deleted after the sweeps, since they were no longer referenced.
+    """
@@ -0,0 +1,301 @@
+"""
+Sharded
+-------
+The Sharded module provides a :py:class:`.DBContextStorage` that distributes contexts across several storages.
+
+Every context is stored entirely in one of the shards, chosen by consistent hashing of the context ID.
+That allows scaling the context storage horizontally, adding a shard moves only a small share of contexts.
+
+The storage can be created with :py:func:`~.context_storage_factory`:
+
+.. code-block:: python
+
+    context_storage_factory("sharded://", shards=["redis://:pass@host1:6379/0", "redis://:pass@host2:6379/0"])
+
+Or in a pipeline file:
+
+.. code-block:: yaml
+
+    context_storage:
+      chatsky.context_storages.ShardedContextStorage:
+        shards:
+          - redis://:pass@host1:6379/0
+          - redis://:pass@host2:6379/0
+"""
+
+from asyncio import gather
+from bisect import bisect
+from hashlib import sha256
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from chatsky.core.ctx_utils import ContextMainInfo
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import (
+    DBContextStorage,
+    _CONTEXT_BUNDLE,
+    _CONTEXT_UPDATE,
+    _SUBSCRIPT_DICT,
+    NameConfig,
+    context_storage_factory,
+)
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
+
+logger = getLogger(__name__)
+
+
+class ShardedContextStorage(DBContextStorage):
+    """
+    Implements :py:class:`.DBContextStorage` by routing every operation to one of the shards.
+
+    Every shard is represented by `virtual_nodes` points on a hash ring, a context belongs to the shard
+    owning the first point following the context ID hash.
+    The points are derived from the shard index, so new shards should always be appended to the end of the list.
+
+    Subscripts are shared by all the shards.
+
+    :param path: Storage URI, should be `sharded://`.
+    :param shards: List of shards, either storages or their URIs (created with :py:func:`~.context_storage_factory`).
+    :param rewrite_existing: Whether `TURNS` modified locally should be updated in database or not.
+    :param partial_read_config: Dictionary of subscripts for all possible turn items.
+    :param virtual_nodes: Number of points every shard has on the hash ring.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    """
+
+    is_concurrent: bool = True
+
+    def __init__(
+        self,
+        path: str = "sharded://",
+        shards: Optional[List[Union[str, DBContextStorage]]] = None,
+        rewrite_existing: bool = False,
+        partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
+        virtual_nodes: int = 64,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+    ):
+        DBContextStorage.__init__(
+            self, path, rewrite_existing, partial_read_config, compression, serialization, retention, subscript_policy
+        )
+        if shards is None or len(shards) == 0:
+            raise ValueError("At least one shard should be provided")
+        if virtual_nodes < 1:
+            raise ValueError(f"Invalid virtual nodes value: {virtual_nodes}")
+
+        self.virtual_nodes = virtual_nodes
+        self.shards: List[DBContextStorage] = list()
+        self._ring: List[Tuple[int, int]] = list()
+        self._ring_hashes: List[int] = list()
+        for shard in shards:
+            self._add_to_ring(shard)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(sha256(value.encode("utf-8")).digest()[:8], "big")
+
+    def _add_to_ring(self, shard: Union[str, DBContextStorage]) -> None:
+        if isinstance(shard, str):
+            shard = context_storage_factory(shard)
+        shard._subscripts = self._subscripts
+        index = len(self.shards)
+        self.shards += [shard]
+        self._ring = sorted(self._ring + [(self._hash(f"{index}#{i}"), index) for i in range(self.virtual_nodes)])
+        self._ring_hashes = [h for h, _ in self._ring]
+
+    def _get_shard_index(self, ctx_id: str) -> int:
+        position = bisect(self._ring_hashes, self._hash(ctx_id)) % len(self._ring)
+        return self._ring[position][1]
+
+    def get_shard(self, ctx_id: str) -> DBContextStorage:
+        """
+        Get the shard the given context belongs to.
+
+        :param ctx_id: Context identifier.
+        :return: Shard storage.
+        """
+
+        return self.shards[self._get_shard_index(ctx_id)]
+
+    def _group_by_shard(self, ctx_ids: Iterable[str]) -> Dict[int, List[str]]:
+        """
+        Group context identifiers by the shards they belong to.
+
+        :param ctx_ids: Context identifiers.
+        :return: Dictionary mapping shard indexes to lists of context identifiers.
+        """
+
+        groups: Dict[int, List[str]] = dict()
+        for ctx_id in ctx_ids:
+            groups.setdefault(self._get_shard_index(ctx_id), list()).append(ctx_id)
+        return groups
+
+    async def _connect(self):
+        await gather(*[shard.connect() for shard in self.shards if not shard.connected])
+
+    async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
+        return await self.get_shard(ctx_id).load_main_info(ctx_id)
+
+    async def _update_context(
+        self,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        shard_field_info = [
+            (f, [(k, v) for k, v in items if v is not None], [k for k, v in items if v is None])
+            for f, items in field_info
+        ]
+        await self.get_shard(ctx_id).update_context(ctx_id, ctx_info, shard_field_info)
+
+    async def _update_context_conditional(
+        self,
+        ctx_id: str,
+        ctx_info: ContextMainInfo,
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+        expected_turn_id: int,
+    ) -> None:
+        shard_field_info = [
+            (f, [(k, v) for k, v in items if v is not None], [k for k, v in items if v is None])
+            for f, items in field_info
+        ]
+        await self.get_shard(ctx_id).update_context(ctx_id, ctx_info, shard_field_info, expected_turn_id)
+
+    async def _load_main_info_many(self, ctx_ids: List[str]) -> Dict[str, Optional[ContextMainInfo]]:
+        groups = self._group_by_shard(ctx_ids)
+        results = await gather(*[self.shards[i].load_main_info_many(group) for i, group in groups.items()])
+        return {c: i for result in results for c, i in result.items()}
+
+    async def _update_context_many(self, updates: List[_CONTEXT_UPDATE]) -> None:
+        groups: Dict[int, List] = dict()
+        for ctx_id, ctx_info, field_info in updates:
+            shard_field_info = [
+                (f, [(k, v) for k, v in items if v is not None], [k for k, v in items if v is None])
+                for f, items in field_info
+            ]
+            groups.setdefault(self._get_shard_index(ctx_id), list()).append((ctx_id, ctx_info, shard_field_info))
+        await gather(*[self.shards[i].update_context_many(group) for i, group in groups.items()])
+
+    async def _delete_context(self, ctx_id: str) -> None:
+        await self.get_shard(ctx_id).delete_context(ctx_id)
+
+    async def _delete_turns(self, ctx_id: str, keys: List[int]) -> None:
+        await self.get_shard(ctx_id)._delete_turns(ctx_id, keys)
+
+    async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
+        return await self.get_shard(ctx_id).load_field_latest(ctx_id, field_name)
+
+    async def _load_field_latest_many(self, ctx_ids: List[str], field_name: str) -> Dict[str, List[Tuple[int, bytes]]]:
+        groups = self._group_by_shard(ctx_ids)
+        results = await gather(
+            *[self.shards[i].load_field_latest_many(group, field_name) for i, group in groups.items()]
+        )
+        return {c: items for result in results for c, items in result.items()}
+
+    async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
+        return await self.get_shard(ctx_id).load_field_keys(ctx_id, field_name)
+
+    async def _load_field_key_ranges(self, ctx_id: str, field_name: str) -> List[Tuple[int, int]]:
+        return await self.get_shard(ctx_id).load_field_key_ranges(ctx_id, field_name)
+
+    async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        return await self.get_shard(ctx_id).load_field_items(ctx_id, field_name, keys)
+
+    async def _load_field_range(self, ctx_id: str, field_name: str, first: int, last: int) -> List[Tuple[int, bytes]]:
+        return await self.get_shard(ctx_id).load_field_range(ctx_id, field_name, first, last)
+
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        return await self.get_shard(ctx_id).load_context_bundle(ctx_id)
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        return await self.get_shard(ctx_id).load_misc_keys(ctx_id)
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        return await self.get_shard(ctx_id).load_misc_items(ctx_id, keys)
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        added = [(k, v) for k, v in items if v is not None]
+        await self.get_shard(ctx_id).update_misc(ctx_id, added, [k for k, v in items if v is None])
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        groups = self._group_by_shard(keys)
+        results = await gather(*[self.shards[i]._load_blobs(group) for i, group in groups.items()])
+        return [item for result in results for item in result]
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        groups = dict()
+        for k, v in items:
+            groups.setdefault(self._get_shard_index(k), list()).append((k, v))
+        await gather(*[self.shards[i]._store_blobs(group) for i, group in groups.items()])
+
+    async def _list_blob_keys(self) -> List[str]:
+        return [key for keys in await gather(*[shard._list_blob_keys() for shard in self.shards]) for key in keys]
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        groups = self._group_by_shard(keys)
+        await gather(*[self.shards[i]._delete_blobs(group) for i, group in groups.items()])
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        pages = await gather(*[shard.list_context_ids(after, limit) for shard in self.shards])
+        return self._select_context_ids((c for page in pages for c in page), after, limit)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        expired = list()
+        for shard in self.shards:
+            if len(expired) >= limit:
+                break
+            expired += await shard.delete_expired(until, limit - len(expired))
+        return expired
+
+    async def _clear_all(self) -> None:
+        await gather(*[shard.clear_all() for shard in self.shards])
+
+    @staticmethod
+    async def _migrate_context(ctx_id: str, source: DBContextStorage, target: DBContextStorage) -> None:
+        """
+        Copy all the context data from one storage to another and delete it from the source storage.
+
+        :param ctx_id: Context identifier.
+        :param source: Storage to move the context from.
+        :param target: Storage to move the context to.
+        """
+
+        ctx_info = await source.load_main_info(ctx_id)
+        if ctx_info is None:
+            return
+        field_info = list()
+        for field_name in NameConfig.get_turns_fields:
+            keys = await source.load_field_keys(ctx_id, field_name)
+            field_info += [(field_name, await source.load_field_items(ctx_id, field_name, keys), list())]
+        await target.update_context(ctx_id, ctx_info, field_info)
+        misc_keys = await source.load_misc_keys(ctx_id)
+        if len(misc_keys) > 0:
+            await target.update_misc(ctx_id, await source.load_misc_items(ctx_id, misc_keys), list())
+        await source.delete_context(ctx_id)
+
+    async def add_shard(self, shard: Union[str, DBContextStorage], ctx_ids: Iterable[str]) -> int:
+        """
+        Add a new shard and move the contexts that belong to it now from the other shards.
+        Only the given contexts are checked, so all the stored context IDs should be provided.
+        The storage should not be used by the pipeline while rebalancing.
+
+        :param shard: New shard, storage or its URI.
+        :param ctx_ids: IDs of all the stored contexts.
+        :return: Number of contexts moved.
+        """
+
+        ctx_ids = list(ctx_ids)
+        sources = [self.get_shard(ctx_id) for ctx_id in ctx_ids]
+        self._add_to_ring(shard)
+        if not self.shards[-1].connected:
+            await self.shards[-1].connect()
+        moved = [(c, s) for c, s in zip(ctx_ids, sources) if self.get_shard(c) is not s]
+        logger.info(f"Moving {len(moved)} contexts of {len(ctx_ids)} to the new shard...")
+        await gather(*[self._migrate_context(c, s, self.shards[-1]) for c, s in moved])
+        return len(moved)
@@ -0,0 +1,110 @@
+"""
+Subscripts
+----------
+The Subscripts module defines the adaptive subscript policy, that tunes the number of the latest turn items
+loaded together with a context (see `partial_read_config` of :py:class:`~.DBContextStorage`).
+
+Every context dict connected to a storage records which of the loaded field keys were actually accessed
+(as an offset from the latest key: `0` for the latest item, `1` for the one before it, etc.),
+how many extra item loading requests it made and how many bytes were loaded.
+These statistics are available in :py:attr:`~.DBContextStorage.subscript_stats` for manual tuning.
+If :py:class:`AdaptiveSubscriptPolicy` is passed to the storage, every
+:py:attr:`~.AdaptiveSubscriptPolicy.window` observations the number of the latest items loaded for the field
+is set to the value that minimizes the estimated cost of reading the contexts:
+round trips for loading the missing items plus the bytes of the items loaded in advance.
+
+.. code-block:: python
+
+    context_storage_factory("redis://:pass@localhost:6379/0", subscript_policy=AdaptiveSubscriptPolicy())
+"""
+
+from typing import Dict
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class AdaptiveSubscriptPolicy(BaseModel, frozen=True):
+    """
+    Policy of adjusting the number of the latest items loaded for every context turn field.
+    Only the fields with integer subscripts are adjusted.
+    """
+
+    min_subscript: int = Field(default=1, ge=1)
+    """
+    Minimal number of the latest items to load.
+    """
+    max_subscript: int = Field(default=50, ge=1)
+    """
+    Maximal number of the latest items to load.
+    """
+    round_trip_bytes: int = Field(default=4096, ge=0)
+    """
+    Cost of one extra item loading request, expressed in bytes loaded.
+    Higher values make the policy load more items in advance.
+    """
+    window: int = Field(default=100, ge=1)
+    """
+    Number of observed context dicts after which the subscript is adjusted.
+    """
+
+    @model_validator(mode="after")
+    def _validate_bounds(self) -> "AdaptiveSubscriptPolicy":
+        if self.min_subscript > self.max_subscript:
+            raise ValueError(f"Minimal subscript {self.min_subscript} exceeds maximal one {self.max_subscript}")
+        return self
+
+    def select_subscript(self, max_offsets: Dict[int, int], item_size: float) -> int:
+        """
+        Select the number of the latest items to load, that minimizes the estimated reading cost.
+        Ties are resolved in favor of loading less items.
+
+        :param max_offsets: Histogram of the maximal accessed offsets:
+            dictionary mapping offsets to numbers of context dicts, `-1` for no accesses.
+        :param item_size: Average size of a loaded item in bytes.
+        :return: Number of the latest items to load.
+        """
+
+        observations = sum(max_offsets.values())
+        best_subscript, best_cost = self.min_subscript, None
+        for subscript in range(self.min_subscript, self.max_subscript + 1):
+            round_trips = sum(count for offset, count in max_offsets.items() if offset >= subscript)
+            cost = round_trips * self.round_trip_bytes + subscript * item_size * observations
+            if best_cost is None or cost < best_cost:
+                best_subscript, best_cost = subscript, cost
+        return best_subscript
+
+
+class SubscriptStats(BaseModel):
+    """
+    Access statistics of a context turn field.
+    """
+
+    observations: int = 0
+    """
+    Total number of the observed context dicts.
+    """
+    accessed_items: int = 0
+    """
+    Total number of the accessed items, that were available in storage upon context loading.
+    """
+    extra_loads: int = 0
+    """
+    Total number of the extra item loading requests (made after context loading).
+    """
+    loaded_items: int = 0
+    """
+    Total number of the loaded items.
+    """
+    loaded_bytes: int = 0
+    """
+    Total size of the loaded items in bytes.
+    """
+    max_offsets: Dict[int, int] = Field(default_factory=dict)
+    """
+    Histogram of the maximal accessed offsets since the last adjustment:
+    dictionary mapping offsets to numbers of context dicts, `-1` for no accesses.
+    """
+    adjustments: int = 0
+    """
+    Number of the subscript adjustments performed.
+    """
@@ -12,7 +12,7 @@ take advantage of the scalability and high-availability features provided by the
 
 from asyncio import gather
 from os.path import join
-from typing import Awaitable, Callable, Set, Tuple, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple, List, Optional, Union
 from urllib.parse import urlsplit
 
 try:
@@ -20,19 +20,33 @@ try:
         SerializableReadWrite,
         SchemeError,
         TableDescription,
+        TableIndex,
         Column,
         OptionalType,
         PrimitiveType,
     )
     from ydb.aio import Driver, SessionPool
-    from ydb.table import Session
+    from ydb.table import BaseTxContext, Session
 
     ydb_available = True
 except ImportError:
+    BaseTxContext = Session = Any
+
     ydb_available = False
 
 from chatsky.core.ctx_utils import ContextMainInfo
-from .database import DBContextStorage, _SUBSCRIPT_DICT, NameConfig
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer
+from .database import (
+    DBContextStorage,
+    ConcurrentModificationError,
+    _CONTEXT_BUNDLE,
+    _CONTEXT_UPDATE,
+    _SUBSCRIPT_DICT,
+    NameConfig,
+)
+from .retention import RetentionPolicy
+from .subscripts import AdaptiveSubscriptPolicy
 from .protocol import get_protocol_install_suggestion
 
 
@@ -45,6 +59,15 @@ class YDBContextStorage(DBContextStorage):
 
     `TURNS` table is represented by `turns` table.
     olumns of the table are: `id`, `key`, `label`, `request` and `response`.
+    The `key` column is `Uint32`, unless the table is created with turn archival enabled:
+    archives are stored under negative keys, so `Int32` is used then.
+    Archival can not be enabled for an existing table with `Uint32` keys (its `key` column should be migrated first).
+
+    Key-addressable `misc` items are stored in `misc` table.
+    Columns of the table are: `id`, `key` and `value`.
+
+    Blobs are stored in `blobs` table.
+    Columns of the table are: `key` and `value`.
 
     :param path: Standard sqlalchemy URI string. One of `grpc` or `grpcs` can be chosen as a protocol.
         Example: `grpc://localhost:2134/local`.
@@ -54,10 +77,26 @@ class YDBContextStorage(DBContextStorage):
     :param partial_read_config: Dictionary of subscripts for all possible turn items.
     :param table_name_prefix: "namespace" prefix for the two tables created for context storing.
     :param timeout: Waiting timeout for the database driver.
+    :param compression: Codec (or compression algorithm name) for compressing the stored blobs.
+    :param serialization: Serializer (or serialization format name) for the stored data.
+    :param retention: Retention policy for the stored contexts.
+    :param subscript_policy: Policy of adjusting `partial_read_config` according to the observed accesses.
+    :param blob_threshold: Size (in bytes) of the turn items that are moved to the blob store.
     """
 
     _LIMIT_VAR = "limit"
     _KEY_VAR = "key"
+    _KEYS_VAR = "keys"
+    _VALUE_VAR = "value"
+    _UNTIL_VAR = "until"
+    _IDS_VAR = "ids"
+    _AFTER_VAR = "after"
+    _RANK_VAR = "rank"
+    _FIRST_VAR = "first"
+    _LAST_VAR = "last"
+    _COUNT_VAR = "count"
+    _BLOB_KEYS_PAGE_SIZE = 1000
+    _UPDATED_AT_INDEX = "updated_at_index"
 
     is_concurrent: bool = True
 
@@ -68,8 +107,23 @@ class YDBContextStorage(DBContextStorage):
         partial_read_config: Optional[_SUBSCRIPT_DICT] = None,
         table_name_prefix: str = "chatsky_table",
         timeout: int = 5,
+        compression: Optional[Union[str, CompressionCodec]] = None,
+        serialization: Union[str, Serializer] = "json",
+        retention: Optional[RetentionPolicy] = None,
+        subscript_policy: Optional[AdaptiveSubscriptPolicy] = None,
+        blob_threshold: Optional[int] = None,
     ):
-        DBContextStorage.__init__(self, path, rewrite_existing, partial_read_config)
+        DBContextStorage.__init__(
+            self,
+            path,
+            rewrite_existing,
+            partial_read_config,
+            compression,
+            serialization,
+            retention,
+            subscript_policy,
+            blob_threshold,
+        )
 
         protocol, netloc, self.database, _, _ = urlsplit(path)
         if not ydb_available:
@@ -79,6 +133,10 @@ class YDBContextStorage(DBContextStorage):
         self.table_prefix = table_name_prefix
         self._timeout = timeout
         self._endpoint = f"{protocol}://{netloc}"
+        self._key_type = "Uint32"
+        """
+        Type of the `key` column of the `turns` table, detected upon connection.
+        """
 
     async def _connect(self) -> None:
         self._driver = Driver(endpoint=self._endpoint, database=self.database)
@@ -89,11 +147,20 @@ class YDBContextStorage(DBContextStorage):
         self.pool = SessionPool(self._driver, size=10)
         self.main_table = f"{self.table_prefix}_{NameConfig._main_table}"
         self.turns_table = f"{self.table_prefix}_{NameConfig._turns_table}"
+        self.misc_table = f"{self.table_prefix}_{NameConfig._misc_table}"
+        self.blobs_table = f"{self.table_prefix}_{NameConfig._blobs_table}"
 
         if not await self._does_table_exist(self.main_table):
             await self._create_main_table(self.main_table)
         if not await self._does_table_exist(self.turns_table):
             await self._create_turns_table(self.turns_table)
+        self._key_type = await self._get_key_type(self.turns_table)
+        if self._key_type != "Int32" and self._archival_enabled:
+            raise self._get_unsigned_keys_error()
+        if not await self._does_table_exist(self.misc_table):
+            await self._create_misc_table(self.misc_table)
+        if not await self._does_table_exist(self.blobs_table):
+            await self._create_blobs_table(self.blobs_table)
 
     async def _does_table_exist(self, table_name: str) -> bool:
         async def callee(session: Session) -> None:
@@ -105,6 +172,21 @@ class YDBContextStorage(DBContextStorage):
         except SchemeError:
             return False
 
+    async def _get_key_type(self, table_name: str) -> str:
+        async def callee(session: Session) -> Any:
+            return await session.describe_table(join(self.database, table_name))
+
+        description = await self.pool.retry_operation(callee)
+        column = next(c for c in description.columns if c.name == NameConfig._key_column)
+        key_type = getattr(column.type, "item", column.type)
+        return "Int32" if key_type == PrimitiveType.Int32 else "Uint32"
+
+    def _get_unsigned_keys_error(self) -> ValueError:
+        return ValueError(
+            f"Turn archival requires signed keys, but `{self.turns_table}` table has {self._key_type} keys: "
+            f"migrate its `{NameConfig._key_column}` column to Int32 or disable archival"
+        )
+
     async def _create_main_table(self, table_name: str) -> None:
         async def callee(session: Session) -> None:
             await session.create_table(
@@ -116,18 +198,21 @@ class YDBContextStorage(DBContextStorage):
                 .with_column(Column(NameConfig._updated_at_column, PrimitiveType.Uint64))
                 .with_column(Column(NameConfig._misc_column, PrimitiveType.String))
                 .with_column(Column(NameConfig._framework_data_column, PrimitiveType.String))
+                .with_index(TableIndex(self._UPDATED_AT_INDEX).with_index_columns(NameConfig._updated_at_column))
                 .with_primary_key(NameConfig._id_column),
             )
 
         await self.pool.retry_operation(callee)
 
     async def _create_turns_table(self, table_name: str) -> None:
+        key_type = PrimitiveType.Int32 if self._archival_enabled else PrimitiveType.Uint32
+
         async def callee(session: Session) -> None:
             await session.create_table(
                 "/".join([self.database, table_name]),
                 TableDescription()
                 .with_column(Column(NameConfig._id_column, PrimitiveType.Utf8))
-                .with_column(Column(NameConfig._key_column, PrimitiveType.Uint32))
+                .with_column(Column(NameConfig._key_column, key_type))
                 .with_column(Column(NameConfig._labels_field, OptionalType(PrimitiveType.String)))
                 .with_column(Column(NameConfig._requests_field, OptionalType(PrimitiveType.String)))
                 .with_column(Column(NameConfig._responses_field, OptionalType(PrimitiveType.String)))
@@ -136,6 +221,31 @@ class YDBContextStorage(DBContextStorage):
 
         await self.pool.retry_operation(callee)
 
+    async def _create_misc_table(self, table_name: str) -> None:
+        async def callee(session: Session) -> None:
+            await session.create_table(
+                "/".join([self.database, table_name]),
+                TableDescription()
+                .with_column(Column(NameConfig._id_column, PrimitiveType.Utf8))
+                .with_column(Column(NameConfig._key_column, PrimitiveType.Utf8))
+                .with_column(Column(NameConfig._value_column, PrimitiveType.String))
+                .with_primary_keys(NameConfig._id_column, NameConfig._key_column),
+            )
+
+        await self.pool.retry_operation(callee)
+
+    async def _create_blobs_table(self, table_name: str) -> None:
+        async def callee(session: Session) -> None:
+            await session.create_table(
+                "/".join([self.database, table_name]),
+                TableDescription()
+                .with_column(Column(NameConfig._key_column, PrimitiveType.Utf8))
+                .with_column(Column(NameConfig._value_column, PrimitiveType.String))
+                .with_primary_key(NameConfig._key_column),
+            )
+
+        await self.pool.retry_operation(callee)
+
     async def _load_main_info(self, ctx_id: str) -> Optional[ContextMainInfo]:
         async def callee(session: Session) -> Optional[ContextMainInfo]:
             query = f"""
@@ -162,60 +272,145 @@ class YDBContextStorage(DBContextStorage):
 
         return await self.pool.retry_operation(callee)
 
+    async def _load_main_info_many(self, ctx_ids: List[str]) -> Dict[str, Optional[ContextMainInfo]]:
+        async def callee(session: Session) -> Dict[str, Optional[ContextMainInfo]]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._IDS_VAR} AS List<Utf8>;
+                SELECT {NameConfig._id_column}, {NameConfig._current_turn_id_column}, {NameConfig._created_at_column}, {NameConfig._updated_at_column}, {NameConfig._misc_column}, {NameConfig._framework_data_column}
+                FROM {self.main_table}
+                WHERE {NameConfig._id_column} IN ${self._IDS_VAR};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${self._IDS_VAR}": ctx_ids,
+                },
+                commit_tx=True,
+            )
+            return {
+                row[NameConfig._id_column]: ContextMainInfo.model_validate(
+                    {f: row[f] for f in NameConfig.get_context_main_fields}
+                )
+                for row in result_sets[0].rows
+            }
+
+        return await self.pool.retry_operation(callee)
+
+    async def _execute_update(
+        self,
+        session: Session,
+        transaction: BaseTxContext,
+        ctx_id: str,
+        ctx_info: Optional[ContextMainInfo],
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+    ) -> None:
+        """
+        Execute the queries updating the given context in a transaction.
+
+        :param session: Session the transaction belongs to.
+        :param transaction: Transaction to execute the queries in.
+        :param ctx_id: Context identifier.
+        :param ctx_info: Context main information.
+        :param field_info: Context turns information.
+        """
+
+        if ctx_info is not None:
+            ctx_info_dump = ctx_info.model_dump(mode="python")
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                DECLARE ${NameConfig._current_turn_id_column} AS Uint64;
+                DECLARE ${NameConfig._created_at_column} AS Uint64;
+                DECLARE ${NameConfig._updated_at_column} AS Uint64;
+                DECLARE ${NameConfig._misc_column} AS String;
+                DECLARE ${NameConfig._framework_data_column} AS String;
+                UPSERT INTO {self.main_table} ({NameConfig._id_column}, {NameConfig._current_turn_id_column}, {NameConfig._created_at_column}, {NameConfig._updated_at_column}, {NameConfig._misc_column}, {NameConfig._framework_data_column})
+                VALUES (${NameConfig._id_column}, ${NameConfig._current_turn_id_column}, ${NameConfig._created_at_column}, ${NameConfig._updated_at_column}, ${NameConfig._misc_column}, ${NameConfig._framework_data_column});
+                """  # noqa: E501
+            await transaction.execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                }
+                | {f"${f}": ctx_info_dump[f] for f in NameConfig.get_context_main_fields},
+            )
+        if self._key_type != "Int32" and any(k < 0 for _, items in field_info for k, _ in items):
+            raise self._get_unsigned_keys_error()
+        for field_name, items in field_info:
+            declare, prepare, values = list(), dict(), list()
+            for i, (k, v) in enumerate(items):
+                declare += [f"DECLARE ${self._KEY_VAR}_{i} AS {self._key_type};"]
+                prepare.update({f"${self._KEY_VAR}_{i}": k})
+                if v is not None:
+                    declare += [f"DECLARE ${field_name}_{i} AS String;"]
+                    prepare.update({f"${field_name}_{i}": v})
+                    value_param = f"${field_name}_{i}"
+                else:
+                    value_param = "NULL"
+                values += [f"(${NameConfig._id_column}, ${self._KEY_VAR}_{i}, {value_param})"]
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                {" ".join(declare)}
+                UPSERT INTO {self.turns_table} ({NameConfig._id_column}, {NameConfig._key_column}, {field_name})
+                VALUES {", ".join(values)};
+                """  # noqa: E501
+            await transaction.execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    **prepare,
+                },
+            )
+
     async def _update_context(
         self,
         ctx_id: str,
         ctx_info: Optional[ContextMainInfo],
         field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
     ) -> None:
+        await self._update_context_many([(ctx_id, ctx_info, field_info)])
+
+    async def _update_context_many(self, updates: List[_CONTEXT_UPDATE]) -> None:
         async def callee(session: Session) -> None:
             transaction = await session.transaction(SerializableReadWrite()).begin()
-            if ctx_info is not None:
-                ctx_info_dump = ctx_info.model_dump(mode="python")
-                query = f"""
-                    PRAGMA TablePathPrefix("{self.database}");
-                    DECLARE ${NameConfig._id_column} AS Utf8;
-                    DECLARE ${NameConfig._current_turn_id_column} AS Uint64;
-                    DECLARE ${NameConfig._created_at_column} AS Uint64;
-                    DECLARE ${NameConfig._updated_at_column} AS Uint64;
-                    DECLARE ${NameConfig._misc_column} AS String;
-                    DECLARE ${NameConfig._framework_data_column} AS String;
-                    UPSERT INTO {self.main_table} ({NameConfig._id_column}, {NameConfig._current_turn_id_column}, {NameConfig._created_at_column}, {NameConfig._updated_at_column}, {NameConfig._misc_column}, {NameConfig._framework_data_column})
-                    VALUES (${NameConfig._id_column}, ${NameConfig._current_turn_id_column}, ${NameConfig._created_at_column}, ${NameConfig._updated_at_column}, ${NameConfig._misc_column}, ${NameConfig._framework_data_column});
-                    """  # noqa: E501
-                await transaction.execute(
-                    await session.prepare(query),
-                    {
-                        f"${NameConfig._id_column}": ctx_id,
-                    }
-                    | {f"${f}": ctx_info_dump[f] for f in NameConfig.get_context_main_fields},
-                )
-            for field_name, items in field_info:
-                declare, prepare, values = list(), dict(), list()
-                for i, (k, v) in enumerate(items):
-                    declare += [f"DECLARE ${self._KEY_VAR}_{i} AS Uint32;"]
-                    prepare.update({f"${self._KEY_VAR}_{i}": k})
-                    if v is not None:
-                        declare += [f"DECLARE ${field_name}_{i} AS String;"]
-                        prepare.update({f"${field_name}_{i}": v})
-                        value_param = f"${field_name}_{i}"
-                    else:
-                        value_param = "NULL"
-                    values += [f"(${NameConfig._id_column}, ${self._KEY_VAR}_{i}, {value_param})"]
-                query = f"""
-                    PRAGMA TablePathPrefix("{self.database}");
-                    DECLARE ${NameConfig._id_column} AS Utf8;
-                    {" ".join(declare)}
-                    UPSERT INTO {self.turns_table} ({NameConfig._id_column}, {NameConfig._key_column}, {field_name})
-                    VALUES {", ".join(values)};
-                    """  # noqa: E501
-                await transaction.execute(
-                    await session.prepare(query),
-                    {
-                        f"${NameConfig._id_column}": ctx_id,
-                        **prepare,
-                    },
-                )
+            for ctx_id, ctx_info, field_info in updates:
+                await self._execute_update(session, transaction, ctx_id, ctx_info, field_info)
+            await transaction.commit()
+
+        await self.pool.retry_operation(callee)
+
+    async def _update_context_conditional(
+        self,
+        ctx_id: str,
+        ctx_info: ContextMainInfo,
+        field_info: List[Tuple[str, List[Tuple[int, Optional[bytes]]]]],
+        expected_turn_id: int,
+    ) -> None:
+        async def callee(session: Session) -> None:
+            transaction = await session.transaction(SerializableReadWrite()).begin()
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                SELECT {NameConfig._current_turn_id_column}
+                FROM {self.main_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column};
+                """  # noqa: E501
+            result_sets = await transaction.execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                },
+            )
+            rows = result_sets[0].rows
+            stored_turn_id = rows[0][NameConfig._current_turn_id_column] if len(rows) > 0 else None
+            try:
+                self._check_turn_id(ctx_id, stored_turn_id, expected_turn_id)
+            except ConcurrentModificationError:
+                await transaction.rollback()
+                raise
+            await self._execute_update(session, transaction, ctx_id, ctx_info, field_info)
             await transaction.commit()
 
         await self.pool.retry_operation(callee)
@@ -242,22 +437,89 @@ class YDBContextStorage(DBContextStorage):
         await gather(
             self.pool.retry_operation(construct_callee(self.main_table)),
             self.pool.retry_operation(construct_callee(self.turns_table)),
+            self.pool.retry_operation(construct_callee(self.misc_table)),
         )
 
+    async def _delete_turns(self, ctx_id: str, keys: List[int]) -> None:
+        async def callee(session: Session) -> None:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                DECLARE ${self._KEYS_VAR} AS List<{self._key_type}>;
+                DELETE FROM {self.turns_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column} AND {NameConfig._key_column} IN ${self._KEYS_VAR};
+                """  # noqa: E501
+            await session.transaction(SerializableReadWrite()).execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    f"${self._KEYS_VAR}": keys,
+                },
+                commit_tx=True,
+            )
+
+        await self.pool.retry_operation(callee)
+
+    async def _delete_expired(self, until: int, limit: int) -> List[str]:
+        async def callee(session: Session) -> List[str]:
+            transaction = await session.transaction(SerializableReadWrite()).begin()
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._UNTIL_VAR} AS Uint64;
+                DECLARE ${self._LIMIT_VAR} AS Uint64;
+                SELECT {NameConfig._id_column}
+                FROM {self.main_table} VIEW {self._UPDATED_AT_INDEX}
+                WHERE {NameConfig._updated_at_column} < ${self._UNTIL_VAR}
+                LIMIT ${self._LIMIT_VAR};
+                """  # noqa: E501
+            result_sets = await transaction.execute(
+                await session.prepare(query),
+                {
+                    f"${self._UNTIL_VAR}": until,
+                    f"${self._LIMIT_VAR}": limit,
+                },
+            )
+            expired = [e[NameConfig._id_column] for e in result_sets[0].rows]
+            if len(expired) > 0:
+                query = f"""
+                    PRAGMA TablePathPrefix("{self.database}");
+                    DECLARE ${self._IDS_VAR} AS List<Utf8>;
+                    DELETE FROM {self.main_table}
+                    WHERE {NameConfig._id_column} IN ${self._IDS_VAR};
+                    DELETE FROM {self.turns_table}
+                    WHERE {NameConfig._id_column} IN ${self._IDS_VAR};
+                    DELETE FROM {self.misc_table}
+                    WHERE {NameConfig._id_column} IN ${self._IDS_VAR};
+                    """  # noqa: E501
+                await transaction.execute(
+                    await session.prepare(query),
+                    {
+                        f"${self._IDS_VAR}": expired,
+                    },
+                )
+            await transaction.commit()
+            return expired
+
+        return await self.pool.retry_operation(callee)
+
+    def _prepare_latest_subscript(self, field_name: str) -> Tuple[List[str], Dict[str, int], str, str]:
+        declare, prepare, limit, key = list(), dict(), "", ""
+        if isinstance(self._subscripts[field_name], int):
+            declare += [f"DECLARE ${self._LIMIT_VAR}_{field_name} AS Uint64;"]
+            prepare.update({f"${self._LIMIT_VAR}_{field_name}": self._subscripts[field_name]})
+            limit = f"LIMIT ${self._LIMIT_VAR}_{field_name}"
+        elif isinstance(self._subscripts[field_name], Set):
+            values = list()
+            for i, k in enumerate(self._subscripts[field_name]):
+                declare += [f"DECLARE ${self._KEY_VAR}_{field_name}_{i} AS {self._key_type};"]
+                prepare.update({f"${self._KEY_VAR}_{field_name}_{i}": k})
+                values += [f"${self._KEY_VAR}_{field_name}_{i}"]
+            key = f"AND {NameConfig._key_column} IN ({', '.join(values)})"
+        return declare, prepare, limit, key
+
     async def _load_field_latest(self, ctx_id: str, field_name: str) -> List[Tuple[int, bytes]]:
         async def callee(session: Session) -> List[Tuple[int, bytes]]:
-            declare, prepare, limit, key = list(), dict(), "", ""
-            if isinstance(self._subscripts[field_name], int):
-                declare += [f"DECLARE ${self._LIMIT_VAR} AS Uint64;"]
-                prepare.update({f"${self._LIMIT_VAR}": self._subscripts[field_name]})
-                limit = f"LIMIT ${self._LIMIT_VAR}"
-            elif isinstance(self._subscripts[field_name], Set):
-                values = list()
-                for i, k in enumerate(self._subscripts[field_name]):
-                    declare += [f"DECLARE ${self._KEY_VAR}_{i} AS Uint32;"]
-                    prepare.update({f"${self._KEY_VAR}_{i}": k})
-                    values += [f"${self._KEY_VAR}_{i}"]
-                key = f"AND {NameConfig._key_column} IN ({', '.join(values)})"
+            declare, prepare, limit, key = self._prepare_latest_subscript(field_name)
             query = f"""
                 PRAGMA TablePathPrefix("{self.database}");
                 DECLARE ${NameConfig._id_column} AS Utf8;
@@ -283,6 +545,41 @@ class YDBContextStorage(DBContextStorage):
 
         return await self.pool.retry_operation(callee)
 
+    async def _load_field_latest_many(self, ctx_ids: List[str], field_name: str) -> Dict[str, List[Tuple[int, bytes]]]:
+        async def callee(session: Session) -> Dict[str, List[Tuple[int, bytes]]]:
+            declare, prepare, _, key = self._prepare_latest_subscript(field_name)
+            rank = ""
+            if isinstance(self._subscripts[field_name], int):
+                rank = f"WHERE {self._RANK_VAR} <= ${self._LIMIT_VAR}_{field_name}"
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._IDS_VAR} AS List<Utf8>;
+                {" ".join(declare)}
+                SELECT {NameConfig._id_column}, {NameConfig._key_column}, {field_name}
+                FROM (
+                    SELECT {NameConfig._id_column}, {NameConfig._key_column}, {field_name}, ROW_NUMBER() OVER w AS {self._RANK_VAR}
+                    FROM {self.turns_table}
+                    WHERE {NameConfig._id_column} IN ${self._IDS_VAR} AND {field_name} IS NOT NULL {key}
+                    WINDOW w AS (PARTITION BY {NameConfig._id_column} ORDER BY {NameConfig._key_column} DESC)
+                )
+                {rank}
+                ORDER BY {NameConfig._id_column}, {NameConfig._key_column} DESC;
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${self._IDS_VAR}": ctx_ids,
+                    **prepare,
+                },
+                commit_tx=True,
+            )
+            result: Dict[str, List[Tuple[int, bytes]]] = dict()
+            for e in result_sets[0].rows:
+                result.setdefault(e[NameConfig._id_column], list()).append((e[NameConfig._key_column], e[field_name]))
+            return result
+
+        return await self.pool.retry_operation(callee)
+
     async def _load_field_keys(self, ctx_id: str, field_name: str) -> List[int]:
         async def callee(session: Session) -> List[int]:
             query = f"""
@@ -303,11 +600,73 @@ class YDBContextStorage(DBContextStorage):
 
         return await self.pool.retry_operation(callee)
 
+    async def _load_field_key_ranges(self, ctx_id: str, field_name: str) -> List[Tuple[int, int]]:
+        async def callee(session: Session) -> Tuple[Optional[int], Optional[int], int]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                SELECT MIN({NameConfig._key_column}) AS {self._FIRST_VAR}, MAX({NameConfig._key_column}) AS {self._LAST_VAR}, COUNT(*) AS {self._COUNT_VAR}
+                FROM {self.turns_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column} AND {field_name} IS NOT NULL;
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                },
+                commit_tx=True,
+            )
+            row = result_sets[0].rows[0]
+            return row[self._FIRST_VAR], row[self._LAST_VAR], row[self._COUNT_VAR]
+
+        first, last, count = await self.pool.retry_operation(callee)
+        if count == 0:
+            return list()
+        elif last - first + 1 == count:
+            return [(first, last)]
+        else:
+            return await super()._load_field_key_ranges(ctx_id, field_name)
+
+    async def _load_field_range(self, ctx_id: str, field_name: str, first: int, last: int) -> List[Tuple[int, bytes]]:
+        async def callee(session: Session) -> List[Tuple[int, bytes]]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                DECLARE ${self._FIRST_VAR} AS {self._key_type};
+                DECLARE ${self._LAST_VAR} AS {self._key_type};
+                SELECT {NameConfig._key_column}, {field_name}
+                FROM {self.turns_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column} AND {field_name} IS NOT NULL
+                AND {NameConfig._key_column} BETWEEN ${self._FIRST_VAR} AND ${self._LAST_VAR};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    f"${self._FIRST_VAR}": first,
+                    f"${self._LAST_VAR}": last,
+                },
+                commit_tx=True,
+            )
+            return (
+                [(e[NameConfig._key_column], e[field_name]) for e in result_sets[0].rows]
+                if len(result_sets[0].rows) > 0
+                else list()
+            )
+
+        return await self.pool.retry_operation(callee)
+
     async def _load_field_items(self, ctx_id: str, field_name: str, keys: List[int]) -> List[Tuple[int, bytes]]:
+        if self._key_type != "Int32":
+            # Archive keys are negative, they can not be stored in tables with unsigned keys
+            keys = [k for k in keys if k >= 0]
+            if len(keys) == 0:
+                return list()
+
         async def callee(session: Session) -> List[Tuple[int, bytes]]:
             declare, prepare = list(), dict()
             for i, k in enumerate(keys):
-                declare += [f"DECLARE ${self._KEY_VAR}_{i} AS Uint32;"]
+                declare += [f"DECLARE ${self._KEY_VAR}_{i} AS {self._key_type};"]
                 prepare.update({f"${self._KEY_VAR}_{i}": k})
             query = f"""
                 PRAGMA TablePathPrefix("{self.database}");
@@ -334,6 +693,260 @@ class YDBContextStorage(DBContextStorage):
 
         return await self.pool.retry_operation(callee)
 
+    async def _load_context_bundle(self, ctx_id: str) -> _CONTEXT_BUNDLE:
+        async def callee(session: Session) -> _CONTEXT_BUNDLE:
+            fields = NameConfig.get_turns_fields
+            declare, prepare, latest = list(), dict(), list()
+            for field_name in fields:
+                field_declare, field_prepare, limit, key = self._prepare_latest_subscript(field_name)
+                declare += field_declare
+                prepare.update(field_prepare)
+                latest += [
+                    f"""
+                    SELECT {NameConfig._key_column}, {field_name}
+                    FROM {self.turns_table}
+                    WHERE {NameConfig._id_column} = ${NameConfig._id_column} AND {field_name} IS NOT NULL {key}
+                    ORDER BY {NameConfig._key_column} DESC {limit};
+                    """  # noqa: E501
+                ]
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                {" ".join(declare)}
+                SELECT {", ".join(NameConfig.get_context_main_fields)}
+                FROM {self.main_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column};
+                SELECT {NameConfig._key_column}, {", ".join(f"{f} IS NOT NULL AS {f}" for f in fields)}
+                FROM {self.turns_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column};
+                {"".join(latest)}
+                """  # noqa: E501
+            main_set, keys_set, *latest_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    **prepare,
+                },
+                commit_tx=True,
+            )
+            main_info = (
+                ContextMainInfo.model_validate({f: main_set.rows[0][f] for f in NameConfig.get_context_main_fields})
+                if len(main_set.rows) > 0
+                else None
+            )
+            fields_info = {
+                f: (
+                    [e[NameConfig._key_column] for e in keys_set.rows if e[f]],
+                    [(e[NameConfig._key_column], e[f]) for e in latest_set.rows],
+                )
+                for f, latest_set in zip(fields, latest_sets)
+            }
+            return main_info, fields_info
+
+        return await self.pool.retry_operation(callee)
+
+    async def _load_misc_keys(self, ctx_id: str) -> List[str]:
+        async def callee(session: Session) -> List[str]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                SELECT {NameConfig._key_column}
+                FROM {self.misc_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                },
+                commit_tx=True,
+            )
+            return [e[NameConfig._key_column] for e in result_sets[0].rows]
+
+        return await self.pool.retry_operation(callee)
+
+    async def _load_misc_items(self, ctx_id: str, keys: List[str]) -> List[Tuple[str, bytes]]:
+        async def callee(session: Session) -> List[Tuple[str, bytes]]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                DECLARE ${self._KEYS_VAR} AS List<Utf8>;
+                SELECT {NameConfig._key_column}, {NameConfig._value_column}
+                FROM {self.misc_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column}
+                AND {NameConfig._key_column} IN ${self._KEYS_VAR};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    f"${self._KEYS_VAR}": keys,
+                },
+                commit_tx=True,
+            )
+            return [(e[NameConfig._key_column], e[NameConfig._value_column]) for e in result_sets[0].rows]
+
+        return await self.pool.retry_operation(callee)
+
+    async def _update_misc(self, ctx_id: str, items: List[Tuple[str, Optional[bytes]]]) -> None:
+        async def callee(session: Session) -> None:
+            declare, prepare, values, deleted = list(), dict(), list(), list()
+            for i, (k, v) in enumerate(items):
+                if v is None:
+                    deleted += [k]
+                    continue
+                declare += [f"DECLARE ${self._KEY_VAR}_{i} AS Utf8;", f"DECLARE ${self._VALUE_VAR}_{i} AS String;"]
+                prepare.update({f"${self._KEY_VAR}_{i}": k, f"${self._VALUE_VAR}_{i}": v})
+                values += [f"(${NameConfig._id_column}, ${self._KEY_VAR}_{i}, ${self._VALUE_VAR}_{i})"]
+            upsert = f"""
+                UPSERT INTO {self.misc_table} ({NameConfig._id_column}, {NameConfig._key_column}, {NameConfig._value_column})
+                VALUES {", ".join(values)};
+                """  # noqa: E501
+            delete = f"""
+                DELETE FROM {self.misc_table}
+                WHERE {NameConfig._id_column} = ${NameConfig._id_column} AND {NameConfig._key_column} IN ${self._KEYS_VAR};
+                """  # noqa: E501
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${NameConfig._id_column} AS Utf8;
+                DECLARE ${self._KEYS_VAR} AS List<Utf8>;
+                {" ".join(declare)}
+                {upsert if len(values) > 0 else ""}
+                {delete if len(deleted) > 0 else ""}
+                """  # noqa: E501
+            await session.transaction(SerializableReadWrite()).execute(
+                await session.prepare(query),
+                {
+                    f"${NameConfig._id_column}": ctx_id,
+                    f"${self._KEYS_VAR}": deleted,
+                    **prepare,
+                },
+                commit_tx=True,
+            )
+
+        await self.pool.retry_operation(callee)
+
+    async def _load_blobs(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        async def callee(session: Session) -> List[Tuple[str, bytes]]:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._KEYS_VAR} AS List<Utf8>;
+                SELECT {NameConfig._key_column}, {NameConfig._value_column}
+                FROM {self.blobs_table}
+                WHERE {NameConfig._key_column} IN ${self._KEYS_VAR};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${self._KEYS_VAR}": keys,
+                },
+                commit_tx=True,
+            )
+            return [(e[NameConfig._key_column], e[NameConfig._value_column]) for e in result_sets[0].rows]
+
+        return await self.pool.retry_operation(callee)
+
+    async def _store_blobs(self, items: List[Tuple[str, bytes]]) -> None:
+        async def callee(session: Session) -> None:
+            declare, prepare, values = list(), dict(), list()
+            for i, (k, v) in enumerate(items):
+                declare += [f"DECLARE ${self._KEY_VAR}_{i} AS Utf8;", f"DECLARE ${self._VALUE_VAR}_{i} AS String;"]
+                prepare.update({f"${self._KEY_VAR}_{i}": k, f"${self._VALUE_VAR}_{i}": v})
+                values += [f"(${self._KEY_VAR}_{i}, ${self._VALUE_VAR}_{i})"]
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                {" ".join(declare)}
+                UPSERT INTO {self.blobs_table} ({NameConfig._key_column}, {NameConfig._value_column})
+                VALUES {", ".join(values)};
+                """  # noqa: E501
+            await session.transaction(SerializableReadWrite()).execute(
+                await session.prepare(query),
+                prepare,
+                commit_tx=True,
+            )
+
+        await self.pool.retry_operation(callee)
+
+    async def _list_blob_keys(self) -> List[str]:
+        # Result sets are truncated, so the keys are listed page by page
+        def construct_callee(after: str) -> Callable[[Session], Awaitable[List[str]]]:
+            async def callee(session: Session) -> List[str]:
+                query = f"""
+                    PRAGMA TablePathPrefix("{self.database}");
+                    DECLARE ${self._AFTER_VAR} AS Utf8;
+                    DECLARE ${self._LIMIT_VAR} AS Uint64;
+                    SELECT {NameConfig._key_column}
+                    FROM {self.blobs_table}
+                    WHERE {NameConfig._key_column} > ${self._AFTER_VAR}
+                    ORDER BY {NameConfig._key_column}
+                    LIMIT ${self._LIMIT_VAR};
+                    """  # noqa: E501
+                result_sets = await session.transaction().execute(
+                    await session.prepare(query),
+                    {
+                        f"${self._AFTER_VAR}": after,
+                        f"${self._LIMIT_VAR}": self._BLOB_KEYS_PAGE_SIZE,
+                    },
+                    commit_tx=True,
+                )
+                return [e[NameConfig._key_column] for e in result_sets[0].rows]
+
+            return callee
+
+        keys = list()
+        while True:
+            page = await self.pool.retry_operation(construct_callee(keys[-1] if len(keys) > 0 else ""))
+            keys += page
+            if len(page) < self._BLOB_KEYS_PAGE_SIZE:
+                return keys
+
+    async def _delete_blobs(self, keys: List[str]) -> None:
+        async def callee(session: Session) -> None:
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._KEYS_VAR} AS List<Utf8>;
+                DELETE FROM {self.blobs_table}
+                WHERE {NameConfig._key_column} IN ${self._KEYS_VAR};
+                """  # noqa: E501
+            await session.transaction(SerializableReadWrite()).execute(
+                await session.prepare(query),
+                {
+                    f"${self._KEYS_VAR}": keys,
+                },
+                commit_tx=True,
+            )
+
+        await self.pool.retry_operation(callee)
+
+    async def _list_context_ids(self, after: Optional[str], limit: int) -> List[str]:
+        async def callee(session: Session) -> List[str]:
+            declare, prepare, condition = list(), dict(), ""
+            if after is not None:
+                declare += [f"DECLARE ${self._AFTER_VAR} AS Utf8;"]
+                prepare.update({f"${self._AFTER_VAR}": after})
+                condition = f"WHERE {NameConfig._id_column} > ${self._AFTER_VAR}"
+            query = f"""
+                PRAGMA TablePathPrefix("{self.database}");
+                DECLARE ${self._LIMIT_VAR} AS Uint64;
+                {" ".join(declare)}
+                SELECT {NameConfig._id_column}
+                FROM {self.main_table}
+                {condition}
+                ORDER BY {NameConfig._id_column}
+                LIMIT ${self._LIMIT_VAR};
+                """  # noqa: E501
+            result_sets = await session.transaction().execute(
+                await session.prepare(query),
+                {
+                    f"${self._LIMIT_VAR}": limit,
+                    **prepare,
+                },
+                commit_tx=True,
+            )
+            return [e[NameConfig._id_column] for e in result_sets[0].rows]
+
+        return await self.pool.retry_operation(callee)
+
     async def _clear_all(self) -> None:
         def construct_callee(table_name: str) -> Callable[[Session], Awaitable[None]]:
             async def callee(session: Session) -> None:
@@ -348,4 +961,6 @@ class YDBContextStorage(DBContextStorage):
         await gather(
             self.pool.retry_operation(construct_callee(self.main_table)),
             self.pool.retry_operation(construct_callee(self.turns_table)),
+            self.pool.retry_operation(construct_callee(self.misc_table)),
+            self.pool.retry_operation(construct_callee(self.blobs_table)),
         )
@@ -25,9 +25,10 @@ from chatsky.core.message import (
     MediaGroup,
 )
 from chatsky.core.pipeline import Pipeline
+from chatsky.core.concurrency import ContextLockManager, ContextLockStats, OptimisticConcurrencyPolicy
 from chatsky.core.script import Node, Flow, Script
 from chatsky.core.script_function import BaseCondition, BaseResponse, BaseDestination, BaseProcessing, BasePriority
 from chatsky.core.script_function import AnyCondition, AnyResponse, AnyDestination, AnyPriority
 from chatsky.core.transition import Transition
 from chatsky.core.node_label import NodeLabel, NodeLabelInitTypes, AbsoluteNodeLabel, AbsoluteNodeLabelInitTypes
-from chatsky.core.script import GLOBAL, LOCAL, RESPONSE, TRANSITIONS, MISC, PRE_RESPONSE, PRE_TRANSITION
+from chatsky.core.script import GLOBAL, LOCAL, RESPONSE, TRANSITIONS, MISC, PRE_RESPONSE, PRE_TRANSITION, PREFETCH
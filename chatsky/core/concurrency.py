@@ -0,0 +1,133 @@
+"""
+Concurrency
+-----------
+The Concurrency module defines the ways of processing concurrent requests to the same context.
+
+Within a single process, :py:class:`ContextLockManager` serializes the turns of the same context,
+while the turns of different contexts are processed concurrently.
+
+When several pipeline workers share a single context storage, :py:class:`OptimisticConcurrencyPolicy`
+makes the contexts stored conditionally: if the context was stored by another worker since it was loaded,
+the turn is processed again on top of the fresh context instead of overwriting it.
+"""
+
+from asyncio import Lock
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import AsyncIterator, Dict
+
+from pydantic import BaseModel, Field
+
+
+class OptimisticConcurrencyPolicy(BaseModel, frozen=True):
+    """
+    Policy of retrying the turns that conflicted with a concurrent update of the same context.
+
+    Note that all the services of the turn are executed again on retry,
+    so their side effects (if any) may be repeated.
+    """
+
+    max_retries: int = Field(3, ge=0)
+    """
+    Maximum number of times the turn is processed again, before the conflict error is raised.
+    """
+    backoff: float = Field(0.01, ge=0)
+    """
+    Delay (in seconds) before the first retry, it is doubled with every next retry.
+    """
+
+
+class ContextLockStats(BaseModel):
+    """
+    Usage statistics of :py:class:`ContextLockManager`.
+    """
+
+    locks: int = 0
+    """
+    Number of the locks currently held or waited for.
+    """
+    acquisitions: int = 0
+    """
+    Number of the acquired locks.
+    """
+    contentions: int = 0
+    """
+    Number of the acquisitions that had to wait for another turn of the same context.
+    """
+    total_wait: float = 0.0
+    """
+    Total time (in seconds) spent waiting for the locks.
+    """
+    max_wait: float = 0.0
+    """
+    Maximum time (in seconds) spent waiting for a lock.
+    """
+
+
+class _LockEntry:
+    """
+    Lock of a single key together with the number of its holders and waiters.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.users = 0
+
+
+class ContextLockManager:
+    """
+    Keyed asynchronous lock: turns holding the same key are executed one by one,
+    turns holding different keys do not affect each other.
+
+    A lock exists only while it is held or waited for, so the memory used is bounded
+    by the number of the contexts being processed concurrently.
+    Lock usage can be inspected with :py:meth:`get_stats`.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, _LockEntry] = dict()
+        self._acquisitions = 0
+        self._contentions = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def get_stats(self) -> ContextLockStats:
+        """
+        Get the lock usage statistics.
+
+        :return: Current number of locks, acquisition counters and wait times.
+        """
+
+        return ContextLockStats(
+            locks=len(self._locks),
+            acquisitions=self._acquisitions,
+            contentions=self._contentions,
+            total_wait=self._total_wait,
+            max_wait=self._max_wait,
+        )
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        """
+        Hold the lock of the given key for the duration of the context manager.
+
+        :param key: Lock key (e.g. context identifier).
+        """
+
+        entry = self._locks.get(key, None)
+        if entry is None:
+            entry = self._locks[key] = _LockEntry()
+        entry.users += 1
+        contended, start = entry.lock.locked(), perf_counter()
+        try:
+            async with entry.lock:
+                wait = perf_counter() - start
+                self._acquisitions += 1
+                self._contentions += int(contended)
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[key]
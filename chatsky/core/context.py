@@ -20,7 +20,7 @@ from __future__ import annotations
 from asyncio import gather
 from uuid import uuid4
 from time import time_ns
-from typing import Any, Callable, Iterable, Optional, Dict, TYPE_CHECKING, Tuple, overload
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Dict, TYPE_CHECKING, Tuple, overload
 import logging
 
 from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
@@ -28,8 +28,8 @@ from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
 from chatsky.context_storages.database import DBContextStorage, NameConfig
 from chatsky.core.message import Message
 from chatsky.core.node_label import AbsoluteNodeLabel
-from chatsky.core.ctx_dict import LabelContextDict, MessageContextDict
-from chatsky.core.ctx_utils import ContextError, FrameworkData, ContextMainInfo
+from chatsky.core.ctx_dict import LabelContextDict, MessageContextDict, MiscContextDict
+from chatsky.core.ctx_utils import ContextError, FrameworkData, ContextMainInfo, parse_prefetch_hint
 
 if TYPE_CHECKING:
     from chatsky.core.script import Node
@@ -78,6 +78,19 @@ class Context(ContextMainInfo):
     """
     Context storage this context is connected to (if any).
     """
+    _loaded_turn_id: int = PrivateAttr(0)
+    """
+    `current_turn_id` of the context when it was last loaded from or stored in the context storage.
+    """
+    _main_hashes: Dict[str, int] = PrivateAttr(default_factory=dict)
+    """
+    Hashes of the serialized `misc` and `framework_data` as they were last loaded from or stored in the storage,
+    used for skipping the unchanged ones when storing.
+    """
+    _lazy_misc: MiscContextDict = PrivateAttr(default_factory=MiscContextDict)
+    """
+    Custom data stored item by item, see :py:attr:`lazy_misc`.
+    """
 
     @classmethod
     async def connected(
@@ -103,6 +116,7 @@ class Context(ContextMainInfo):
             instance.responses = await MessageContextDict.new(storage, uid, NameConfig._responses_field)
             instance.labels = await LabelContextDict.new(storage, uid, NameConfig._labels_field)
             await instance.labels.update({0: start_label})
+            instance._lazy_misc = MiscContextDict.connected(storage, uid, new=True)
             instance._storage = storage
             return instance
         else:
@@ -110,11 +124,15 @@ class Context(ContextMainInfo):
                 logger.warning(f"Id is not a string: {id}. Converting to string.")
                 id = str(id)
             logger.debug(f"Connected context created with uid: {id}")
-            main, labels, requests, responses = await gather(
-                storage.load_main_info(id),
-                LabelContextDict.connected(storage, id, NameConfig._labels_field),
-                MessageContextDict.connected(storage, id, NameConfig._requests_field),
-                MessageContextDict.connected(storage, id, NameConfig._responses_field),
+            main, fields_info = await storage.load_context_bundle(id)
+            labels = LabelContextDict.from_loaded(
+                storage, id, NameConfig._labels_field, *fields_info[NameConfig._labels_field]
+            )
+            requests = MessageContextDict.from_loaded(
+                storage, id, NameConfig._requests_field, *fields_info[NameConfig._requests_field]
+            )
+            responses = MessageContextDict.from_loaded(
+                storage, id, NameConfig._responses_field, *fields_info[NameConfig._responses_field]
             )
             if main is None:
                 crt_at = upd_at = time_ns()
@@ -140,7 +158,10 @@ class Context(ContextMainInfo):
                 requests=requests,
                 responses=responses,
             )
+            instance._lazy_misc = MiscContextDict.connected(storage, id, new=main is None)
             instance._storage = storage
+            instance._loaded_turn_id = current_turn_id
+            instance._main_hashes = dict() if main is None else dict(main._loaded_hashes)
             return instance
 
     async def delete(self) -> None:
@@ -171,7 +192,7 @@ class Context(ContextMainInfo):
 
         if len(self.labels) == 0:
             raise ContextError("Labels are empty.")
-        return self.labels._items[self.labels.keys()[-1]]
+        return self.labels._get_loaded(self.labels.last_keys(1)[0])
 
     @property
     def last_response(self) -> Optional[Message]:
@@ -186,7 +207,7 @@ class Context(ContextMainInfo):
 
         if len(self.responses) == 0:
             return None
-        return self.responses._items[self.responses.keys()[-1]]
+        return self.responses._get_loaded(self.responses.last_keys(1)[0])
 
     @property
     def last_request(self) -> Message:
@@ -202,7 +223,22 @@ class Context(ContextMainInfo):
 
         if len(self.requests) == 0:
             raise ContextError("Requests are empty.")
-        return self.requests._items[self.requests.keys()[-1]]
+        return self.requests._get_loaded(self.requests.last_keys(1)[0])
+
+    @property
+    def lazy_misc(self) -> MiscContextDict:
+        """
+        Custom data, that is loaded from the context storage item by item upon querying.
+        Unlike :py:attr:`misc`, only the queried items are loaded and only the modified ones are written back,
+        so it should be preferred for large data of which only a few keys are used on every turn.
+
+        **Examples:**
+
+            1. ``await ctx.lazy_misc.get("cache", dict())`` -- load an item;
+            2. ``ctx.lazy_misc["cache"] = cache`` -- set an item.
+        """
+
+        return self._lazy_misc
 
     @property
     def pipeline(self) -> Pipeline:
@@ -230,7 +266,7 @@ class Context(ContextMainInfo):
         """
         An instance of class is returned by :py:attr:`~Context.turns`.
 
-        This class only defines a ``__getitem__`` method.
+        This class defines a ``__getitem__`` method and an :py:meth:`iter` method.
 
         Key for the method may be a single value or a slice.
 
@@ -254,7 +290,9 @@ class Context(ContextMainInfo):
 
             1. ``await ctx.turns[0] == None, start_label, None``;
             2. ``await ctx.turns[-2]`` -- request, label, response of the second to last turn;
-            3. ``for request, label, response in await ctx.turns[-5:]`` -- iterate over the last 5 turns.
+            3. ``for request, label, response in await ctx.turns[-5:]`` -- iterate over the last 5 turns;
+            4. ``async for request, label, response in ctx.turns.iter(reverse=True, page_size=50)`` --
+               iterate over all the turns from the last one, loading them 50 at a time.
         """
 
         def __init__(self, ctx: Context):
@@ -278,6 +316,35 @@ class Context(ContextMainInfo):
             else:
                 return tuple(result)
 
+        async def iter(
+            self, reverse: bool = False, page_size: int = 100, retain: bool = True
+        ) -> AsyncIterator[Tuple[Message, AbsoluteNodeLabel, Message]]:
+            """
+            Iterate over all the turns from 0 to the current turn id,
+            loading the missing items from the storage page by page.
+
+            :param reverse: Whether to iterate from the current turn to the start turn.
+            :param page_size: Number of the turns loaded in one request (per field).
+            :param retain: Whether the loaded items are kept in the context after iteration.
+                If `False`, memory usage is bounded by the page size regardless of the dialog length,
+                see :py:meth:`~.ContextDict.iter`.
+            :return: Asynchronous iterator over tuples (request, label, response).
+            """
+
+            if page_size < 1:
+                raise ValueError(f"Invalid page size value: {page_size}")
+            turn_ids = range(self.ctx.current_turn_id + 1)
+            turn_ids = turn_ids[::-1] if reverse else turn_ids
+            for start in range(0, len(turn_ids), page_size):
+                page = list(turn_ids[start : start + page_size])  # noqa: E203
+                result = await gather(
+                    self.ctx.requests._load_page(page, retain),
+                    self.ctx.labels._load_page(page, retain),
+                    self.ctx.responses._load_page(page, retain),
+                )
+                for turn in zip(*result):
+                    yield turn
+
     @property
     def turns(self) -> _Turns:
         """
@@ -340,16 +407,46 @@ class Context(ContextMainInfo):
         else:
             raise ValueError(f"Unknown type of Context value: {type(value).__name__}.")
 
-    async def store(self) -> None:
+    async def prefetch(self, hints: Iterable[str]) -> None:
+        """
+        Load the context turn items, required by the prefetch hints, in advance.
+        Items of every field are loaded in one request, all the fields are loaded simultaneously.
+        See :py:func:`~chatsky.core.ctx_utils.parse_prefetch_hint` for the hints format.
+
+        :param hints: Prefetch hints, e.g. ``["requests[-10:]", "labels[-3:]"]``.
+        """
+
+        counts: Dict[str, Optional[int]] = dict()
+        for hint in hints:
+            field, count = parse_prefetch_hint(hint)
+            if field not in counts:
+                counts[field] = count
+            elif counts[field] is not None:
+                counts[field] = None if count is None else max(counts[field], count)
+        if len(counts) > 0:
+            logger.debug(f"Prefetching context {self.id} items: {counts}")
+            await gather(*[getattr(self, field).prefetch(count) for field, count in counts.items()])
+
+    async def store(self, check_version: bool = False) -> None:
         """
         Store connected context in the context storage.
         Depending on the context storage settings ("rewrite_existing" flag in particular),
         either only write new and deleted values or also modify the changed ones.
+        If the context storage retention policy limits number of turns, older turns are deleted.
         All the context storage tables are updated asynchronously and simultaneously.
+        Modified :py:attr:`lazy_misc` items are written after that, only if the context was written successfully.
+
+        :param check_version: Whether to write the context only if it was not stored by anyone else
+            since it was loaded (i.e. its stored `current_turn_id` did not change).
+        :raises ConcurrentModificationError: If `check_version` is set and the context was modified concurrently.
         """
 
         if self._storage is not None:
             logger.debug(f"Storing context: {self.id}...")
+            retention = self._storage.retention
+            if retention is not None and retention.max_turns is not None:
+                for ctx_dict in (self.labels, self.requests, self.responses):
+                    ctx_dict.discard_before(self.current_turn_id - retention.max_turns + 1)
             main_into = ContextMainInfo(
                 current_turn_id=self.current_turn_id,
                 created_at=self.created_at,
@@ -357,10 +454,24 @@ class Context(ContextMainInfo):
                 misc=self.misc,
                 framework_data=self.framework_data,
             )
+            main_into._hashes = self._main_hashes
             labels_data = self.labels.extract_sync()
             requests_data = self.requests.extract_sync()
             responses_data = self.responses.extract_sync()
-            await self._storage.update_context(self.id, main_into, [labels_data, requests_data, responses_data])
+            try:
+                await self._storage.update_context(
+                    self.id,
+                    main_into,
+                    [labels_data, requests_data, responses_data],
+                    self._loaded_turn_id if check_version else None,
+                )
+            except Exception:
+                # Hashes might have been updated before the failed write
+                self._main_hashes = dict()
+                raise
+            self._loaded_turn_id = self.current_turn_id
+            misc_added, misc_removed = self._lazy_misc.extract_sync()
+            await self._storage.update_misc(self.id, misc_added, misc_removed)
             logger.debug(f"Context stored: {self.id}")
         else:
             raise RuntimeError(f"{type(self).__name__} is not attached to any context storage.")
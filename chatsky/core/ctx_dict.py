@@ -7,10 +7,12 @@ This module defines classes for lazy context data loading.
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from asyncio import gather
-from hashlib import sha256
+from copy import deepcopy
+from itertools import islice
 import logging
 from typing import (
     Any,
+    AsyncIterator,
     Callable,
     Dict,
     Iterable,
@@ -29,16 +31,38 @@ from pydantic import BaseModel, PrivateAttr, TypeAdapter, model_serializer, mode
 
 from chatsky.core.message import Message
 from chatsky.core.node_label import AbsoluteNodeLabel
+from chatsky.utils.key_ranges import KeyRanges
 from chatsky.utils.logging import collapse_num_list
+from chatsky.utils.serialization import loads
 
 if TYPE_CHECKING:
     from chatsky.context_storages.database import DBContextStorage
 
 logger = logging.getLogger(__name__)
 
+_LABEL_ADAPTER = TypeAdapter(AbsoluteNodeLabel)
+_MESSAGE_ADAPTER = TypeAdapter(Message)
+_ANY_ADAPTER = TypeAdapter(Any)
+_MISSING = object()
 
-def _get_hash(string: bytes) -> bytes:
-    return sha256(string).digest()
+
+def _get_hash(string: bytes) -> int:
+    # Hashes are only compared within the process, so fast non-cryptographic builtin hash is enough.
+    return hash(string)
+
+
+def _get_fingerprint(value: Union[bytes, BaseModel]) -> Union[int, BaseModel]:
+    # Objects kept by storages without serialization are never modified, so they are used for comparison as is
+    return _get_hash(value) if isinstance(value, bytes) else value
+
+
+def _get_size(value: Union[bytes, BaseModel]) -> int:
+    return len(value) if isinstance(value, bytes) else 0
+
+
+def _snapshot(value: BaseModel) -> BaseModel:
+    # Frozen values can be shared safely, other ones are copied to isolate the stored objects from the contexts
+    return value if value.model_config.get("frozen", False) else value.model_copy(deep=True)
 
 
 class ContextDict(ABC, BaseModel):
@@ -54,6 +78,8 @@ class ContextDict(ABC, BaseModel):
     1. ``await ctx.labels[0]`` returns label at turn 0 (start label).
     2. ``await ctx.requests[1:4]`` returns the first 3 requests (requests at turns 1, 2, 3).
     3. ``ctx.responses[2:5:2] = Message("2"), Message("4")`` sets responses at turns 2 and 4.
+    4. ``async for key, request in ctx.requests.iter(page_size=50)`` iterates over all the requests,
+       loading them 50 at a time.
 
     Get operation is asynchronous (and requires ``await``) since it calls
     :py:meth:`_load_items` in order to get items that need to be loaded from DB.
@@ -64,12 +90,20 @@ class ContextDict(ABC, BaseModel):
     Dictionary of already loaded from storage items.
     """
 
-    _hashes: Dict[int, int] = PrivateAttr(default_factory=dict)
+    _hashes: Dict[int, Union[int, BaseModel]] = PrivateAttr(default_factory=dict)
     """
     Hashes of the loaded items (as they were upon loading), only used if `rewrite_existing` flag is enabled.
+    If the storage keeps objects without serialization, the stored objects are kept instead of hashes.
     """
 
-    _keys: Set[int] = PrivateAttr(default_factory=set)
+    _accessed: Set[int] = PrivateAttr(default_factory=set)
+    """
+    Keys of the items that were handed out (e.g. by `__getitem__` or `get`) or set locally
+    since the last synchronization. Only these items could have been modified in place,
+    so only they are checked for modifications if `rewrite_existing` flag is enabled.
+    """
+
+    _keys: KeyRanges = PrivateAttr(default_factory=KeyRanges)
     """
     All the item keys available either in storage or locally.
     """
@@ -93,6 +127,22 @@ class ContextDict(ABC, BaseModel):
     Context storage for item synchronization.
     """
 
+    _initial_keys: KeyRanges = PrivateAttr(default_factory=KeyRanges)
+    """
+    Keys available in storage upon loading, used for access statistics.
+    Cleared once the statistics are reported to the storage.
+    """
+
+    _access_offsets: Set[int] = PrivateAttr(default_factory=set)
+    """
+    Offsets of the accessed initial keys from the latest initial key.
+    """
+
+    _load_stats: List[int] = PrivateAttr(default_factory=lambda: [0, 0, 0])
+    """
+    Number of extra item loading requests, number of loaded items and their total size in bytes.
+    """
+
     _ctx_id: str = PrivateAttr(default_factory=str)
     """
     Corresponding context ID.
@@ -142,21 +192,49 @@ class ContextDict(ABC, BaseModel):
         """
 
         logger.debug(f"Connected context dict created for {id}, {field}")
-        keys, items = await gather(storage.load_field_keys(id, field), storage.load_field_latest(id, field))
+        ranges, items = await gather(storage.load_field_key_ranges(id, field), storage.load_field_latest(id, field))
+        return cls.from_loaded(storage, id, field, KeyRanges.from_ranges(ranges), items)
+
+    @classmethod
+    def from_loaded(
+        cls,
+        storage: DBContextStorage,
+        id: str,
+        field: str,
+        keys: Union[Iterable[int], KeyRanges],
+        items: List[Tuple[int, bytes]],
+    ) -> "ContextDict":
+        """
+        Create a new context dict, connected to the context storage, from the already loaded data.
+        Used when the keys and items were loaded from the storage in advance
+        (e.g. by :py:meth:`~.DBContextStorage.load_context_bundle`).
+
+        :param storage: Context storage, keeping the current context.
+        :param id: Newly created context ID.
+        :param field: Current dict field name.
+        :param keys: All the field keys available in storage (either an iterable or a key set).
+        :param items: The field items that should be available locally.
+        :return: New "connected" context dict.
+        """
+
+        keys = keys if isinstance(keys, KeyRanges) else KeyRanges(keys)
         val_key_items = [(k, v) for k, v in items if v is not None]
-        logger.debug(f"Context dict for {id}, {field} loaded: {collapse_num_list(keys)}")
+        logger.debug(f"Context dict for {id}, {field} loaded: {keys.ranges}")
         instance = cls()
         instance._storage = storage
         instance._ctx_id = id
         instance._field_name = field
-        instance._keys = set(keys)
-        instance._items = {k: instance._value_type.validate_json(v) for k, v in val_key_items}
-        instance._hashes = {k: _get_hash(v) for k, v in val_key_items} if storage.rewrite_existing else dict()
+        instance._keys = keys
+        instance._initial_keys = keys.copy()
+        instance._load_stats = [0, len(val_key_items), sum(_get_size(v) for _, v in val_key_items)]
+        instance._items = {k: instance._load(v) for k, v in val_key_items}
+        instance._hashes = {k: _get_fingerprint(v) for k, v in val_key_items} if storage.rewrite_existing else dict()
         return instance
 
     async def _load_items(self, keys: List[int]) -> None:
         """
         Load items for the given keys from the connected context storage.
+        Contiguous keys are loaded as a range, see :py:meth:`~.DBContextStorage.load_field_range`.
         Update the `_items` and `_hashes` fields if necessary.
         NB! If not all the requested items are available,
         only the successfully loaded will be updated and no error will be raised.
@@ -167,14 +245,21 @@ class ContextDict(ABC, BaseModel):
         logger.debug(
             f"Context dict for {self._ctx_id}, {self._field_name} loading extra items: {collapse_num_list(keys)}..."
         )
-        items = await self._storage.load_field_items(self._ctx_id, self._field_name, keys)
+        first, last = min(keys), max(keys)
+        if len(keys) > 1 and last - first + 1 == len(set(keys)):
+            items = await self._storage.load_field_range(self._ctx_id, self._field_name, first, last)
+        else:
+            items = await self._storage.load_field_items(self._ctx_id, self._field_name, keys)
         logger.debug(
             f"Context dict for {self._ctx_id}, {self._field_name} extra items loaded: {collapse_num_list(keys)}"
         )
+        self._load_stats[0] += 1
         for key, value in items:
-            self._items[key] = self._value_type.validate_json(value)
+            self._load_stats[1] += 1
+            self._load_stats[2] += _get_size(value)
+            self._items[key] = self._load(value)
             if self._storage.rewrite_existing:
-                self._hashes[key] = _get_hash(value)
+                self._hashes[key] = _get_fingerprint(value)
 
     @overload
     async def __getitem__(self, key: int) -> BaseModel: ...  # noqa: E704
@@ -188,6 +273,7 @@ class ContextDict(ABC, BaseModel):
                 raise KeyError(f"Key {key} does not exist.")
             if self._storage is not None and key not in self._items:
                 await self._load_items([key])
+            self._track_access((key,))
             return self._items[key]
 
         elif isinstance(key, slice):
@@ -202,6 +288,7 @@ class ContextDict(ABC, BaseModel):
             if self._storage is not None and keys_to_load:
                 await self._load_items(keys_to_load)
 
+            self._track_access(slice_keys)
             return tuple(self._items[k] for k in slice_keys)
         else:
             raise TypeError(f"Key must be either an integer or an iterable of integers: {key}.")
@@ -218,6 +305,7 @@ class ContextDict(ABC, BaseModel):
         if isinstance(key, int):
             self._keys.add(key)
             self._added.add(key)
+            self._accessed.add(key)
             self._removed.discard(key)
 
             self._items[key] = self._value_type.validate_python(value)
@@ -239,6 +327,7 @@ class ContextDict(ABC, BaseModel):
         if isinstance(key, int):
             self._removed.add(key)
             self._added.discard(key)
+            self._accessed.discard(key)
             self._keys.discard(key)
 
             del self._items[key]
@@ -250,6 +339,107 @@ class ContextDict(ABC, BaseModel):
         else:
             raise TypeError(f"Key must be either an integer or an iterable of integers: {key}.")
 
+    def discard_before(self, key: int) -> None:
+        """
+        Remove all the items with keys lower than the given one, including the items that were not loaded.
+        Used for limiting number of turns stored in context.
+
+        :param key: Minimal key to keep.
+        """
+
+        for k in list(self._keys.between(None, key - 1)):
+            self._removed.add(k)
+            self._added.discard(k)
+            self._accessed.discard(k)
+            self._keys.discard(k)
+            self._items.pop(k, None)
+            self._hashes.pop(k, None)
+
+    async def prefetch(self, count: Optional[int] = None) -> None:
+        """
+        Load the latest items that are not available locally yet in one request.
+        Does nothing if no storage is connected.
+
+        :param count: Number of the latest keys to prefetch, `None` for all the keys.
+        """
+
+        keys = self.keys() if count is None else self._keys.last(count)
+        keys_to_load = [k for k in keys if k not in self._items]
+        if self._storage is not None and keys_to_load:
+            await self._load_items(keys_to_load)
+
+    async def _load_page(self, keys: List[int], retain: bool = True) -> List[Optional[BaseModel]]:
+        """
+        Get the items for the given keys, loading the missing ones from the storage in one request.
+
+        :param keys: Keys of the items.
+        :param retain: Whether the loaded items are kept locally.
+            If `False`, the items that were not available locally are returned, but not kept
+            (and their modifications are not tracked).
+        :return: List of the items, `None` for the keys that are not in the dict.
+        """
+
+        keys_to_load = [k for k in keys if k in self._keys and k not in self._items]
+        if self._storage is not None and keys_to_load:
+            await self._load_items(keys_to_load)
+        result = [self._items.get(k, None) for k in keys]
+        self._track_access([k for k in keys if k in self._items])
+        if not retain:
+            for k in keys_to_load:
+                self._items.pop(k, None)
+                self._hashes.pop(k, None)
+                self._accessed.discard(k)
+        return result
+
+    async def iter(
+        self, reverse: bool = False, page_size: int = 100, retain: bool = True
+    ) -> AsyncIterator[Tuple[int, BaseModel]]:
+        """
+        Iterate over all the items of the dict, loading the missing ones from the storage page by page.
+        Only the keys that were in the dict when iteration started are iterated over.
+
+        :param reverse: Whether to iterate from the latest item to the earliest one.
+        :param page_size: Number of the items loaded in one request.
+        :param retain: Whether the loaded items are kept locally after iteration.
+            If `False`, memory usage is bounded by the page size regardless of the number of items,
+            but the modifications of the yielded items that were loaded are not tracked.
+        :return: Asynchronous iterator over tuples (key, item).
+        """
+
+        if page_size < 1:
+            raise ValueError(f"Invalid page size value: {page_size}")
+        keys = reversed(self._keys.copy()) if reverse else iter(self._keys.copy())
+        while True:
+            page = list(islice(keys, page_size))
+            if len(page) == 0:
+                break
+            for key, value in zip(page, await self._load_page(page, retain)):
+                if value is not None:
+                    yield key, value
+
+    def _track_access(self, keys: Iterable[int]) -> None:
+        """
+        Mark the items as handed out and record offsets of the accessed keys for the storage access statistics.
+
+        :param keys: Keys of the accessed items.
+        """
+
+        for key in keys:
+            self._accessed.add(key)
+            if key in self._initial_keys:
+                self._access_offsets.add(len(self._initial_keys) - self._initial_keys.index(key) - 1)
+
+    def _get_loaded(self, key: int) -> BaseModel:
+        """
+        Get an item that is already available locally, without loading it from the storage.
+
+        :param key: Key of the item.
+        :return: The requested item.
+        """
+
+        self._track_access((key,))
+        return self._items[key]
+
     def __iter__(self) -> Iterable[int]:
         yield from self.keys()
 
@@ -280,6 +470,8 @@ class ContextDict(ABC, BaseModel):
         if isinstance(key, int):
             if self._storage is not None and key in self and key not in self._items:
                 await self._load_items([key])
+            if key in self._items:
+                self._track_access((key,))
             return self._items.get(key, default)
 
         if isinstance(key, Iterable) and all([isinstance(k, int) for k in key]):
@@ -288,6 +480,7 @@ class ContextDict(ABC, BaseModel):
             if self._storage is not None and keys_to_load:
                 await self._load_items(keys_to_load)
 
+            self._track_access([k for k in key if k in self._items])
             return tuple(self._items.get(k, default) for k in key)
         else:
             raise TypeError(f"Key must be either an integer or an iterable of integers: {key}.")
@@ -296,13 +489,24 @@ class ContextDict(ABC, BaseModel):
         return key in self._keys
 
     def keys(self) -> List[int]:
-        return sorted(self._keys)
+        return list(self._keys)
+
+    def last_keys(self, count: int) -> List[int]:
+        """
+        Get the largest keys of the dict, without listing all the keys.
+
+        :param count: Number of the keys to get.
+        :return: List of the largest keys (no more than `count`), sorted in ascending order.
+        """
+
+        return self._keys.last(count)
 
     async def values(self) -> List[BaseModel]:
         keys_to_load = [k for k in self.keys() if k not in self._items]
 
         if self._storage is not None and keys_to_load:
             await self._load_items(keys_to_load)
+        self._track_access(self._keys)
         return [self._items[key] for key in self.keys()]
 
     async def items(self) -> List[Tuple[int, BaseModel]]:
@@ -356,6 +560,7 @@ class ContextDict(ABC, BaseModel):
             f"ContextDict(items={self._items}, "
             f"keys={list(self.keys())}, "
             f"hashes={self._hashes}, "
+            f"accessed={self._accessed}, "
             f"added={self._added}, "
             f"removed={self._removed}, "
             f"storage={self._storage}, "
@@ -384,23 +589,53 @@ class ContextDict(ABC, BaseModel):
         elif isinstance(value, Dict):
             instance = handler(dict())
             instance._items = value.copy()
-            instance._keys = set(value.keys())
+            instance._keys = KeyRanges(value.keys())
             return instance
         else:
             raise ValueError(f"Unknown type of ContextDict value: {type(value).__name__}.")
 
+    def _load(self, value: Union[bytes, BaseModel]) -> BaseModel:
+        """
+        Deserialize a value loaded from the connected context storage
+        (or copy it, if the storage keeps objects without serialization).
+
+        :param value: Loaded value.
+        :return: Deserialized value.
+        """
+
+        return loads(self._value_type, value) if isinstance(value, bytes) else _snapshot(value)
+
+    def _dump(self, value: BaseModel) -> Union[bytes, BaseModel]:
+        """
+        Serialize a value with the serializer of the connected context storage
+        (or copy it, if the storage keeps objects without serialization).
+
+        :param value: Value to serialize.
+        :return: Serialized value.
+        """
+
+        if self._storage.serializer is None:
+            return _snapshot(value)
+        return self._storage.serializer.dumps(self._value_type, value)
+
     def _serialize_model_base(self, to_bytes: bool = False) -> Dict[int, Union[BaseModel, bytes]]:
         if self._storage is None:
             return self._items
         elif self._storage.rewrite_existing:
             result = dict()
-            for k, v in self._items.items():
-                value = self._value_type.dump_json(v)
-                if _get_hash(value) != self._hashes.get(k, None):
-                    result[k] = value if to_bytes else v
+            for k in sorted((self._added | self._accessed) & self._items.keys()):
+                item = self._items[k]
+                if self._storage.serializer is None:
+                    # Stored objects are compared directly, without serialization
+                    if item != self._hashes.get(k, None):
+                        result[k] = self._dump(item) if to_bytes else item
+                else:
+                    value = self._dump(item)
+                    if _get_hash(value) != self._hashes.get(k, None):
+                        result[k] = value if to_bytes else item
             return result
         else:
-            return {k: self._value_type.dump_json(self._items[k]) if to_bytes else self._items[k] for k in self._added}
+            return {k: self._dump(self._items[k]) if to_bytes else self._items[k] for k in self._added}
 
     @model_serializer()
     def _serialize_model(self) -> Dict[int, BaseModel]:
@@ -410,6 +645,7 @@ class ContextDict(ABC, BaseModel):
         """
         Synchronize dict state with the connected storage, extract the data that should be updated.
         Update added and removed elements, also update modified ones if `rewrite_existing` flag is enabled.
+        Every item is serialized at most once: the same bytes are used for modification check and for writing.
         Raise an error if no storage is connected.
         """
 
@@ -421,10 +657,12 @@ class ContextDict(ABC, BaseModel):
                 f"Context dict for {self._ctx_id}, {self._field_name} stored: "
                 f"{collapse_num_list([k for k, _ in added_items])}"
             )
-            self._added, self._removed = set(), set()
+            self._added, self._removed, self._accessed = set(), set(), set()
+            if len(self._initial_keys) > 0:
+                self._storage.record_field_access(self._field_name, self._access_offsets, *self._load_stats)
+                self._initial_keys, self._access_offsets, self._load_stats = KeyRanges(), set(), [0, 0, 0]
             if self._storage.rewrite_existing:
-                for k, v in self._items.items():
-                    self._hashes[k] = _get_hash(self._value_type.dump_json(v))
+                self._hashes.update((k, _get_fingerprint(v)) for k, v in added_items)
             return self._field_name, added_items, removed_items
         else:
             raise RuntimeError(f"{type(self).__name__} is not attached to any context storage.")
@@ -439,7 +677,7 @@ class LabelContextDict(ContextDict):
 
     @property
     def _value_type(self) -> TypeAdapter[AbsoluteNodeLabel]:
-        return TypeAdapter(AbsoluteNodeLabel)
+        return _LABEL_ADAPTER
 
     @overload
     async def __getitem__(self, key: int) -> AbsoluteNodeLabel: ...  # noqa: E704
@@ -482,6 +720,11 @@ class LabelContextDict(ContextDict):
     async def setdefault(self, key: int, default=None) -> AbsoluteNodeLabel:
         return await super().setdefault(key, default)
 
+    def iter(
+        self, reverse: bool = False, page_size: int = 100, retain: bool = True
+    ) -> AsyncIterator[Tuple[int, AbsoluteNodeLabel]]:
+        return super().iter(reverse, page_size, retain)
+
 
 class MessageContextDict(ContextDict):
     """
@@ -492,7 +735,7 @@ class MessageContextDict(ContextDict):
 
     @property
     def _value_type(self) -> TypeAdapter[Message]:
-        return TypeAdapter(Message)
+        return _MESSAGE_ADAPTER
 
     @overload
     async def __getitem__(self, key: int) -> Message: ...  # noqa: E704
@@ -534,3 +777,270 @@ class MessageContextDict(ContextDict):
 
     async def setdefault(self, key: int, default=None) -> Message:
         return await super().setdefault(key, default)
+
+    def iter(
+        self, reverse: bool = False, page_size: int = 100, retain: bool = True
+    ) -> AsyncIterator[Tuple[int, Message]]:
+        return super().iter(reverse, page_size, retain)
+
+
+class MiscContextDict(BaseModel):
+    """
+    Dictionary-like structure for storing custom data in a context storage item by item.
+    An opt-in alternative to :py:attr:`~chatsky.core.context.Context.misc`:
+    `misc` is stored as a single value, so all of it is loaded and written on every turn,
+    while items of this dict are loaded upon querying and only the modified ones are written back.
+
+    Keys of the dictionary are strings, values are arbitrary serializable objects.
+    Examples:
+
+    1. ``await ctx.lazy_misc["cache"]`` loads and returns the item with key ``"cache"``.
+    2. ``ctx.lazy_misc["cache"] = {"a": 1}`` sets the item (it is written when the context is stored).
+    3. ``ctx.lazy_misc.get_loaded("cache")`` returns the item only if it is already available locally.
+
+    Get operations are asynchronous (and require ``await``) since they may load items from DB,
+    set and delete operations are synchronous.
+    Note that the items are written separately from the rest of the context,
+    so they are not covered by the context version check
+    (see :py:meth:`~chatsky.context_storages.DBContextStorage.update_misc`).
+    """
+
+    _items: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    """
+    Dictionary of already loaded from storage (or set locally) items.
+    """
+
+    _hashes: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    """
+    Hashes of the loaded items (as they were upon loading or last storing), used for modification tracking.
+    If the storage keeps objects without serialization, copies of the stored objects are kept instead of hashes.
+    """
+
+    _keys: Optional[Set[str]] = PrivateAttr(None)
+    """
+    All the item keys available either in storage or locally, `None` if they were not loaded yet.
+    """
+
+    _added: Set[str] = PrivateAttr(default_factory=set)
+    """
+    Keys set locally (need to be synchronized with the storage).
+    """
+
+    _removed: Set[str] = PrivateAttr(default_factory=set)
+    """
+    Keys removed locally (need to be synchronized with the storage).
+    """
+
+    _storage: Optional[DBContextStorage] = PrivateAttr(None)
+    """
+    Context storage for item synchronization.
+    """
+
+    _ctx_id: str = PrivateAttr(default_factory=str)
+    """
+    Corresponding context ID.
+    """
+
+    @classmethod
+    def connected(cls, storage: DBContextStorage, id: str, new: bool = False) -> "MiscContextDict":
+        """
+        Create a new misc dict, connected to the context storage.
+        Nothing is loaded until the items are queried.
+
+        :param storage: Context storage, keeping the current context.
+        :param id: Context ID.
+        :param new: Whether the context is known not to exist in the storage (so no items should be loaded).
+        :return: New "connected" misc dict.
+        """
+
+        instance = cls()
+        instance._storage = storage
+        instance._ctx_id = id
+        if new:
+            instance._keys = set()
+        return instance
+
+    async def _load_items(self, keys: Iterable[str]) -> None:
+        """
+        Load items for the given keys from the connected context storage.
+        Items that are available locally, removed locally or known to be missing are not requested.
+
+        :param keys: The requested keys.
+        """
+
+        keys_to_load = [
+            k
+            for k in keys
+            if k not in self._items and k not in self._removed and (self._keys is None or k in self._keys)
+        ]
+        if self._storage is None or len(keys_to_load) == 0:
+            return
+        logger.debug(f"Misc dict for {self._ctx_id} loading items: {keys_to_load}...")
+        items = await self._storage.load_misc_items(self._ctx_id, keys_to_load)
+        logger.debug(f"Misc dict for {self._ctx_id} items loaded: {[k for k, _ in items]}")
+        for key, value in items:
+            if key in self._items or key in self._removed:
+                # The item was modified locally while loading
+                continue
+            if isinstance(value, bytes):
+                self._items[key] = loads(_ANY_ADAPTER, value)
+                self._hashes[key] = _get_hash(value)
+            else:
+                self._items[key] = deepcopy(value)
+                self._hashes[key] = deepcopy(value)
+
+    async def __getitem__(self, key: str) -> Any:
+        await self._load_items((key,))
+        if key not in self._items:
+            raise KeyError(f"Key {key} does not exist.")
+        return self._items[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self._keys is not None:
+            self._keys.add(key)
+        self._added.add(key)
+        self._removed.discard(key)
+        self._items[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if self._keys is not None:
+            self._keys.discard(key)
+        self._removed.add(key)
+        self._added.discard(key)
+        self._items.pop(key, None)
+        self._hashes.pop(key, None)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get an item from the dict, load it if context storage is connected.
+
+        :param key: Item key.
+        :param default: Value returned if the item does not exist.
+        :return: The requested item.
+        """
+
+        await self._load_items((key,))
+        return self._items.get(key, default)
+
+    def get_loaded(self, key: str, default: Any = None) -> Any:
+        """
+        Get an item that is already available locally, without loading it from the storage.
+
+        :param key: Item key.
+        :param default: Value returned if the item is not available locally.
+        :return: The requested item.
+        """
+
+        return self._items.get(key, default)
+
+    async def prefetch(self, keys: Iterable[str]) -> None:
+        """
+        Load the items that are not available locally yet in one request.
+
+        :param keys: Keys of the items to load.
+        """
+
+        await self._load_items(keys)
+
+    async def keys(self) -> List[str]:
+        """
+        Get the sorted keys of all the items, loading them from the storage on first call.
+
+        :return: List of item keys.
+        """
+
+        if self._keys is None:
+            stored = set() if self._storage is None else set(await self._storage.load_misc_keys(self._ctx_id))
+            if self._keys is None:
+                self._keys = (stored | self._items.keys()) - self._removed
+        return sorted(self._keys)
+
+    async def values(self) -> List[Any]:
+        keys = await self.keys()
+        await self._load_items(keys)
+        return [self._items[k] for k in keys if k in self._items]
+
+    async def items(self) -> List[Tuple[str, Any]]:
+        keys = await self.keys()
+        await self._load_items(keys)
+        return [(k, self._items[k]) for k in keys if k in self._items]
+
+    async def pop(self, key: str, default: Any = None) -> Any:
+        value = await self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        del self[key]
+        return value
+
+    async def setdefault(self, key: str, default: Any = None) -> Any:
+        value = await self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+
+    def update(self, other: Any = (), /, **kwds) -> None:
+        for key, value in dict(other, **kwds).items():
+            self[key] = value
+
+    def __eq__(self, value: object) -> bool:
+        if isinstance(value, MiscContextDict):
+            return self._items == value._items
+        elif isinstance(value, Dict):
+            return self._items == value
+        else:
+            return False
+
+    def __repr__(self) -> str:
+        return (
+            f"MiscContextDict(items={self._items}, "
+            f"keys={self._keys}, "
+            f"added={self._added}, "
+            f"removed={self._removed}, "
+            f"storage={self._storage}, "
+            f"ctx_id={self._ctx_id})"
+        )
+
+    def __copy__(self):
+        storage = self._storage
+        self._storage = None
+        copy = BaseModel.__copy__(self)
+        copy._storage = self._storage = storage
+        return copy
+
+    def __deepcopy__(self, memo: dict[int, Any] | None = None):
+        storage = self._storage
+        self._storage = None
+        copy = BaseModel.__deepcopy__(self, memo)
+        copy._storage = self._storage = storage
+        return copy
+
+    def extract_sync(self) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+        """
+        Synchronize dict state with the connected storage, extract the data that should be updated.
+        All the items available locally are checked for modifications, since any of them could have been
+        modified in place; the items that were not loaded are never written.
+        Raise an error if no storage is connected.
+
+        :return: Tuple of the list of tuples (item key, serialized value) to write and the list of keys to delete.
+        """
+
+        if self._storage is None:
+            raise RuntimeError(f"{type(self).__name__} is not attached to any context storage.")
+        added_items = list()
+        for key in sorted(self._items.keys()):
+            item = self._items[key]
+            if self._storage.serializer is None:
+                # Stored objects are compared directly, without serialization
+                if key in self._added or item != self._hashes.get(key, _MISSING):
+                    value = deepcopy(item)
+                    self._hashes[key] = deepcopy(item)
+                    added_items += [(key, value)]
+            else:
+                value = self._storage.serializer.dumps(_ANY_ADAPTER, item)
+                if key in self._added or _get_hash(value) != self._hashes.get(key, None):
+                    self._hashes[key] = _get_hash(value)
+                    added_items += [(key, value)]
+        removed_items = sorted(self._removed)
+        logger.debug(f"Misc dict for {self._ctx_id} stored: {[k for k, _ in added_items]}, removed: {removed_items}")
+        self._added, self._removed = set(), set()
+        return added_items, removed_items
@@ -9,13 +9,17 @@ that define all non-turn related data stored in contexts.
 
 from __future__ import annotations
 from asyncio import Event
+from copy import deepcopy
 from json import loads
+from re import compile
 from time import time_ns
-from typing import Any, Optional, Dict, TYPE_CHECKING
+from typing import Any, Callable, Optional, Dict, Set, Tuple, TYPE_CHECKING
 
-from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, field_serializer, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, field_serializer, field_validator, model_validator
 
 from chatsky.slots.slots import SlotManager
+from chatsky.utils.compression import CompressionCodec, decompress
+from chatsky.utils.serialization import Serializer, loads_python
 
 if TYPE_CHECKING:
     from chatsky.core.service import ComponentExecutionState
@@ -27,6 +31,27 @@ class ContextError(Exception):
     """Raised when context methods are not used correctly."""
 
 
+_PREFETCH_HINT_PATTERN = compile(r"^(labels|requests|responses)\[(?:-(\d+))?:\]$")
+
+
+def parse_prefetch_hint(hint: str) -> Tuple[str, Optional[int]]:
+    """
+    Parse a history prefetch hint.
+    Hints have form of slices of the context turn fields, taking the latest items:
+    ``"requests[-10:]"`` stands for the latest 10 requests, ``"labels[:]"`` stands for all the labels.
+
+    :param hint: Prefetch hint.
+    :return: Tuple of context field name and number of the latest items to prefetch (`None` for all the items).
+    :raises ValueError: If the hint format is invalid.
+    """
+
+    match = _PREFETCH_HINT_PATTERN.match(hint)
+    if match is None:
+        raise ValueError(f"Invalid prefetch hint: {hint!r}, expected e.g. 'requests[-10:]' or 'labels[:]'")
+    field, count = match.groups()
+    return field, None if count is None else int(count)
+
+
 class ServiceState(BaseModel, arbitrary_types_allowed=True):
     execution_status: ComponentExecutionState = Field(default="NOT_RUN")
     """
@@ -66,6 +91,9 @@ class FrameworkData(BaseModel, arbitrary_types_allowed=True):
     "Stores extracted slots."
 
 
+_TRACKED_FIELDS = ("misc", "framework_data")
+
+
 class ContextMainInfo(BaseModel):
     """
     Main context fields, that are stored in `MAIN` table.
@@ -108,23 +136,102 @@ class ContextMainInfo(BaseModel):
     """
 
     _misc_adaptor: TypeAdapter[Dict[str, Any]] = PrivateAttr(default=TypeAdapter(Dict[str, Any]))
+    _codec: Optional[CompressionCodec] = PrivateAttr(default=None)
+    """
+    Codec for compressing serialized `misc` and `framework_data`, set by the context storage before writing.
+    """
+    _serializer: Optional[Serializer] = PrivateAttr(default=None)
+    """
+    Serializer for `misc` and `framework_data` (JSON if `None`), set by the context storage before writing.
+    """
+    _loaded_hashes: Dict[str, int] = PrivateAttr(default_factory=dict)
+    """
+    Hashes of the serialized `misc` and `framework_data` this instance was validated from (if any).
+    """
+    _hashes: Optional[Dict[str, int]] = PrivateAttr(default=None)
+    """
+    Hashes of the serialized `misc` and `framework_data` as they were last loaded from or written to the storage,
+    set by the context for tracking changes, `None` for writing all the fields.
+    The dictionary is shared with the context and updated every time the fields are dumped for writing.
+    """
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _record_loaded_hashes(cls, value: Any, handler: Callable[[Any], ContextMainInfo]) -> ContextMainInfo:
+        instance = handler(value)
+        if isinstance(value, dict):
+            instance._loaded_hashes = {
+                f: hash(value[f]) for f in _TRACKED_FIELDS if isinstance(value.get(f, None), bytes)
+            }
+        return instance
 
     @field_validator("framework_data", "misc", mode="before")
     @classmethod
     def _validate_framework_data(cls, value: Any) -> Dict:
-        if isinstance(value, bytes) or isinstance(value, str):
+        if isinstance(value, bytes):
+            value = loads_python(decompress(value))
+        elif isinstance(value, str):
             value = loads(value)
         return value
 
     @field_serializer("misc", when_used="always")
     def _serialize_misc(self, misc: Dict[str, Any]) -> bytes:
-        return self._misc_adaptor.dump_json(misc)
+        if self._serializer is None:
+            data = self._misc_adaptor.dump_json(misc)
+        else:
+            data = self._serializer.dumps(self._misc_adaptor, misc)
+        return data if self._codec is None else self._codec.compress(data)
 
     @field_serializer("framework_data", when_used="always")
     def _serialize_framework_data(self, framework_data: FrameworkData) -> bytes:
-        return framework_data.model_dump_json().encode()
+        if self._serializer is None:
+            data = framework_data.model_dump_json().encode()
+        else:
+            data = self._serializer.dumps_model(framework_data)
+        return data if self._codec is None else self._codec.compress(data)
+
+    def dump_changed(self) -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        Serialize the fields for writing to the storage and find out which of `misc` and `framework_data`
+        did not change since they were last loaded or written (if the changes are tracked).
+        The tracked hashes are updated with the new values.
+
+        :return: Tuple of all the serialized fields and names of the fields that do not have to be written.
+        """
+
+        dump = self.model_dump(mode="python")
+        unchanged = set()
+        if self._hashes is not None:
+            for field in _TRACKED_FIELDS:
+                value_hash = hash(dump[field])
+                if self._hashes.get(field, None) == value_hash:
+                    unchanged.add(field)
+                else:
+                    self._hashes[field] = value_hash
+        return dump, unchanged
+
+    def snapshot(self) -> ContextMainInfo:
+        """
+        Create a deep copy of the stored fields, used by the storages that keep objects without serialization.
+        The :py:class:`FrameworkData` fields excluded from serialization (e.g. `pipeline`) are reset.
+
+        :return: Independent copy of the main context information.
+        """
+
+        framework_data = FrameworkData.model_construct(
+            **{
+                name: deepcopy(getattr(self.framework_data, name))
+                for name, field in FrameworkData.model_fields.items()
+                if not field.exclude
+            }
+        )
+        return self.model_copy(update={"misc": deepcopy(self.misc), "framework_data": framework_data})
+
+    @staticmethod
+    def _dump_comparable(model: BaseModel) -> Dict[str, Any]:
+        return {k: loads_python(decompress(v)) if isinstance(v, bytes) else v for k, v in model.model_dump().items()}
 
     def __eq__(self, other: Any) -> bool:
         if isinstance(other, BaseModel):
-            return self.model_dump() == other.model_dump()
+            return self._dump_comparable(self) == self._dump_comparable(other)
         return super().__eq__(other)
@@ -13,13 +13,14 @@ import asyncio
 import logging
 from functools import cached_property
 from typing import Union, List, Dict, Optional, TYPE_CHECKING
-from pydantic import BaseModel, Field, model_validator, computed_field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator, computed_field
 
 from chatsky.core.script import Script
 from chatsky.core.context import Context
+from chatsky.core.concurrency import ContextLockManager, OptimisticConcurrencyPolicy
 from chatsky.core.message import Message
 
-from chatsky.context_storages import DBContextStorage, MemoryContextStorage
+from chatsky.context_storages import DBContextStorage, MemoryContextStorage, ConcurrentModificationError
 from chatsky.messengers.console import CLIMessengerInterface
 from chatsky.messengers.common import MessengerInterface
 from chatsky.slots.slots import GroupSlot
@@ -115,6 +116,20 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
     defined in the ``PRE_RESPONSE_PROCESSING`` and ``PRE_TRANSITIONS_PROCESSING`` sections
     of the script should be parallelized over respective groups.
     """
+    concurrency_policy: Optional[OptimisticConcurrencyPolicy] = None
+    """
+    Policy of handling concurrent turns of the same context (e.g. processed by several pipeline workers).
+    If set, contexts are stored only if they were not modified since they were loaded,
+    otherwise the turn is processed again on top of the stored context.
+    If `None`, the last stored context overwrites the others.
+    """
+    serialize_turns: bool = True
+    """
+    Whether the concurrent turns of the same context are processed one by one within this pipeline
+    (turns of different contexts are always processed concurrently).
+    Lock usage statistics are available via :py:attr:`context_locks`.
+    """
+    _context_locks: ContextLockManager = PrivateAttr(default_factory=ContextLockManager)
 
     def __init__(
         self,
@@ -133,6 +148,8 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
         after_handler: ComponentExtraHandlerInitTypes = None,
         timeout: float = None,
         parallelize_processing: bool = None,
+        concurrency_policy: OptimisticConcurrencyPolicy = None,
+        serialize_turns: bool = None,
     ):
         if fallback_label is None:
             fallback_label = start_label
@@ -151,6 +168,8 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
             "after_handler": after_handler,
             "timeout": timeout,
             "parallelize_processing": parallelize_processing,
+            "concurrency_policy": concurrency_policy,
+            "serialize_turns": serialize_turns,
         }
         empty_fields = set()
         for k, v in init_dict.items():
@@ -188,6 +207,13 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
 
         return cls(**pipeline)
 
+    @property
+    def context_locks(self) -> ContextLockManager:
+        """
+        Manager of the per-context locks, used if :py:attr:`serialize_turns` is set.
+        """
+        return self._context_locks
+
     @computed_field
     @cached_property
     def actor(self) -> Actor:
@@ -239,21 +265,61 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
         Method that should be invoked on user input.
         This method has the same signature as :py:class:`~chatsky.core.service.types.PipelineRunnerFunction`.
 
-        This method does:
+        If :py:attr:`serialize_turns` is set, the method waits for the other turns of context ``ctx_id``
+        running in this pipeline to finish first. Then it does:
 
-        1. Retrieve from :py:attr:`context_storage` or initialize context ``ctx_id``.
+        1. Retrieve from :py:attr:`context_storage` or initialize context ``ctx_id``,
+           prefetch the history required by the current node (see :py:meth:`.Script.get_prefetch_hints`).
         2. Update :py:attr:`.Context.misc` with ``update_ctx_misc``.
         3. Set up :py:attr:`.Context.framework_data` fields.
         4. Add ``request`` to the context.
         5. Execute :py:attr:`services_pipeline`.
            This includes :py:class:`.Actor` (read :py:meth:`.Actor.run_component` for more information).
         6. Save context in the :py:attr:`context_storage`.
+           If :py:attr:`concurrency_policy` is set and the context was modified concurrently,
+           repeat the steps above with the updated context.
 
         :return: Modified context ``ctx_id``.
         """
         logger.info(f"Running pipeline for context {ctx_id}.")
         logger.debug(f"Received request: {request}.")
+        if ctx_id is None or not self.serialize_turns:
+            return await self._process_request(request, ctx_id, update_ctx_misc)
+        async with self._context_locks.lock(str(ctx_id)):
+            return await self._process_request(request, ctx_id, update_ctx_misc)
+
+    async def _process_request(
+        self, request: Message, ctx_id: Optional[str] = None, update_ctx_misc: Optional[dict] = None
+    ) -> Context:
+        """
+        Process the request and store the context, retrying according to :py:attr:`concurrency_policy`.
+
+        :return: Modified context ``ctx_id``.
+        """
+        policy = self.concurrency_policy
+        retry = 0
+        while True:
+            ctx = await self._run_turn(request, ctx_id, update_ctx_misc)
+            try:
+                await ctx.store(check_version=policy is not None)
+                return ctx
+            except ConcurrentModificationError:
+                if retry >= policy.max_retries:
+                    raise
+                logger.warning(f"Context {ctx.id} was modified concurrently, processing the turn again.")
+                await asyncio.sleep(policy.backoff * 2**retry)
+                retry += 1
+
+    async def _run_turn(
+        self, request: Message, ctx_id: Optional[str] = None, update_ctx_misc: Optional[dict] = None
+    ) -> Context:
+        """
+        Load the context and process the request, without storing the context.
+
+        :return: Modified context ``ctx_id``.
+        """
         ctx = await Context.connected(self.context_storage, self.start_label, ctx_id)
+        await ctx.prefetch(self.script.get_prefetch_hints(ctx.last_label))
 
         if update_ctx_misc is not None:
             ctx.misc.update(update_ctx_misc)
@@ -271,9 +337,6 @@ class Pipeline(BaseModel, extra="forbid", arbitrary_types_allowed=True):
 
         ctx.framework_data.service_states.clear()
         ctx.framework_data.pipeline = None
-
-        await ctx.store()
-
         return ctx
 
     def run(self):
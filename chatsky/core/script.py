@@ -10,11 +10,12 @@ and to determine the appropriate response based on the user's input and the curr
 # %%
 from __future__ import annotations
 import logging
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set
 
-from pydantic import BaseModel, Field, AliasChoices
+from pydantic import BaseModel, Field, AliasChoices, field_validator
 
-from chatsky.core.script_function import AnyResponse, BaseProcessing
+from chatsky.core.ctx_utils import parse_prefetch_hint
+from chatsky.core.script_function import AnyResponse, BaseProcessing, ConstDestination
 from chatsky.core.node_label import AbsoluteNodeLabel
 from chatsky.core.transition import Transition
 
@@ -54,6 +55,35 @@ class Node(BaseModel, extra="forbid"):
 
     Can be accessed at runtime via :py:attr:`~chatsky.core.context.Context.current_node`.
     """
+    prefetch: List[str] = Field(validation_alias=AliasChoices("prefetch", "PREFETCH"), default_factory=list)
+    """
+    A list of context history prefetch hints, e.g. ``["requests[-10:]", "labels[-3:]"]``.
+    The history required by this node is loaded in advance in one request instead of loading it item by item.
+    See :py:meth:`~chatsky.core.context.Context.prefetch` for more information.
+    """
+
+    @field_validator("prefetch")
+    @classmethod
+    def validate_prefetch(cls, value: List[str]) -> List[str]:
+        """Validate prefetch hints format."""
+        for hint in value:
+            parse_prefetch_hint(hint)
+        return value
+
+    def get_prefetch_hints(self) -> Set[str]:
+        """
+        Return all the prefetch hints of the node:
+        :py:attr:`prefetch` and hints of all the node script functions
+        (see :py:meth:`~chatsky.core.script_function.BaseScriptFunc.get_prefetch_hints`).
+        """
+        functions = [self.response, *self.pre_transition.values(), *self.pre_response.values()]
+        for transition in self.transitions:
+            functions.extend((transition.cnd, transition.dst, transition.priority))
+        hints = set(self.prefetch)
+        for function in functions:
+            if function is not None:
+                hints.update(function.get_prefetch_hints())
+        return hints
 
     def inherit_from_other(self, other: Node):
         """
@@ -61,6 +91,7 @@ class Node(BaseModel, extra="forbid"):
 
         - Extend ``self.transitions`` with :py:attr:`transitions` of the other node;
         - Replace response with ``other.response`` if ``self.response`` is ``None``;
+        - Extend ``self.prefetch`` with :py:attr:`prefetch` hints of the other node;
         - Dictionaries (:py:attr:`pre_transition`, :py:attr:`pre_response` and :py:attr:`misc`)
           are appended to this node's dictionaries except for the repeating keys.
           For example, ``inherit_from_other({1: 1, 3: 3}, {1: 0, 2: 2}) == {1: 1, 3: 3, 2: 2}``.
@@ -77,6 +108,7 @@ class Node(BaseModel, extra="forbid"):
         merge_dicts(self.pre_transition, other.pre_transition)
         merge_dicts(self.pre_response, other.pre_response)
         merge_dicts(self.misc, other.misc)
+        self.prefetch.extend(other.prefetch)
         return self
 
 
@@ -184,6 +216,29 @@ class Script(BaseModel, extra="allow"):
             .inherit_from_other(self.global_node)
         )
 
+    def get_prefetch_hints(self, label: AbsoluteNodeLabel) -> Set[str]:
+        """
+        Return prefetch hints (see :py:meth:`Node.get_prefetch_hints`) for a turn that starts in the node
+        specified by ``label``: hints of the (inherited) node itself
+        and hints of the nodes its transitions with constant destinations lead to.
+
+        :return: Set of prefetch hints, empty if the node doesn't exist.
+        """
+        node = self.get_inherited_node(label)
+        if node is None:
+            return set()
+        hints = node.get_prefetch_hints()
+        for transition in node.transitions:
+            if isinstance(transition.dst, ConstDestination):
+                flow_name = transition.dst.root.flow_name or label.flow_name
+                dst_label = AbsoluteNodeLabel.model_construct(
+                    flow_name=flow_name, node_name=transition.dst.root.node_name
+                )
+                dst_node = self.get_inherited_node(dst_label)
+                if dst_node is not None:
+                    hints.update(dst_node.get_prefetch_hints())
+        return hints
+
 
 GLOBAL = "GLOBAL"
 """Key for :py:attr:`~chatsky.core.script.Script.global_node`."""
@@ -199,3 +254,5 @@ PRE_RESPONSE = "PRE_RESPONSE"
 """Key for :py:attr:`~chatsky.core.script.Node.pre_response`."""
 PRE_TRANSITION = "PRE_TRANSITION"
 """Key for :py:attr:`~chatsky.core.script.Node.pre_transition`."""
+PREFETCH = "PREFETCH"
+"""Key for :py:attr:`~chatsky.core.script.Node.prefetch`."""
@@ -8,7 +8,7 @@ These functions allow dynamic script configuration and are essential to the scri
 
 from __future__ import annotations
 
-from typing import Union, Tuple, ClassVar, Optional
+from typing import List, Union, Tuple, ClassVar, Optional
 from typing_extensions import Annotated
 from abc import abstractmethod, ABC
 import logging
@@ -39,6 +39,15 @@ class BaseScriptFunc(BaseModel, ABC, frozen=True):  # generic doesn't work well
         """Implement this to create a custom function."""
         raise NotImplementedError()
 
+    def get_prefetch_hints(self) -> List[str]:
+        """
+        Override this to declare the context history required by the function,
+        so that it is loaded in advance (see :py:meth:`.Context.prefetch` for the hints format).
+
+        :return: List of prefetch hints, e.g. ``["requests[-10:]"]``.
+        """
+        return []
+
     async def wrapped_call(self, ctx: Context, *, info: str = ""):
         """
         Exception-safe wrapper for :py:meth:`__call__`.
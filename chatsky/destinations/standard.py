@@ -33,7 +33,7 @@ class FromHistory(BaseDestination):
     """
 
     async def call(self, ctx: Context) -> NodeLabelInitTypes:
-        return await ctx.labels[ctx.labels.keys()[self.position]]
+        return await ctx.labels[ctx.labels.last_keys(-self.position)[self.position]]
 
 
 class Current(FromHistory):
@@ -6,7 +6,7 @@ The Utils module contains functions for converting Chatsky's objects to an LLM_A
 
 import re
 import logging
-from typing import Literal, Union
+from typing import List, Literal, Union
 import asyncio
 
 from chatsky.core import Context, Message
@@ -50,6 +50,21 @@ async def message_to_langchain(
         return HumanMessage(content=content)
 
 
+def get_history_prefetch_hints(length: int) -> List[str]:
+    """
+    Get context prefetch hints (see :py:meth:`~chatsky.core.context.Context.prefetch`)
+    for the history used by :py:func:`context_to_history`.
+
+    :param length: Amount of turns to include in history. Set to `-1` to include all context.
+
+    :return: List of prefetch hints.
+    """
+    if length == 0:
+        return []
+    count = "" if length < 0 else f"-{length}"
+    return [f"requests[{count}:]", f"responses[{count}:]"]
+
+
 async def context_to_history(
     ctx: Context, length: int, filter_func: BaseHistoryFilter, llm_model_name: str, max_size: int
 ) -> list[Union[HumanMessage, AIMessage, SystemMessage]]:
@@ -4,13 +4,13 @@ LLM responses
 Responses based on LLM_API calling.
 """
 
-from typing import Union, Type, Optional
+from typing import List, Union, Type, Optional
 
 from pydantic import BaseModel, Field
 
 from chatsky.core.message import Message
 from chatsky.core.context import Context
-from chatsky.llm.langchain_context import get_langchain_context
+from chatsky.llm.langchain_context import get_langchain_context, get_history_prefetch_hints
 from chatsky.llm.filters import BaseHistoryFilter, DefaultFilter
 from chatsky.llm.prompt import Prompt, PositionConfig
 from chatsky.core.script_function import BaseResponse
@@ -57,6 +57,9 @@ class LLMResponse(BaseResponse):
     will be produced.
     """
 
+    def get_prefetch_hints(self) -> List[str]:
+        return get_history_prefetch_hints(self.history)
+
     async def call(self, ctx: Context) -> Message:
         model = ctx.pipeline.models[self.llm_model_name]
         history_messages = []
@@ -0,0 +1,166 @@
+"""
+Compression
+-----------
+This module defines :py:class:`CompressionCodec` used for compressing data blobs
+written by context storages (serialized turn items, `misc` and `framework_data`).
+
+Every compressed blob starts with a header byte that identifies the algorithm:
+
+- ``0x01`` -- `zlib`;
+- ``0x02`` -- `lzma`;
+- ``0x03`` -- `zstd` (requires `zstandard` package);
+- ``0x04`` -- `lz4` (requires `lz4` package).
+
+Blobs without a known header byte are returned by :py:func:`decompress` unchanged.
+JSON never starts with any of these bytes, so compressed and uncompressed data can be stored side by side:
+the data written before compression was enabled, or the data that was too small to compress, stays readable.
+"""
+
+import lzma
+import zlib
+from typing import Callable, Dict, Literal, Optional
+
+try:
+    import zstandard
+
+    zstd_available = True
+except ImportError:
+    zstd_available = False
+
+try:
+    import lz4.frame
+
+    lz4_available = True
+except ImportError:
+    lz4_available = False
+
+_CompressionAlgorithm = Literal["zlib", "lzma", "zstd", "lz4"]
+
+_HEADERS: Dict[str, int] = {"zlib": 0x01, "lzma": 0x02, "zstd": 0x03, "lz4": 0x04}
+
+_ZSTD_DICTIONARIES: Dict[int, "zstandard.ZstdCompressionDict"] = dict()
+"""
+Registry of zstd dictionaries by their IDs, used for decompressing blobs compressed with a dictionary.
+Dictionaries are registered on :py:class:`CompressionCodec` creation.
+"""
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    if not zstd_available:
+        raise ImportError("`zstandard` package is missing.\nTry to run `pip install chatsky[compression]`")
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    if dict_id != 0 and dict_id not in _ZSTD_DICTIONARIES:
+        raise ValueError(f"Data is compressed with unknown zstd dictionary: {dict_id}")
+    return zstandard.ZstdDecompressor(dict_data=_ZSTD_DICTIONARIES.get(dict_id, None)).decompress(data)
+
+
+def _lz4_decompress(data: bytes) -> bytes:
+    if not lz4_available:
+        raise ImportError("`lz4` package is missing.\nTry to run `pip install chatsky[compression]`")
+    return lz4.frame.decompress(data)
+
+
+_DECOMPRESSORS: Dict[int, Callable[[bytes], bytes]] = {
+    _HEADERS["zlib"]: zlib.decompress,
+    _HEADERS["lzma"]: lzma.decompress,
+    _HEADERS["zstd"]: _zstd_decompress,
+    _HEADERS["lz4"]: _lz4_decompress,
+}
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompress a blob, compressed by any :py:class:`CompressionCodec`.
+    The algorithm is defined by the header byte, blobs without header are returned as is.
+
+    :param data: Blob to decompress.
+    :return: Decompressed blob.
+    """
+
+    if len(data) > 0 and data[0] in _DECOMPRESSORS:
+        return _DECOMPRESSORS[data[0]](data[1:])
+    return data
+
+
+class CompressionCodec:
+    """
+    Codec that compresses blobs with the given algorithm and prepends the algorithm header byte to them.
+
+    Blobs smaller than `min_size` and blobs that don't shrink after compression are left uncompressed.
+
+    :param algorithm: Compression algorithm name.
+    :param level: Compression level (preset for `lzma`), `None` for the algorithm default.
+    :param min_size: Minimal blob size (in bytes) to compress.
+    :param zstd_dictionary: Trained zstd dictionary (only for `zstd` algorithm),
+        can be produced with `zstandard.train_dictionary`.
+    """
+
+    def __init__(
+        self,
+        algorithm: _CompressionAlgorithm = "zlib",
+        level: Optional[int] = None,
+        min_size: int = 256,
+        zstd_dictionary: Optional[bytes] = None,
+    ):
+        if algorithm not in _HEADERS:
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+        if algorithm == "zstd" and not zstd_available:
+            raise ImportError("`zstandard` package is missing.\nTry to run `pip install chatsky[compression]`")
+        if algorithm == "lz4" and not lz4_available:
+            raise ImportError("`lz4` package is missing.\nTry to run `pip install chatsky[compression]`")
+        if zstd_dictionary is not None and algorithm != "zstd":
+            raise ValueError("Dictionary can only be used with `zstd` compression algorithm")
+
+        self.algorithm = algorithm
+        self.level = level
+        self.min_size = min_size
+        self._header = bytes((_HEADERS[algorithm],))
+        self._compress = self._get_compressor(zstd_dictionary)
+
+    def _get_compressor(self, zstd_dictionary: Optional[bytes]) -> Callable[[bytes], bytes]:
+        if self.algorithm == "zlib":
+            level = -1 if self.level is None else self.level
+            return lambda data: zlib.compress(data, level)
+        elif self.algorithm == "lzma":
+            return lambda data: lzma.compress(data, preset=self.level)
+        elif self.algorithm == "zstd":
+            kwargs = dict() if self.level is None else {"level": self.level}
+            if zstd_dictionary is not None:
+                dictionary = zstandard.ZstdCompressionDict(zstd_dictionary)
+                _ZSTD_DICTIONARIES[dictionary.dict_id()] = dictionary
+                kwargs["dict_data"] = dictionary
+            return zstandard.ZstdCompressor(**kwargs).compress
+        else:
+            kwargs = dict() if self.level is None else {"compression_level": self.level}
+            return lambda data: lz4.frame.compress(data, **kwargs)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a blob, if it is large enough and compression reduces its size.
+
+        :param data: Blob to compress.
+        :return: Compressed blob with header byte or the initial blob.
+        """
+
+        if len(data) < self.min_size:
+            return data
+        compressed = self._header + self._compress(data)
+        return compressed if len(compressed) < len(data) else data
+
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Decompress a blob, see :py:func:`decompress`.
+
+        :param data: Blob to decompress.
+        :return: Decompressed blob.
+        """
+
+        return decompress(data)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompressionCodec):
+            return False
+        return (self.algorithm, self.level, self.min_size) == (other.algorithm, other.level, other.min_size)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(algorithm={self.algorithm!r}, level={self.level}, min_size={self.min_size})"
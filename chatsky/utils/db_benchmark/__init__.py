@@ -9,3 +9,4 @@ from chatsky.utils.db_benchmark.benchmark import (
 )
 from chatsky.utils.db_benchmark.report import report
 from chatsky.utils.db_benchmark.basic_config import BasicBenchmarkConfig, basic_configurations
+from chatsky.utils.db_benchmark.serialization import time_serialization, compare_serialization_formats
@@ -0,0 +1,84 @@
+"""
+Serialization benchmarking
+--------------------------
+This module contains functions for comparing serialization formats
+(see :py:class:`~chatsky.utils.serialization.Serializer`) used by context storages.
+
+The basic function is :py:func:`~.time_serialization` that measures serialized size
+and encoding and decoding time of a single value.
+:py:func:`~.compare_serialization_formats` runs it for typical context data:
+messages, labels and `misc` of the given dimensions.
+"""
+
+from time import perf_counter
+from typing import Any, Dict, Iterable, Tuple
+
+from pydantic import TypeAdapter
+
+from chatsky.core import AbsoluteNodeLabel, Message
+from chatsky.utils.db_benchmark.basic_config import get_dict, get_message
+from chatsky.utils.serialization import Serializer, loads, msgpack_available
+
+
+def time_serialization(
+    serializer: Serializer, adapter: TypeAdapter, value: Any, repeats: int = 100
+) -> Dict[str, float]:
+    """
+    Benchmark serialization of a value.
+
+    :param serializer: Serializer to benchmark.
+    :param adapter: Type adapter of the value.
+    :param value: Value to serialize.
+    :param repeats: Number of times to serialize and deserialize the value.
+    :return:
+        Dictionary with serialized value size in bytes (`size`),
+        average encoding time (`encode`) and average decoding time (`decode`) in seconds.
+    """
+    encode_start = perf_counter()
+    for _ in range(repeats):
+        data = serializer.dumps(adapter, value)
+    encode_time = (perf_counter() - encode_start) / repeats
+
+    decode_start = perf_counter()
+    for _ in range(repeats):
+        loads(adapter, data)
+    decode_time = (perf_counter() - decode_start) / repeats
+
+    return {"size": len(data), "encode": encode_time, "decode": decode_time}
+
+
+def compare_serialization_formats(
+    message_dimensions: Tuple[int, ...] = (10, 10),
+    misc_dimensions: Tuple[int, ...] = (10, 10),
+    formats: Iterable[str] = ("json", "msgpack", "pickle"),
+    repeats: int = 100,
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Compare serialization formats on a message, a label and a `misc` dictionary.
+    Formats that are not available (e.g. `msgpack` without the package installed) are skipped.
+
+    :param message_dimensions:
+        Dimensions of misc field of the message. See :py:func:`~chatsky.utils.db_benchmark.basic_config.get_dict`.
+    :param misc_dimensions:
+        Dimensions of the `misc` dictionary. See :py:func:`~chatsky.utils.db_benchmark.basic_config.get_dict`.
+    :param formats: Names of serialization formats to compare.
+    :param repeats: Number of times to serialize and deserialize every value.
+    :return:
+        Dictionary mapping format names to dictionaries,
+        mapping value types (`message`, `label` and `misc`) to :py:func:`~.time_serialization` results.
+    """
+    values = {
+        "message": (TypeAdapter(Message), get_message(message_dimensions)),
+        "label": (TypeAdapter(AbsoluteNodeLabel), AbsoluteNodeLabel(flow_name="flow", node_name="node")),
+        "misc": (TypeAdapter(Dict[str, Any]), get_dict(misc_dimensions)),
+    }
+
+    results = dict()
+    for format in formats:
+        if format == "msgpack" and not msgpack_available:
+            continue
+        serializer = Serializer(format)
+        results[format] = {
+            name: time_serialization(serializer, adapter, value, repeats) for name, (adapter, value) in values.items()
+        }
+    return results
@@ -0,0 +1,200 @@
+"""
+Key Ranges
+----------
+This module defines :py:class:`KeyRanges`, a compact set of integer keys used for storing context turn ids.
+
+Turn ids of a context are almost always contiguous (from the start turn up to the current one),
+so the keys are stored as sorted disjoint ranges rather than one by one:
+most operations on a contiguous set of keys take constant time and memory regardless of the number of turns.
+"""
+
+from bisect import bisect_right
+from collections.abc import Set
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+class KeyRanges(Set):
+    """
+    Set of integer keys, stored as a sorted list of disjoint inclusive ranges.
+    Adjacent ranges are merged, so contiguous keys are always represented by a single range.
+    Keys are iterated in ascending order, the set can be compared to (and combined with) other sets.
+    """
+
+    def __init__(self, keys: Iterable[int] = ()):
+        self._starts: List[int] = list()
+        """
+        First keys of the ranges, sorted in ascending order.
+        """
+        self._stops: List[int] = list()
+        """
+        Last keys of the ranges (inclusive), in the same order as `_starts`.
+        """
+        self._length = 0
+        """
+        Total number of the keys.
+        """
+        for key in sorted(set(keys)):
+            self.add(key)
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[int, int]]) -> "KeyRanges":
+        """
+        Create a key set from a list of ranges.
+
+        :param ranges: Iterable of tuples (first key, last key), both inclusive; the ranges may overlap.
+        :return: New key set.
+        """
+
+        instance = cls()
+        for start, stop in sorted(ranges):
+            if start > stop:
+                raise ValueError(f"Invalid key range: ({start}, {stop})")
+            if len(instance._stops) > 0 and start <= instance._stops[-1] + 1:
+                if stop > instance._stops[-1]:
+                    instance._length += stop - instance._stops[-1]
+                    instance._stops[-1] = stop
+            else:
+                instance._starts += [start]
+                instance._stops += [stop]
+                instance._length += stop - start + 1
+        return instance
+
+    @property
+    def ranges(self) -> List[Tuple[int, int]]:
+        """
+        List of tuples (first key, last key) of the ranges, both inclusive, sorted in ascending order.
+        """
+
+        return list(zip(self._starts, self._stops))
+
+    def _find(self, key: int) -> int:
+        """
+        Find the range that may contain the key.
+
+        :param key: Key to find.
+        :return: Index of the last range starting at or before the key, `-1` if there is no such range.
+        """
+
+        return bisect_right(self._starts, key) - 1
+
+    def add(self, key: int) -> None:
+        """
+        Add a key to the set, merging the adjacent ranges.
+
+        :param key: Key to add.
+        """
+
+        position = self._find(key)
+        if position >= 0 and key <= self._stops[position]:
+            return
+        self._length += 1
+        merge_left = position >= 0 and self._stops[position] == key - 1
+        merge_right = position + 1 < len(self._starts) and self._starts[position + 1] == key + 1
+        if merge_left and merge_right:
+            self._stops[position] = self._stops.pop(position + 1)
+            del self._starts[position + 1]
+        elif merge_left:
+            self._stops[position] = key
+        elif merge_right:
+            self._starts[position + 1] = key
+        else:
+            self._starts.insert(position + 1, key)
+            self._stops.insert(position + 1, key)
+
+    def discard(self, key: int) -> None:
+        """
+        Remove a key from the set if it is present, splitting the range if required.
+
+        :param key: Key to remove.
+        """
+
+        position = self._find(key)
+        if position < 0 or key > self._stops[position]:
+            return
+        self._length -= 1
+        start, stop = self._starts[position], self._stops[position]
+        if start == stop:
+            del self._starts[position], self._stops[position]
+        elif key == start:
+            self._starts[position] = key + 1
+        elif key == stop:
+            self._stops[position] = key - 1
+        else:
+            self._stops[position] = key - 1
+            self._starts.insert(position + 1, key + 1)
+            self._stops.insert(position + 1, stop)
+
+    def between(self, first: Optional[int] = None, last: Optional[int] = None) -> Iterator[int]:
+        """
+        Iterate over the keys within the given bounds in ascending order.
+
+        :param first: The smallest key to yield (inclusive), `None` for no lower bound.
+        :param last: The largest key to yield (inclusive), `None` for no upper bound.
+        :return: Iterator over the keys.
+        """
+
+        position = 0 if first is None else max(self._find(first), 0)
+        for start, stop in zip(self._starts[position:], self._stops[position:]):
+            if last is not None and start > last:
+                break
+            start = start if first is None else max(start, first)
+            stop = stop if last is None else min(stop, last)
+            yield from range(start, stop + 1)
+
+    def last(self, count: int) -> List[int]:
+        """
+        Get the largest keys of the set.
+
+        :param count: Number of the keys to get.
+        :return: List of the largest keys (no more than `count`), sorted in ascending order.
+        """
+
+        result = list()
+        for start, stop in zip(reversed(self._starts), reversed(self._stops)):
+            if len(result) >= count:
+                break
+            result += range(stop, max(start, stop - count + len(result) + 1) - 1, -1)
+        return result[::-1]
+
+    def index(self, key: int) -> int:
+        """
+        Get the position of a key in the ascending order of the keys.
+
+        :param key: Key to find.
+        :return: Number of the keys smaller than the given one.
+        :raises ValueError: If the key is not in the set.
+        """
+
+        position = self._find(key)
+        if position < 0 or key > self._stops[position]:
+            raise ValueError(f"Key {key} is not in the set")
+        return sum(stop - start + 1 for start, stop in zip(self._starts[:position], self._stops[:position])) + (
+            key - self._starts[position]
+        )
+
+    def copy(self) -> "KeyRanges":
+        return KeyRanges.from_ranges(self.ranges)
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, int):
+            return False
+        position = self._find(key)
+        return position >= 0 and key <= self._stops[position]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[int]:
+        return self.between()
+
+    def __reversed__(self) -> Iterator[int]:
+        for start, stop in zip(reversed(self._starts), reversed(self._stops)):
+            yield from range(stop, start - 1, -1)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, KeyRanges):
+            return self._starts == other._starts and self._stops == other._stops
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"KeyRanges({self.ranges})"
@@ -0,0 +1,137 @@
+"""
+Serialization
+-------------
+This module defines :py:class:`Serializer` used for converting context data
+(turn items, `misc` and `framework_data`) to bytes before writing them to context storages.
+
+The following formats are supported:
+
+- `json` -- pydantic JSON, the default one, human-readable;
+- `msgpack` -- `msgpack` encoding of the JSON-compatible data (requires `msgpack` package),
+  more compact and faster to parse than JSON;
+- `pickle` -- pickle protocol 5 encoding of the python data, the fastest one,
+  also stores non-JSON-serializable values natively (without base64 encoded pickle fallback).
+  Just like with `pickle` context storage, the storage contents should be trusted.
+
+Binary formats are prefixed with a tag byte (``0x10`` for `msgpack`, ``0x11`` for `pickle`),
+data without a tag is considered to be JSON.
+That way, the data written in different formats can be read regardless of the current storage format.
+"""
+
+from json import loads as json_loads
+from pickle import dumps as pickle_dumps, loads as pickle_loads
+from typing import Any, Literal
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import msgpack
+
+    msgpack_available = True
+except ImportError:
+    msgpack_available = False
+
+_SerializationFormat = Literal["json", "msgpack", "pickle"]
+
+_MSGPACK_TAG = b"\x10"
+_PICKLE_TAG = b"\x11"
+_PICKLE_PROTOCOL = 5
+
+
+def _unpack(data: bytes) -> Any:
+    if data[:1] == _MSGPACK_TAG:
+        if not msgpack_available:
+            raise ImportError("`msgpack` package is missing.\nTry to run `pip install chatsky[msgpack]`")
+        return msgpack.unpackb(data[1:], strict_map_key=False)
+    elif data[:1] == _PICKLE_TAG:
+        return pickle_loads(data[1:])
+    else:
+        return json_loads(data)
+
+
+def loads(adapter: TypeAdapter, data: bytes) -> Any:
+    """
+    Deserialize and validate data serialized by any :py:class:`Serializer`, the format is defined by the tag byte.
+
+    :param adapter: Type adapter of the serialized value.
+    :param data: Serialized value.
+    :return: Validated value.
+    """
+
+    if data[:1] in (_MSGPACK_TAG, _PICKLE_TAG):
+        return adapter.validate_python(_unpack(data))
+    return adapter.validate_json(data)
+
+
+def loads_python(data: bytes) -> Any:
+    """
+    Deserialize data serialized by any :py:class:`Serializer` without validation.
+
+    :param data: Serialized value.
+    :return: Python representation of the value, that can be validated by pydantic.
+    """
+
+    return _unpack(data)
+
+
+class Serializer:
+    """
+    Serializer that converts values to bytes in the given format.
+
+    :param format: Serialization format name.
+    """
+
+    def __init__(self, format: _SerializationFormat = "json"):
+        if format not in ("json", "msgpack", "pickle"):
+            raise ValueError(f"Unknown serialization format: {format}")
+        if format == "msgpack" and not msgpack_available:
+            raise ImportError("`msgpack` package is missing.\nTry to run `pip install chatsky[msgpack]`")
+        self.format = format
+
+    def dumps(self, adapter: TypeAdapter, value: Any) -> bytes:
+        """
+        Serialize a value.
+
+        :param adapter: Type adapter of the value.
+        :param value: Value to serialize.
+        :return: Serialized value, with tag byte for the binary formats.
+        """
+
+        if self.format == "msgpack":
+            return _MSGPACK_TAG + msgpack.packb(adapter.dump_python(value, mode="json"))
+        elif self.format == "pickle":
+            return _PICKLE_TAG + pickle_dumps(adapter.dump_python(value), protocol=_PICKLE_PROTOCOL)
+        else:
+            return adapter.dump_json(value)
+
+    def dumps_model(self, model: BaseModel) -> bytes:
+        """
+        Serialize a pydantic model without creating a type adapter for it.
+
+        :param model: Model to serialize.
+        :return: Serialized model, with tag byte for the binary formats.
+        """
+
+        if self.format == "msgpack":
+            return _MSGPACK_TAG + msgpack.packb(model.model_dump(mode="json"))
+        elif self.format == "pickle":
+            return _PICKLE_TAG + pickle_dumps(model.model_dump(), protocol=_PICKLE_PROTOCOL)
+        else:
+            return model.model_dump_json().encode()
+
+    def loads(self, adapter: TypeAdapter, data: bytes) -> Any:
+        """
+        Deserialize a value, see :py:func:`loads`.
+
+        :param adapter: Type adapter of the value.
+        :param data: Serialized value.
+        :return: Validated value.
+        """
+
+        return loads(adapter, data)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Serializer) and self.format == other.format
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(format={self.format!r})"
@@ -2,15 +2,18 @@
 Cleanup DB
 ----------
 This module defines functions that allow to delete data in various types of databases,
-including JSON, MongoDB, Pickle, Redis, Shelve, SQL, and YDB databases.
+including JSON, Log, MongoDB, Pickle, Redis, Shelve, SQL, and YDB databases.
 """
 
+from shutil import rmtree
 from typing import Any
 
 from chatsky.context_storages import (
     JSONContextStorage,
+    LogContextStorage,
     MongoContextStorage,
     RedisContextStorage,
+    ShelveContextStorage,
     SQLContextStorage,
     YDBContextStorage,
     mongo_available,
@@ -32,6 +35,27 @@ async def delete_file(storage: JSONContextStorage):
         storage.path.unlink()
 
 
+async def delete_shelve(storage: ShelveContextStorage):
+    """
+    Delete all data from a shelve context storage.
+
+    :param storage: A ShelveContextStorage object.
+    """
+    await storage.clear_all()
+    await storage.close()
+
+
+async def delete_log(storage: LogContextStorage):
+    """
+    Delete all data from a log context storage.
+
+    :param storage: A LogContextStorage object.
+    """
+    await storage.close()
+    if storage.path.exists():
+        rmtree(storage.path)
+
+
 async def delete_mongo(storage: MongoContextStorage):
     """
     Delete all data from a MongoDB context storage.
@@ -40,7 +64,7 @@ async def delete_mongo(storage: MongoContextStorage):
     """
     if not mongo_available:
         raise Exception("Can't delete mongo database - mongo provider unavailable.")
-    for collection in [storage.main_table, storage.turns_table]:
+    for collection in [storage.main_table, storage.turns_table, storage.misc_table, storage.blobs_table]:
         await collection.drop()
 
 
@@ -69,7 +93,7 @@ async def delete_sql(storage: SQLContextStorage):
     if storage.dialect == "mysql" and not mysql_available:
         raise Exception("Can't delete mysql database - mysql provider unavailable.")
     async with storage.engine.begin() as conn:
-        for table in [storage.main_table, storage.turns_table]:
+        for table in [storage.main_table, storage.turns_table, storage.misc_table, storage.blobs_table]:
             await conn.run_sync(table.drop, storage.engine)
 
 
@@ -83,7 +107,7 @@ async def delete_ydb(storage: YDBContextStorage):
         raise Exception("Can't delete ydb database - ydb provider unavailable.")
 
     async def callee(session: Any) -> None:
-        for table in [storage.main_table, storage.turns_table]:
+        for table in [storage.main_table, storage.turns_table, storage.misc_table, storage.blobs_table]:
             await session.drop_table("/".join([storage.database, table]))
 
     await storage.pool.retry_operation(callee)
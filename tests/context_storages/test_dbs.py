@@ -2,6 +2,8 @@ import os
 from platform import system
 from socket import AF_INET, SOCK_STREAM, socket
 from typing import Awaitable, Callable, Optional
+from time import time_ns
+from hashlib import sha256
 import asyncio
 import random
 
@@ -12,6 +14,7 @@ from chatsky.context_storages import (
     context_storage_factory,
     json_available,
     pickle_available,
+    log_available,
     postgres_available,
     mysql_available,
     sqlite_available,
@@ -19,17 +22,33 @@ from chatsky.context_storages import (
     mongo_available,
     ydb_available,
     DBContextStorage,
+    ConcurrentModificationError,
+    CachedContextStorage,
+    MemoryContextStorage,
+    ShardedContextStorage,
+    JSONContextStorage,
+    RedisContextStorage,
+    YDBContextStorage,
+    RetentionPolicy,
+    AdaptiveSubscriptPolicy,
+    migrate,
 )
 from chatsky.utils.testing.cleanup_db import (
     delete_file,
+    delete_log,
+    delete_shelve,
     delete_mongo,
     delete_redis,
     delete_sql,
     delete_ydb,
 )
 from chatsky import Pipeline
+from chatsky.core import Context, Message
 from chatsky.core.ctx_utils import ContextMainInfo
-from chatsky.context_storages.database import _SUBSCRIPT_TYPE
+from chatsky.core.script_parsing import JSONImporter
+from chatsky.utils.compression import CompressionCodec
+from chatsky.utils.serialization import Serializer, msgpack_available
+from chatsky.context_storages.database import _SUBSCRIPT_TYPE, NameConfig
 from chatsky.utils.testing import TOY_SCRIPT_KWARGS, HAPPY_PATH, check_happy_path
 
 from tests.test_utils import get_path_from_tests_to_current_dir
@@ -79,7 +98,12 @@ def test_protocol_suggestion(protocol: str, expected: str) -> None:
     "db_kwargs,db_teardown",
     [
         pytest.param({"path": ""}, None, id="memory"),
-        pytest.param({"path": "shelve://{__testing_file__}"}, delete_file, id="shelve"),
+        pytest.param({"path": "", "serialization": "pickle"}, None, id="memory_pickle"),
+        pytest.param({"path": "", "serialization": None}, None, id="memory_objects"),
+        pytest.param({"path": "", "max_contexts": 1, "spill_storage": ""}, None, id="memory_spill"),
+        pytest.param({"path": "", "cache": {"max_contexts": 2}}, None, id="cached"),
+        pytest.param({"path": "sharded://", "shards": ["", "", ""]}, None, id="sharded"),
+        pytest.param({"path": "shelve://{__testing_file__}"}, delete_shelve, id="shelve"),
         pytest.param(
             {"path": "json://{__testing_file__}"},
             delete_file,
@@ -92,6 +116,12 @@ def test_protocol_suggestion(protocol: str, expected: str) -> None:
             id="pickle",
             marks=[pytest.mark.skipif(not pickle_available, reason="Asynchronous file (pickle) dependencies missing")],
         ),
+        pytest.param(
+            {"path": "log://{__testing_file__}"},
+            delete_log,
+            id="log",
+            marks=[pytest.mark.skipif(not log_available, reason="Asynchronous file (log) dependencies missing")],
+        ),
         pytest.param(
             {
                 "path": "mongodb://{MONGO_INITDB_ROOT_USERNAME}:{MONGO_INITDB_ROOT_PASSWORD}@"
@@ -160,7 +190,9 @@ class TestContextStorages:
         if "{__testing_file__}" in db_kwargs["path"]:
             kwargs["__testing_file__"] = str(tmpdir_factory.mktemp("data").join("file.db"))
         db_kwargs["path"] = db_kwargs["path"].format(**kwargs)
-        context_storage = context_storage_factory(**db_kwargs)
+        context_storage = context_storage_factory(**{k: v for k, v in db_kwargs.items() if k != "cache"})
+        if "cache" in db_kwargs:
+            context_storage = CachedContextStorage(context_storage, **db_kwargs["cache"])
         await context_storage.connect()
 
         yield context_storage
@@ -282,6 +314,163 @@ class TestContextStorages:
         self.configure_context_storage(db, requests_subscript={5, 1})
         assert await db.load_field_latest("1", "requests") == [(5, b"5"), (1, b"1")]
 
+    async def test_context_bundle(self, db: DBContextStorage, ctx_info: ContextMainInfo, add_context: AddContextType):
+        empty_fields = {"labels": ([], []), "requests": ([], []), "responses": ([], [])}
+        assert await db.load_context_bundle("1") == (None, empty_fields)
+
+        await add_context(db, "1", ctx_info)
+        await db.update_context("1", field_info=[("requests", [(1, b"1"), (3, b"3"), (2, b"2"), (4, b"4")], list())])
+        await db.update_context("1", field_info=[("requests", list(), [3])])
+
+        self.configure_context_storage(db, requests_subscript=2)
+        main_info, fields_info = await db.load_context_bundle("1")
+        assert main_info == ctx_info
+        assert set(fields_info["labels"][0]) == {0}
+        assert fields_info["labels"][1] == [(0, b"0")]
+        assert set(fields_info["requests"][0]) == {1, 2, 4}
+        assert fields_info["requests"][1] == [(4, b"4"), (2, b"2")]
+        assert fields_info["responses"] == ([], [])
+
+        self.configure_context_storage(db, requests_subscript={1, 3})
+        _, fields_info = await db.load_context_bundle("1")
+        assert fields_info["requests"][1] == [(1, b"1")]
+
+        self.configure_context_storage(db, requests_subscript="__all__")
+        _, fields_info = await db.load_context_bundle("1")
+        assert fields_info["requests"][1] == [(4, b"4"), (2, b"2"), (1, b"1")]
+        assert fields_info["requests"][1] == await db.load_field_latest("1", "requests")
+
+    async def test_bulk_operations(self, db: DBContextStorage, ctx_info: ContextMainInfo):
+        new_info = ContextMainInfo(current_turn_id=2, created_at=1, updated_at=2)
+        await db.update_context_many(
+            [
+                ("1", ctx_info, [("requests", [(1, b"1"), (2, b"2"), (3, b"3")], list())]),
+                ("2", ctx_info, [("requests", [(1, b"4")], list()), ("labels", [(1, b"5")], list())]),
+                ("1", new_info, [("requests", list(), [2])]),
+            ]
+        )
+        assert await db.update_context_many(list()) is None
+
+        assert await db.load_main_info_many(["1", "2", "3", "1"]) == {"1": new_info, "2": ctx_info, "3": None}
+        assert await db.load_main_info_many(list()) == dict()
+
+        self.configure_context_storage(db, requests_subscript=1)
+        latest = await db.load_field_latest_many(["1", "2", "3"], "requests")
+        assert latest == {"1": [(3, b"3")], "2": [(1, b"4")], "3": []}
+
+        self.configure_context_storage(db, requests_subscript="__all__")
+        latest = await db.load_field_latest_many(["1", "2"], "requests")
+        assert latest == {"1": [(3, b"3"), (1, b"1")], "2": [(1, b"4")]}
+        assert latest["1"] == await db.load_field_latest("1", "requests")
+
+        self.configure_context_storage(db, requests_subscript={1, 2})
+        assert await db.load_field_latest_many(["1", "2"], "requests") == {"1": [(1, b"1")], "2": [(1, b"4")]}
+
+        with pytest.raises(ValueError, match="Invalid value 'non-existent' for argument 'field_name'."):
+            await db.load_field_latest_many(["1"], "non-existent")
+
+    async def test_list_context_ids(self, db: DBContextStorage, ctx_info: ContextMainInfo, add_context: AddContextType):
+        assert await db.list_context_ids() == list()
+        for ctx_id in ["c", "a", "e", "b", "d"]:
+            await add_context(db, ctx_id, ctx_info)
+
+        assert await db.list_context_ids() == ["a", "b", "c", "d", "e"]
+        assert await db.list_context_ids(limit=2) == ["a", "b"]
+        assert await db.list_context_ids("b", 2) == ["c", "d"]
+        assert await db.list_context_ids("d", 2) == ["e"]
+        assert await db.list_context_ids("e") == list()
+
+        await db.delete_context("c")
+        assert await db.list_context_ids("b", 2) == ["d", "e"]
+
+        with pytest.raises(ValueError, match="Invalid limit value: 0"):
+            await db.list_context_ids(limit=0)
+
+    async def test_conditional_update(self, db: DBContextStorage, ctx_info: ContextMainInfo):
+        next_info = ContextMainInfo(current_turn_id=2, created_at=1, updated_at=2)
+        await db.update_context("1", ctx_info, [("requests", [(1, b"1")], list())], expected_turn_id=0)
+        assert await db.load_main_info("1") == ctx_info
+
+        with pytest.raises(ConcurrentModificationError):
+            await db.update_context("1", next_info, [("requests", [(2, b"2")], list())], expected_turn_id=0)
+        assert await db.load_main_info("1") == ctx_info
+        assert await db.load_field_keys("1", "requests") == [1]
+
+        await db.update_context("1", next_info, [("requests", [(2, b"2")], list())], expected_turn_id=1)
+        assert await db.load_main_info("1") == next_info
+        assert set(await db.load_field_keys("1", "requests")) == {1, 2}
+
+        with pytest.raises(ValueError, match="Conditional context update requires context main information"):
+            await db.update_context("1", None, [("requests", [(3, b"3")], list())], expected_turn_id=2)
+
+    async def test_field_ranges(self, db: DBContextStorage, ctx_info: ContextMainInfo):
+        assert await db.load_field_key_ranges("1", "requests") == list()
+        items = [(k, str(k).encode()) for k in (1, 2, 3, 5)]
+        await db.update_context("1", ctx_info, [("requests", items, list())])
+        assert await db.load_field_key_ranges("1", "requests") == [(1, 3), (5, 5)]
+        assert await db.load_field_range("1", "requests", 2, 7) == [(2, b"2"), (3, b"3"), (5, b"5")]
+        assert await db.load_field_range("1", "requests", 6, 7) == list()
+
+        await db.update_context("1", ctx_info, [("requests", [(4, b"4")], list())])
+        assert await db.load_field_key_ranges("1", "requests") == [(1, 5)]
+        assert await db.load_field_range("1", "requests", -1, 2) == [(1, b"1"), (2, b"2")]
+
+    async def test_misc_items(self, db: DBContextStorage, ctx_info: ContextMainInfo, add_context: AddContextType):
+        await add_context(db, "1", ctx_info)
+        await add_context(db, "2", ctx_info)
+        assert await db.load_misc_keys("1") == list()
+
+        await db.update_misc("1", [("a", b"1"), ("b", b"2")], list())
+        await db.update_misc("2", [("a", b"3")], list())
+        assert sorted(await db.load_misc_keys("1")) == ["a", "b"]
+        assert set(await db.load_misc_items("1", ["a", "b", "c"])) == {("a", b"1"), ("b", b"2")}
+
+        await db.update_misc("1", [("a", b"4")], ["b"])
+        assert await db.load_misc_keys("1") == ["a"]
+        assert set(await db.load_misc_items("1", ["a", "b"])) == {("a", b"4")}
+
+        await db.delete_context("1")
+        assert await db.load_misc_keys("1") == list()
+        assert set(await db.load_misc_items("2", ["a"])) == {("a", b"3")}
+
+    async def test_blob_store(self, db: DBContextStorage, ctx_info: ContextMainInfo):
+        if db.serializer is None or isinstance(db, (CachedContextStorage, ShardedContextStorage)):
+            pytest.skip("Blob store is not available for object storages and wrapper storages")
+        db.blob_threshold = 16
+        large, small = b"0123456789" * 4, b"small"
+        await db.update_context("1", ctx_info, [("requests", [(1, large), (2, small)], list())])
+        await db.update_context(
+            "2", ctx_info, [("requests", [(1, large)], list()), ("responses", [(1, large)], list())]
+        )
+
+        # Identical values are stored once, turns only hold the references to them
+        blob_key = sha256(large).hexdigest()
+        assert await db._load_field_items("2", "requests", [1]) == [(1, b"\x12" + blob_key.encode())]
+        assert await db._load_blobs([blob_key, "missing"]) == [(blob_key, large)]
+
+        assert await db.load_field_latest("2", "responses") == [(1, large)]
+        assert (await db.load_field_latest_many(["1", "2"], "requests"))["2"] == [(1, large)]
+        _, fields_info = await db.load_context_bundle("2")
+        assert fields_info["requests"] == ([1], [(1, large)])
+        assert await db.load_field_items("1", "requests", [1, 2]) == [(1, large), (2, small)]
+
+    async def test_gc_blobs(self, db: DBContextStorage, ctx_info: ContextMainInfo):
+        if db.serializer is None or isinstance(db, (CachedContextStorage, ShardedContextStorage)):
+            pytest.skip("Blob store is not available for object storages and wrapper storages")
+        db.blob_threshold = 16
+        shared, own = b"0123456789" * 4, b"9876543210" * 4
+        await db.update_context("1", ctx_info, [("requests", [(1, shared), (2, own)], list())])
+        await db.update_context("2", ctx_info, [("responses", [(1, shared)], list())])
+        own_key = sha256(own).hexdigest()
+
+        # Blobs are not deleted with the context, only the ones that are no longer referenced are collected
+        await db.gc_blobs()
+        assert await db.load_field_items("1", "requests", [1, 2]) == [(1, shared), (2, own)]
+        await db.delete_context("1")
+        await db.gc_blobs()
+        assert own_key not in await db._list_blob_keys()
+        assert await db.load_field_latest("2", "responses") == [(1, shared)]
+
     async def test_delete_field_key(self, db: DBContextStorage, ctx_info: ContextMainInfo, add_context: AddContextType):
         await add_context(db, "1", ctx_info)
 
@@ -309,6 +498,20 @@ class TestContextStorages:
         assert set(await db.load_field_keys("1", "labels")) == set()
         assert set(await db.load_field_keys("2", "labels")) == {0}
 
+    async def test_store_deleted_context(self, db: DBContextStorage):
+        ctx = await Context.connected(db, ("flow", "node"), "1")
+        ctx.misc["a"] = 1
+        await ctx.store()
+        ctx = await Context.connected(db, ("flow", "node"), "1")
+
+        # Context deleted after it was loaded is written in full, even though its misc did not change
+        await db.delete_context("1")
+        ctx.requests[2] = Message("request")
+        await ctx.store()
+        main_info = await db.load_main_info("1")
+        assert main_info is not None and main_info.misc == {"a": 1}
+        assert await db.load_field_keys("1", "requests") == [2]
+
     async def test_clear_all(self, db: DBContextStorage, ctx_info: ContextMainInfo, add_context: AddContextType):
         await add_context(db, "1", ctx_info)
         await add_context(db, "2", ctx_info)
@@ -320,6 +523,51 @@ class TestContextStorages:
         assert set(await db.load_field_keys("1", "labels")) == set()
         assert set(await db.load_field_keys("2", "labels")) == set()
 
+    async def test_delete_expired(self, db: DBContextStorage, add_context: AddContextType):
+        if isinstance(db, RedisContextStorage):
+            pytest.skip("Redis expires contexts natively")
+        await add_context(db, "1", ContextMainInfo(current_turn_id=1, created_at=1, updated_at=10))
+        await add_context(db, "2", ContextMainInfo(current_turn_id=1, created_at=1, updated_at=20))
+        await add_context(db, "3", ContextMainInfo(current_turn_id=1, created_at=1, updated_at=30))
+
+        assert len(await db.delete_expired(25, 1)) == 1
+        assert set(await db.delete_expired(25, 10)) | {"1", "2"} == {"1", "2"}
+
+        assert await db.load_main_info("1") is None
+        assert await db.load_main_info("2") is None
+        assert await db.load_main_info("3") is not None
+        assert set(await db.load_field_keys("1", "labels")) == set()
+        assert set(await db.load_field_keys("3", "labels")) == {0}
+
+    async def test_archive(self, db: DBContextStorage):
+        if isinstance(db, JSONContextStorage):
+            pytest.skip("JSON storage does not support archival")
+        if isinstance(db, YDBContextStorage) and db._key_type != "Int32":
+            pytest.skip("YDB tables created without archival have unsigned keys")
+        db.retention = RetentionPolicy(archive_turns=2)
+        for turn in range(5):
+            ctx_info = ContextMainInfo(current_turn_id=turn, created_at=1, updated_at=1)
+            await db.update_context("1", ctx_info, [("labels", [(turn, bytes(turn))], list())])
+
+        if not isinstance(db, ShardedContextStorage):
+            assert set(await db._load_field_keys("1", "labels")) == {-2, -1, 3, 4}
+        assert set(await db.load_field_keys("1", "labels")) == {0, 1, 2, 3, 4}
+        assert await db.load_field_key_ranges("1", "labels") == [(0, 4)]
+        assert await db.load_field_items("1", "labels", [1, 3, 5]) == [(1, bytes(1)), (3, bytes(3))]
+        assert await db.load_field_range("1", "labels", 1, 3) == [(1, bytes(1)), (2, bytes(2)), (3, bytes(3))]
+        assert await db.load_field_latest("1", "labels") == [(4, bytes(4)), (3, bytes(3)), (2, bytes(2))]
+        _, fields_info = await db.load_context_bundle("1")
+        assert set(fields_info["labels"][0]) == {0, 1, 2, 3, 4}
+        assert fields_info["labels"][1] == [(4, bytes(4)), (3, bytes(3)), (2, bytes(2))]
+
+        # Archived items can be overwritten and deleted
+        await db.update_context("1", field_info=[("labels", [(2, b"2")], [1])])
+        assert set(await db.load_field_keys("1", "labels")) == {0, 2, 3, 4}
+        assert await db.load_field_items("1", "labels", [0, 1, 2]) == [(0, bytes(0)), (2, b"2")]
+
+        await db.delete_context("1")
+        assert await db.load_field_keys("1", "labels") == []
+
     @pytest.mark.slow
     async def test_concurrent_operations(self, db: DBContextStorage):
         async def db_operations(key: int):
@@ -352,3 +600,569 @@ class TestContextStorages:
         # Test Pipeline workload on DB
         pipeline = Pipeline(**TOY_SCRIPT_KWARGS, context_storage=db)
         check_happy_path(pipeline, happy_path=HAPPY_PATH)
+
+
+@pytest.mark.skipif(not sqlite_available, reason="Sqlite dependencies missing")
+async def test_sql_batched_writes(tmpdir_factory):
+    from sqlalchemy import event
+
+    separator = "///" if system() == "Windows" else "////"
+    path = f"sqlite+aiosqlite:{separator}{tmpdir_factory.mktemp('data').join('file.db')}"
+    db = context_storage_factory(path, batch_window=0.1, batch_max_size=4)
+    await db.connect()
+
+    transactions = list()
+    event.listen(db.engine.sync_engine, "begin", lambda conn: transactions.append(conn))
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1)
+
+    # Sqlite storage is concurrent in batched mode, so the concurrent updates are written together
+    assert db.is_concurrent
+    await asyncio.gather(
+        *[db.update_context(str(i), ctx_info, [("labels", [(0, f"{i}".encode())], list())]) for i in range(3)],
+        db.update_context("0", ctx_info, [("labels", [(0, b"new"), (1, b"1")], list())]),
+    )
+    assert len(transactions) == 1
+    assert await db.load_field_latest("0", "labels") == [(1, b"1"), (0, b"new")]
+    assert await db.load_field_latest("2", "labels") == [(0, b"2")]
+
+    transactions.clear()
+    await asyncio.gather(*[db.update_context(str(i), ctx_info) for i in range(5)])
+    assert len(transactions) == 2
+
+    # Writes outside of the batches write the collected updates first
+    update_task = asyncio.create_task(db.update_context("5", ctx_info, [("labels", [(0, b"5")], list())]))
+    await asyncio.sleep(0.01)
+    await db.delete_context("5")
+    await update_task
+    assert await db.load_main_info("5") is None
+
+    await delete_sql(db)
+
+
+@pytest.mark.skipif(not sqlite_available, reason="Sqlite dependencies missing")
+async def test_sql_unchanged_main_info(tmpdir_factory):
+    from sqlalchemy import event
+
+    separator = "///" if system() == "Windows" else "////"
+    path = f"sqlite+aiosqlite:{separator}{tmpdir_factory.mktemp('data').join('file.db')}"
+    db = context_storage_factory(path)
+    await db.connect()
+
+    ctx = await Context.connected(db, ("flow", "node"), "1")
+    ctx.misc["a"] = 1
+    await ctx.store()
+    ctx = await Context.connected(db, ("flow", "node"), "1")
+
+    # Unchanged misc is not written, so the concurrent misc update is preserved
+    await db.update_context("1", ContextMainInfo(current_turn_id=0, created_at=1, updated_at=1, misc={"b": 2}))
+    ctx.current_turn_id = 1
+    await ctx.store()
+    main_info = await db.load_main_info("1")
+    assert (main_info.current_turn_id, main_info.misc) == (1, {"b": 2})
+
+    ctx.misc["c"] = 3
+    await ctx.store()
+    assert (await db.load_main_info("1")).misc == {"a": 1, "c": 3}
+
+    # Partial updates of several contexts share one statement, the deleted context is written in full
+    for ctx_id in ("2", "3", "4"):
+        await db.update_context(ctx_id, ContextMainInfo(current_turn_id=0, created_at=1, updated_at=1, misc={"d": 4}))
+    main_infos = await db.load_main_info_many(["2", "3", "4"])
+    await db.delete_context("4")
+    statements = list()
+    event.listen(db.engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    for main_info in main_infos.values():
+        main_info.current_turn_id = 1
+        main_info._hashes = dict(main_info._loaded_hashes)
+    await db.update_context_many([(ctx_id, main_info, list()) for ctx_id, main_info in main_infos.items()])
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+    main_infos = await db.load_main_info_many(["2", "3", "4"])
+    assert {c: (i.current_turn_id, i.misc) for c, i in main_infos.items()} == {c: (1, {"d": 4}) for c in "234"}
+
+    await delete_sql(db)
+
+
+@pytest.mark.skipif(not sqlite_available, reason="Sqlite dependencies missing")
+async def test_sql_archived_rows(tmpdir_factory):
+    separator = "///" if system() == "Windows" else "////"
+    path = f"sqlite+aiosqlite:{separator}{tmpdir_factory.mktemp('data').join('file.db')}"
+    db = context_storage_factory(path, retention=RetentionPolicy(archive_turns=4, sweep_interval=None))
+    await db.connect()
+
+    for turn in range(9):
+        ctx_info = ContextMainInfo(current_turn_id=turn, created_at=1, updated_at=1)
+        field_info = [("labels", [(turn, bytes(turn))], list()), ("requests", [(turn, b"0")], list())]
+        await db.update_context("1", ctx_info, field_info)
+
+    # Archived turn rows are deleted, only the archives and the latest turns are kept
+    async with db.engine.begin() as conn:
+        rows = (await conn.execute(db.turns_table.select())).mappings().all()
+    assert sorted(row[NameConfig._key_column] for row in rows) == [-2, -1, 5, 6, 7, 8]
+    assert await db.load_field_keys("1", "labels") == list(range(9))
+
+    await delete_sql(db)
+
+
+@pytest.mark.skipif(not log_available, reason="Asynchronous file (log) dependencies missing")
+async def test_log_recovery_and_compaction(tmpdir_factory):
+    path = f"log://{tmpdir_factory.mktemp('data').join('log')}"
+    db = context_storage_factory(path, segment_size=256, compaction_interval=None)
+    await db.connect()
+
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1)
+    for i in range(10):
+        await db.update_context("1", ctx_info, [("requests", [(i, f"{i}".encode())], [i - 1])])
+    await db.update_context("2", ctx_info, [("labels", [(0, b"0")], list())])
+    await db.delete_context("2")
+    assert len(db._segments) > 1
+
+    # Index is restored from segments on reconnection
+    await db.close()
+    await db.connect()
+    assert await db.load_main_info("1") == ctx_info
+    assert await db.load_main_info("2") is None
+    assert await db.load_field_keys("1", "requests") == [9]
+    assert await db.load_field_items("1", "requests", [8, 9]) == [(9, b"9")]
+
+    # Compaction keeps only the actual records
+    await db._compact()
+    assert len(db._segments) == 1
+    assert db._live_size == db._total_size
+    await db.update_context("1", field_info=[("responses", [(9, b"response")], list())])
+    await db.close()
+    await db.connect()
+    assert await db.load_field_latest("1", "requests") == [(9, b"9")]
+    assert await db.load_field_latest("1", "responses") == [(9, b"response")]
+
+    await delete_log(db)
+
+
+async def test_shelve_reconnection(tmpdir_factory):
+    db = context_storage_factory(f"shelve://{tmpdir_factory.mktemp('data').join('file.db')}")
+    await db.connect()
+
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1)
+    await db.update_context("1", ctx_info, [("requests", [(1, b"1"), (2, b"2")], list())])
+    await db.update_context("1", field_info=[("requests", list(), [1])])
+    await db.update_context("2", ctx_info)
+    await db.update_context("0", ctx_info)
+    await db.delete_context("2")
+    await db.close()
+
+    await db.connect()
+    assert await db.load_main_info("1") == ctx_info
+    assert await db.load_field_keys("1", "requests") == [2]
+    assert await db.load_field_items("1", "requests", [1, 2]) == [(2, b"2")]
+
+    # Context IDs index is restored from the stored contexts
+    assert await db.list_context_ids() == ["0", "1"]
+    assert await db.list_context_ids(after="0", limit=1) == ["1"]
+    await db.update_context("0", ContextMainInfo(current_turn_id=1, created_at=1, updated_at=3))
+    assert await db.delete_expired(2, 10) == ["1"]
+    assert await db.list_context_ids() == ["0"]
+
+    await delete_shelve(db)
+
+
+async def test_cached_reads():
+    backend = MemoryContextStorage()
+    db = CachedContextStorage(backend, max_contexts=2)
+    await db.connect()
+
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1)
+    await db.update_context("1", ctx_info, [("labels", [(0, b"0")], list())])
+    await db.load_context_bundle("1")
+    assert (db.hits, db.misses) == (0, 1)
+
+    # Written data is served from cache, the backend is not used
+    await backend.update_context("1", field_info=[("labels", [(1, b"backend")], list())])
+    await db.update_context("1", field_info=[("labels", [(2, b"2")], list())])
+    assert await db.load_context_bundle("1") == (
+        ctx_info,
+        {"labels": ([0, 2], [(2, b"2"), (0, b"0")]), "requests": ([], []), "responses": ([], [])},
+    )
+    assert await db.load_field_items("1", "labels", [0, 1, 2]) == [(0, b"0"), (2, b"2")]
+    assert (db.hits, db.misses) == (2, 1)
+
+    # Least recently used contexts are evicted by both count and size
+    await db.update_context("2", ctx_info, [("labels", [(0, b"0")], list())])
+    await db.update_context("3", ctx_info, [("labels", [(0, b"0")], list())])
+    assert list(db._cache.keys()) == ["2", "3"]
+    db.max_bytes = db._cache_size
+    await db.update_context("3", field_info=[("requests", [(1, b"12345678")], list())])
+    assert list(db._cache.keys()) == ["3"]
+
+    await db.delete_context("1")
+    assert await db.load_main_info("1") is None
+    assert await backend.load_main_info("1") is None
+
+
+async def test_sharded_rebalance():
+    db = JSONImporter(custom_dir="none").replace_resolvable_objects(
+        {"chatsky.context_storages.ShardedContextStorage": {"shards": ["", ""], "virtual_nodes": 16}}
+    )
+    assert isinstance(db, ShardedContextStorage)
+    await db.connect()
+
+    ctx_ids = [str(i) for i in range(100)]
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1)
+    for ctx_id in ctx_ids:
+        await db.update_context(ctx_id, ctx_info, [("labels", [(0, ctx_id.encode())], list())])
+    assert all(len(shard._main_storage) > 0 for shard in db.shards)
+
+    moved = await db.add_shard(MemoryContextStorage(), ctx_ids)
+    assert 0 < moved == len(db.shards[-1]._main_storage) < len(ctx_ids)
+    assert sum(len(shard._main_storage) for shard in db.shards) == len(ctx_ids)
+    for ctx_id in ctx_ids:
+        assert await db.load_main_info(ctx_id) == ctx_info
+        assert await db.load_field_latest(ctx_id, "labels") == [(0, ctx_id.encode())]
+
+
+async def test_migration(tmpdir_factory):
+    source = MemoryContextStorage(compression="zlib")
+    ctx_ids = [f"{i:03}" for i in range(50)]
+    for ctx_id in ctx_ids:
+        ctx_info = ContextMainInfo(current_turn_id=2, created_at=1, updated_at=2, misc={"id": ctx_id})
+        items = [(1, ctx_id.encode()), (2, b"response")]
+        await source.update_context(ctx_id, ctx_info, [("requests", items, list()), ("labels", items[:1], list())])
+        await source.update_misc(ctx_id, [("key", ctx_id.encode())], list())
+
+    destination = MemoryContextStorage(serialization="pickle")
+    stats = await migrate(source, destination, workers=4, page_size=8)
+    assert (stats.contexts, stats.skipped, stats.items) == (50, 0, 150)
+    for ctx_id in ctx_ids:
+        assert await destination.load_main_info(ctx_id) == await source.load_main_info(ctx_id)
+        items = await destination.load_field_items(ctx_id, "requests", [1, 2])
+        assert items == [(1, ctx_id.encode()), (2, b"response")]
+
+    # Resuming from checkpoint only migrates the contexts after the last completed page
+    dump_path = tmpdir_factory.mktemp("dump").join("dump.jsonl.gz")
+    checkpoint_path = tmpdir_factory.mktemp("checkpoint").join("checkpoint.json")
+    checkpoint_path.write(f'{{"after": "{ctx_ids[19]}", "position": 20}}')
+    stats = await migrate(source, str(dump_path), page_size=16, checkpoint=str(checkpoint_path))
+    assert stats.contexts == 30
+
+    restored = MemoryContextStorage()
+    stats = await migrate(str(dump_path), restored)
+    assert stats.contexts == 30
+    assert await restored.list_context_ids(limit=100) == ctx_ids[20:]
+    for ctx_id in ctx_ids[20:]:
+        assert await restored.load_main_info(ctx_id) == await source.load_main_info(ctx_id)
+        assert await restored.load_field_items(ctx_id, "labels", [1]) == [(1, ctx_id.encode())]
+        assert await restored.load_misc_items(ctx_id, ["key"]) == [("key", ctx_id.encode())]
+
+    with pytest.raises(ValueError, match="can not be migrated"):
+        await migrate(source, MemoryContextStorage(serialization=None))
+
+
+async def test_compressed_storage():
+    db = MemoryContextStorage(compression=CompressionCodec("zlib", min_size=0))
+    await db.connect()
+
+    value = b'"' + b"response" * 100 + b'"'
+    ctx_info = ContextMainInfo(current_turn_id=1, created_at=1, updated_at=1, misc={"key": "value" * 100})
+    await db.update_context("1", ctx_info, [("responses", [(1, value)], list())])
+    assert db._aux_storage["responses"]["1"][1] != value
+    assert len(db._main_storage["1"].model_dump()["misc"]) < len(ctx_info.model_dump()["misc"])
+
+    # Uncompressed data written before compression was enabled stays readable
+    db._aux_storage["responses"]["1"][2] = value
+    assert await db.load_field_items("1", "responses", [1, 2]) == [(1, value), (2, value)]
+    assert await db.load_context_bundle("1") == (
+        ctx_info,
+        {"labels": ([], []), "requests": ([], []), "responses": ([1, 2], [(2, value), (1, value)])},
+    )
+    assert ContextMainInfo.model_validate(db._main_storage["1"].model_dump()) == ctx_info
+
+
+@pytest.mark.parametrize(
+    "serialization",
+    [
+        "pickle",
+        pytest.param("msgpack", marks=pytest.mark.skipif(not msgpack_available, reason="Msgpack dependencies missing")),
+    ],
+)
+async def test_serialized_storage(serialization: str):
+    db = MemoryContextStorage(serialization=serialization)
+    pipeline = Pipeline(**TOY_SCRIPT_KWARGS, context_storage=db)
+    check_happy_path(pipeline, happy_path=HAPPY_PATH)
+
+    ctx_id = next(iter(db._main_storage))
+    assert all(not v.startswith(b"{") for v in db._aux_storage["responses"][ctx_id].values())
+    assert not db._main_storage[ctx_id].model_dump()["framework_data"].startswith(b"{")
+
+    # Data written in one format stays readable after the storage format is changed
+    db.serializer = Serializer("json")
+    ctx = await Context.connected(db, id=ctx_id)
+    assert ctx.last_response == Message(HAPPY_PATH[-1][1])
+    assert ctx.last_request == Message(HAPPY_PATH[-1][0])
+
+
+@pytest.mark.parametrize("rewrite_existing", [False, True])
+async def test_object_storage(rewrite_existing: bool):
+    db = MemoryContextStorage(rewrite_existing=rewrite_existing, serialization=None)
+    pipeline = Pipeline(**TOY_SCRIPT_KWARGS, context_storage=db)
+    check_happy_path(pipeline, happy_path=HAPPY_PATH)
+
+    ctx_id = next(iter(db._main_storage))
+    assert all(isinstance(v, Message) for v in db._aux_storage["responses"][ctx_id].values())
+
+    # Modifications are isolated from the stored objects until the context is stored
+    ctx = await Context.connected(db, id=ctx_id)
+    (await ctx.requests[1]).text = "modified"
+    ctx.misc["key"] = "value"
+    assert db._aux_storage["requests"][ctx_id][1] == Message(HAPPY_PATH[0][0])
+    assert db._main_storage[ctx_id].misc == dict()
+
+    await ctx.store()
+    ctx = await Context.connected(db, id=ctx_id)
+    assert ctx.misc == {"key": "value"}
+    expected = "modified" if rewrite_existing else HAPPY_PATH[0][0]
+    assert (await ctx.requests[1]).text == db._aux_storage["requests"][ctx_id][1].text == expected
+
+    with pytest.raises(ValueError):
+        MemoryContextStorage(serialization=None, compression="zlib")
+    with pytest.raises(ValueError):
+        ShardedContextStorage("sharded://", shards=[MemoryContextStorage()], serialization=None)
+
+
+@pytest.mark.parametrize("serialization", ["json", None])
+async def test_lazy_misc(serialization: Optional[str]):
+    db = MemoryContextStorage(serialization=serialization)
+    await db.connect()
+    ctx = await Context.connected(db, ("flow", "node"), "1")
+    ctx.lazy_misc.update(cache={"a": [1, 2]}, other="value", unchanged=1)
+    await ctx.store()
+    assert sorted(await db.load_misc_keys("1")) == ["cache", "other", "unchanged"]
+
+    ctx = await Context.connected(db, ("flow", "node"), "1")
+    assert ctx.lazy_misc.get_loaded("cache") is None
+    await ctx.lazy_misc.prefetch(["cache", "unchanged"])
+    cache = ctx.lazy_misc.get_loaded("cache")
+    assert cache == {"a": [1, 2]}
+    cache["a"] += [3]
+    assert await ctx.lazy_misc.get("missing", "default") == "default"
+    assert await ctx.lazy_misc.pop("other") == "value"
+    assert await ctx.lazy_misc.keys() == ["cache", "unchanged"]
+
+    # Only the modified items are written
+    added, removed = ctx.lazy_misc.extract_sync()
+    assert [k for k, _ in added] == ["cache"] and removed == ["other"]
+    await db.update_misc(ctx.id, added, removed)
+    assert ctx.lazy_misc.extract_sync() == (list(), list())
+
+    ctx = await Context.connected(db, ("flow", "node"), "1")
+    assert await ctx.lazy_misc.items() == [("cache", {"a": [1, 2, 3]}), ("unchanged", 1)]
+    with pytest.raises(KeyError):
+        await ctx.lazy_misc["other"]
+
+
+async def test_bounded_memory_storage():
+    spill = MemoryContextStorage()
+    db = MemoryContextStorage(max_contexts=2, max_bytes=10, spill_storage=spill)
+    await db.connect()
+    for ctx_id in ("1", "2", "3"):
+        await db.update_context(ctx_id, ContextMainInfo(), [("requests", [(1, b"12345")], list())])
+
+    stats = db.get_stats()
+    assert (stats.contexts, stats.field_bytes["requests"], stats.evictions, stats.restorations) == (2, 10, 1, 0)
+    assert list(db._main_storage.keys()) == ["2", "3"] and list(spill._main_storage.keys()) == ["1"]
+
+    # Evicted context is restored transparently, evicting the least recently used one
+    await db.load_field_keys("2", "requests")
+    assert await db.load_field_items("1", "requests", [1]) == [(1, b"12345")]
+    assert list(db._main_storage.keys()) == ["2", "1"] and list(spill._main_storage.keys()) == ["3"]
+    assert db.get_stats().restorations == 1
+
+    # Single context exceeding the limit is kept
+    await db.update_context("1", field_info=[("requests", [(2, b"0123456789")], list())])
+    assert list(db._main_storage.keys()) == ["1"] and db.get_stats().field_bytes["requests"] == 15
+
+    await db.delete_context("2")
+    await db.delete_context("1")
+    assert db.get_stats().contexts == 0 and db.get_stats().field_bytes["requests"] == 0
+    assert list(spill._main_storage.keys()) == ["3"]
+    assert await db.delete_expired(time_ns(), 10) == ["3"]
+    assert await db.load_main_info("3") is None
+
+
+async def test_bounded_memory_storage_concurrency():
+    spill = MemoryContextStorage()
+    db = MemoryContextStorage(max_contexts=1, spill_storage=spill)
+    await db.connect()
+    await db.update_context("1", ContextMainInfo(), [("requests", [(1, b"12345")], list())])
+
+    spill_update_context = spill._update_context
+    spilling = asyncio.Event()
+
+    async def slow_update_context(*args):
+        spilling.set()
+        await asyncio.sleep(0.01)
+        await spill_update_context(*args)
+
+    spill._update_context = slow_update_context
+
+    # Context being evicted is read once it is spilled over, concurrent reads restore it only once
+    update = asyncio.create_task(db.update_context("2", ContextMainInfo(), list()))
+    await spilling.wait()
+    loaded = await asyncio.gather(*[db.load_field_items("1", "requests", [1]) for _ in range(2)])
+    await update
+    assert loaded == [[(1, b"12345")], [(1, b"12345")]]
+    assert db.get_stats().restorations == 1
+    assert list(db._main_storage.keys()) == ["1"] and list(spill._main_storage.keys()) == ["2"]
+
+
+async def test_retention():
+    db = MemoryContextStorage(retention=RetentionPolicy(ttl=0.05, max_turns=2, sweep_interval=None))
+    pipeline = Pipeline(**TOY_SCRIPT_KWARGS, context_storage=db)
+    check_happy_path(pipeline, happy_path=HAPPY_PATH)
+
+    ctx_id = next(iter(db._main_storage))
+    current_turn_id = db._main_storage[ctx_id].current_turn_id
+    for field_name in ("labels", "requests", "responses"):
+        assert await db.load_field_keys(ctx_id, field_name) == [current_turn_id - 1, current_turn_id]
+
+    await db.update_context("new", ContextMainInfo(updated_at=time_ns() + 10**9))
+    await asyncio.sleep(0.1)
+    assert await db.sweep_expired() == 1
+    assert list(db._main_storage.keys()) == ["new"]
+
+    # Without archival, deleting and loading turns don't request the field archive
+    requested = list()
+    original_load = db._load_field_items
+
+    async def load_field_items(ctx_id, field_name, keys):
+        requested.extend(keys)
+        return await original_load(ctx_id, field_name, keys)
+
+    db._load_field_items = load_field_items
+    await db.update_context("new", None, [("requests", [(1, b"1")], [0])])
+    assert await db.load_field_items("new", "requests", [1, 5]) == [(1, b"1")]
+    assert await db.load_field_range("new", "requests", 0, 3) == [(1, b"1")]
+    assert requested == [1, 5]
+    assert db._aux_storage["labels"].get(ctx_id, dict()) == dict()
+    assert db.retention_stats.sweeps == 1
+    assert db.retention_stats.deleted_contexts == db.retention_stats.last_deleted_contexts == 1
+    assert db.retention_stats.sweep_time == db.retention_stats.last_sweep_time > 0
+
+
+async def test_archived_context():
+    db = MemoryContextStorage(retention=RetentionPolicy(archive_turns=2))
+    pipeline = Pipeline(**TOY_SCRIPT_KWARGS, context_storage=db)
+    check_happy_path(pipeline, happy_path=HAPPY_PATH)
+
+    ctx_id = next(iter(db._main_storage))
+    assert len([k for k in db._aux_storage["requests"][ctx_id].keys() if k >= 0]) <= 4
+
+    # Archived turns are loaded transparently
+    ctx = await Context.connected(db, id=ctx_id)
+    assert len(ctx.requests) == len(HAPPY_PATH)
+    requests = await ctx.requests.get(range(1, len(HAPPY_PATH) + 1))
+    assert requests == tuple(Message(request) for request, _ in HAPPY_PATH)
+
+
+async def test_archived_blobs():
+    retention = RetentionPolicy(ttl=60, archive_turns=2, sweep_interval=None)
+    db = MemoryContextStorage(serialization="json", retention=retention, blob_threshold=16)
+    values = [f"{turn}".encode() * 16 for turn in range(5)]
+    for turn in range(5):
+        ctx_info = ContextMainInfo(current_turn_id=turn, created_at=1, updated_at=time_ns())
+        await db.update_context("1", ctx_info, [("requests", [(turn, values[turn])], list())])
+    await db.update_context("old", ContextMainInfo(updated_at=0), [("requests", [(0, b"old" * 16)], list())])
+    assert -1 in db._aux_storage["requests"]["1"]
+
+    # Blobs referenced by the archived items are kept, blobs of the expired contexts are deleted after the sweep
+    assert await db.sweep_expired() == 1
+    assert db.retention_stats.deleted_blobs == 1
+    assert sorted(db._blob_storage.values()) == values
+    assert await db.load_field_items("1", "requests", list(range(5))) == list(enumerate(values))
+
+
+async def test_adaptive_subscripts():
+    policy = AdaptiveSubscriptPolicy(max_subscript=10, round_trip_bytes=10**6, window=3)
+    db = MemoryContextStorage(partial_read_config={"requests": 1}, subscript_policy=policy)
+    ctx = await Context.connected(db, ("flow", "node"), "ctx")
+    for turn in range(1, 8):
+        ctx.labels[turn] = ("flow", "node")
+        ctx.requests[turn] = str(turn)
+    await ctx.store()
+
+    for _ in range(policy.window):
+        ctx = await Context.connected(db, ("flow", "node"), "ctx")
+        await ctx.requests.get([7, 3])
+        await ctx.store()
+
+    stats = db.subscript_stats["requests"]
+    assert stats.observations == 3
+    assert stats.accessed_items == 6
+    assert stats.extra_loads == 3
+    assert stats.adjustments == 1
+    assert stats.max_offsets == dict()
+    assert db._subscripts["requests"] == 5
+    assert db.subscript_stats["labels"].adjustments == 1
+    assert db._subscripts["labels"] == policy.min_subscript
+
+    ctx = await Context.connected(db, ("flow", "node"), "ctx")
+    assert set(ctx.requests._items.keys()) == {3, 4, 5, 6, 7}
+
+
+async def test_retention_sweeper():
+    db = MemoryContextStorage(retention=RetentionPolicy(ttl=0.01, sweep_interval=0.01, batch_size=1))
+    await db.connect()
+    await db.update_context("1", ContextMainInfo(updated_at=0))
+    await db.update_context("2", ContextMainInfo(updated_at=0))
+
+    await asyncio.sleep(0.1)
+    assert db._main_storage == dict()
+    assert db.retention_stats.deleted_contexts == 2
+    await db.close()
+    assert db._sweeper_task is None
+
+
+@pytest.mark.docker
+@pytest.mark.skipif(not REDIS_ACTIVE, reason="Redis server is not running")
+@pytest.mark.skipif(not redis_available, reason="Redis dependencies missing")
+async def test_redis_expiry():
+    db = context_storage_factory(
+        f"redis://:{os.environ['REDIS_PASSWORD']}@localhost:6379/0",
+        key_prefix="chatsky_expiry",
+        retention=RetentionPolicy(ttl=100, sweep_interval=None),
+    )
+    await db.connect()
+    await db.update_context("1", ContextMainInfo(), [("labels", [(0, b"0")], list())])
+    assert 0 < await db.database.ttl(f"{db._main_key}:1") <= 100
+    assert 0 < await db.database.ttl(f"{db._turns_key}:1:labels") <= 100
+
+    # Expired contexts are selected by their update times, whether redis deleted their keys already or not
+    for ctx_id in ("2", "3", "4"):
+        await db.update_context(ctx_id, ContextMainInfo(updated_at=int(ctx_id)), [("labels", [(0, b"0")], list())])
+    await db.database.delete(*db._get_context_keys("2"))
+    assert await db.delete_expired(4, 10) == ["2", "3"]
+    assert await db.sweep_expired() == 1
+    assert await db.list_context_ids() == ["1"]
+    assert await db.database.zcard(db._updated_key) == 1
+    assert await db.database.exists(*db._get_context_keys("4")) == 0
+    await delete_redis(db)
+
+
+@pytest.mark.docker
+@pytest.mark.skipif(not REDIS_ACTIVE, reason="Redis server is not running")
+@pytest.mark.skipif(not redis_available, reason="Redis dependencies missing")
+async def test_redis_legacy_index():
+    path = f"redis://:{os.environ['REDIS_PASSWORD']}@localhost:6379/0"
+    db = context_storage_factory(path, key_prefix="chatsky_legacy")
+    await db.connect()
+    await db.update_context("1", ContextMainInfo(), [("labels", [(0, b"0"), (1, b"1")], list())])
+
+    # Context written without indexing is indexed upon connection
+    await db.database.delete(db._contexts_key, db._updated_key, f"{db._index_key}:1:labels")
+    await db.database.set(db._indexed_key, 1)
+    await db.database.aclose()
+    db = context_storage_factory(path, key_prefix="chatsky_legacy")
+    await db.connect()
+    assert await db.list_context_ids() == ["1"]
+    assert await db.delete_expired(0, 10) == list()
+    assert await db.database.zscore(db._updated_key, "1") is not None
+    assert await db.load_field_keys("1", "labels") == [0, 1]
+    assert set(await db.load_field_latest("1", "labels")) == {(0, b"0"), (1, b"1")}
+    await delete_redis(db)
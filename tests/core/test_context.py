@@ -1,6 +1,7 @@
 from copy import copy
 import pytest
 
+from chatsky.context_storages import MemoryContextStorage
 from chatsky.core.context import Context
 from chatsky.core.ctx_utils import ContextError
 from chatsky.core.node_label import AbsoluteNodeLabel
@@ -108,6 +109,27 @@ class TestTurns:
             assert Message(text=f"text{i}") == request
             assert Message(text=f"text{i}") == response
 
+    async def test_iter_turns(self):
+        storage = MemoryContextStorage()
+        ctx = await Context.connected(storage, ("flow", "node0"), "ctx")
+        for i in range(1, 6):
+            ctx.labels[i] = ("flow", f"node{i}")
+            ctx.requests[i] = Message(text=f"text{i}")
+            ctx.responses[i] = Message(text=f"text{i}")
+        ctx.current_turn_id = 5
+        await ctx.store()
+
+        ctx = await Context.connected(storage, ("flow", "node0"), "ctx")
+        turns = [turn async for turn in ctx.turns.iter(reverse=True, page_size=2, retain=False)]
+        assert [label.node_name for _, label, _ in turns] == [f"node{i}" for i in range(5, -1, -1)]
+        assert turns[-1][0] is None and turns[-1][2] is None and turns[0][0] == Message(text="text5")
+        assert set(ctx.requests._items.keys()) == {3, 4, 5}
+
+        assert [request async for request, _, _ in ctx.turns.iter(page_size=4)] == [None] + [
+            Message(text=f"text{i}") for i in range(1, 6)
+        ]
+        assert set(ctx.requests._items.keys()) == {1, 2, 3, 4, 5}
+
 
 async def test_copy(context_factory):
     ctx = context_factory()
@@ -151,3 +173,32 @@ async def test_current_node_available():
     ctx.framework_data.current_node = None
     with pytest.raises(ContextError):
         await MyProcessing().call(ctx)
+
+
+async def test_prefetch():
+    storage = MemoryContextStorage(partial_read_config={"labels": 1, "requests": 1, "responses": 1})
+    ctx = await Context.connected(storage, ("flow", "node"), "ctx")
+    for turn in range(1, 6):
+        ctx.labels[turn] = ("flow", "node")
+        ctx.requests[turn] = str(turn)
+        ctx.responses[turn] = str(turn)
+    ctx.current_turn_id = 5
+    await ctx.store()
+
+    ctx = await Context.connected(storage, ("flow", "node"), "ctx")
+    assert set(ctx.requests._items.keys()) == {5}
+
+    loaded = list()
+    original_load = storage.load_field_range
+
+    async def load_field_range(ctx_id, field_name, first, last):
+        loaded.append((field_name, list(range(first, last + 1))))
+        return await original_load(ctx_id, field_name, first, last)
+
+    storage.load_field_range = load_field_range
+    await ctx.prefetch(["requests[-3:]", "requests[-2:]", "labels[:]"])
+    assert sorted(loaded) == [("labels", [0, 1, 2, 3, 4]), ("requests", [3, 4])]
+    assert set(ctx.requests._items.keys()) == {3, 4, 5}
+
+    with pytest.raises(ValueError):
+        await ctx.prefetch(["misc"])
@@ -183,6 +183,18 @@ class TestContextDict:
         prefilled_dict.clear()
         assert set(prefilled_dict.keys()) == set()
 
+    async def test_iter(self, prefilled_dict: ContextDict) -> None:
+        prefilled_dict[3] = Message("text 3")
+        # Missing items are loaded page by page, but not kept if they should not be retained
+        items = [(k, v.text) async for k, v in prefilled_dict.iter(reverse=True, page_size=2, retain=False)]
+        assert items == [(3, "text 3"), (2, "text 2"), (1, "longer text")]
+        assert set(prefilled_dict._items.keys()) == {2, 3}
+        assert [k async for k, _ in prefilled_dict.iter(page_size=1)] == [1, 2, 3]
+        assert set(prefilled_dict._items.keys()) == {1, 2, 3}
+
+        with pytest.raises(ValueError):
+            [_ async for _ in prefilled_dict.iter(page_size=0)]
+
     async def test_eq_validate(self, empty_dict: ContextDict) -> None:
         # Checking empty dict validation
         assert empty_dict == MessageContextDict.model_validate(dict())
@@ -270,3 +282,29 @@ class TestContextDict:
         assert (await ctx_dict[0]).text == "0"
         assert set(ctx_dict._hashes.keys()) == set()
         await self.update_context_dict(rewrite_storage, ctx_dict, "0")
+
+    async def test_rewrite_accessed_only(self, prefilled_dict: ContextDict, monkeypatch) -> None:
+        await prefilled_dict.get(1)
+        # Item that was not handed out is not checked for modifications
+        prefilled_dict._items[2].text = "hidden modification"
+        (await prefilled_dict[1]).text = "modified"
+        prefilled_dict[3] = Message("new")
+
+        dumped = list()
+        original_dump = prefilled_dict._dump
+        monkeypatch.setattr(prefilled_dict, "_dump", lambda value: dumped.append(value) or original_dump(value))
+        _, added_values, _ = prefilled_dict.extract_sync()
+        assert [k for k, _ in added_values] == [1, 3]
+        # Every checked item is serialized exactly once
+        assert len(dumped) == 2
+        assert prefilled_dict._hashes[1] == hash(dict(added_values)[1])
+
+        # Items handed out before synchronization are not checked again, unless they are handed out once more
+        dumped.clear()
+        _, added_values, _ = prefilled_dict.extract_sync()
+        assert added_values == list()
+        assert len(dumped) == 0
+        (await prefilled_dict[1]).text = "modified again"
+        _, added_values, _ = prefilled_dict.extract_sync()
+        assert [k for k, _ in added_values] == [1]
+        assert len(dumped) == 1
@@ -99,3 +99,33 @@ def test_get_inherited_node():
     assert script.global_node == global_node_copy
     assert script.get_flow("flow").local_node == local_node_copy
     assert script.get_node(AbsoluteNodeLabel(flow_name="flow", node_name="node")) == node_copy
+
+
+def test_get_prefetch_hints():
+    class HistoryProcessing(BaseProcessing):
+        async def call(self, ctx: Context) -> None:
+            return
+
+        def get_prefetch_hints(self):
+            return ["requests[-5:]"]
+
+    with pytest.raises(ValueError):
+        Node(prefetch=["requests[1]"])
+
+    script = Script.model_validate(
+        {
+            "global": {"prefetch": ["labels[-2:]"]},
+            "flow": {
+                "node": {"pre_transition": {"": HistoryProcessing()}, "transitions": [Tr(dst="llm_node")]},
+                "llm_node": {"prefetch": ["responses[:]"]},
+                "other_node": {"prefetch": ["requests[-1:]"]},
+            },
+        }
+    )
+
+    assert script.get_prefetch_hints(AbsoluteNodeLabel(flow_name="flow", node_name="node")) == {
+        "labels[-2:]",
+        "requests[-5:]",
+        "responses[:]",
+    }
+    assert script.get_prefetch_hints(AbsoluteNodeLabel(flow_name="flow", node_name="missing")) == set()
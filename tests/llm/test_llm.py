@@ -235,6 +235,13 @@ class TestHistory:
         res = await LLMResponse(llm_model_name="test_model", history=hist)(context)
         assert res == Message(expected, annotations={"__generated_by_model__": "test_model"})
 
+    @pytest.mark.parametrize(
+        "hist,expected",
+        [(0, []), (2, ["requests[-2:]", "responses[-2:]"]), (-1, ["requests[:]", "responses[:]"])],
+    )
+    def test_prefetch_hints(self, hist, expected):
+        assert LLMResponse(llm_model_name="test_model", history=hist).get_prefetch_hints() == expected
+
 
 class TestContextToHistory:
     async def test_context_to_history(self, context):
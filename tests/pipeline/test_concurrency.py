@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from chatsky import Context
+from chatsky.context_storages import ConcurrentModificationError, MemoryContextStorage
+from chatsky.core import Message, RESPONSE, TRANSITIONS, Pipeline, Transition as Tr, OptimisticConcurrencyPolicy
+
+
+async def slow_service(ctx: Context):
+    await asyncio.sleep(0.01)
+
+
+toy_script = {"root": {"start": {RESPONSE: "response", TRANSITIONS: [Tr(dst="start")]}}}
+
+
+@pytest.mark.asyncio
+async def test_optimistic_concurrency():
+    pipeline = Pipeline(
+        script=toy_script,
+        start_label=("root", "start"),
+        context_storage=MemoryContextStorage(serialization=None),
+        pre_services=[slow_service],
+        serialize_turns=False,
+        concurrency_policy=OptimisticConcurrencyPolicy(max_retries=3, backoff=0),
+    )
+
+    await asyncio.gather(*[pipeline._run_pipeline(Message(str(i)), "ctx") for i in range(3)])
+
+    main_info = await pipeline.context_storage.load_main_info("ctx")
+    assert main_info.current_turn_id == 3
+    requests = await pipeline.context_storage.load_field_keys("ctx", "requests")
+    assert sorted(requests) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_optimistic_concurrency_retries_exhausted():
+    pipeline = Pipeline(
+        script=toy_script,
+        start_label=("root", "start"),
+        context_storage=MemoryContextStorage(serialization=None),
+        pre_services=[slow_service],
+        serialize_turns=False,
+        concurrency_policy=OptimisticConcurrencyPolicy(max_retries=0),
+    )
+
+    with pytest.raises(ConcurrentModificationError):
+        await asyncio.gather(*[pipeline._run_pipeline(Message(str(i)), "ctx") for i in range(2)])
+
+
+@pytest.mark.asyncio
+async def test_last_write_wins():
+    pipeline = Pipeline(
+        script=toy_script,
+        start_label=("root", "start"),
+        context_storage=MemoryContextStorage(serialization=None),
+        pre_services=[slow_service],
+        serialize_turns=False,
+    )
+
+    await asyncio.gather(*[pipeline._run_pipeline(Message(str(i)), "ctx") for i in range(2)])
+
+    main_info = await pipeline.context_storage.load_main_info("ctx")
+    assert main_info.current_turn_id == 1
+
+
+@pytest.mark.asyncio
+async def test_serialized_turns():
+    pipeline = Pipeline(
+        script=toy_script,
+        start_label=("root", "start"),
+        context_storage=MemoryContextStorage(serialization=None),
+        pre_services=[slow_service],
+    )
+
+    await asyncio.gather(*[pipeline._run_pipeline(Message(str(i)), "ctx") for i in range(3)])
+
+    main_info = await pipeline.context_storage.load_main_info("ctx")
+    assert main_info.current_turn_id == 3
+    stats = pipeline.context_locks.get_stats()
+    assert (stats.locks, stats.acquisitions, stats.contentions) == (0, 3, 2)
+    assert stats.max_wait > 0 and stats.total_wait >= stats.max_wait
+
+    await asyncio.gather(*[pipeline._run_pipeline(Message(str(i)), str(i)) for i in range(3)])
+
+    stats = pipeline.context_locks.get_stats()
+    assert (stats.locks, stats.acquisitions, stats.contentions) == (0, 6, 2)
@@ -225,6 +225,16 @@ def test_average_results():
     bm.BenchmarkCase.set_average_results(benchmark)
 
 
+def test_compare_serialization_formats():
+    results = bm.compare_serialization_formats(formats=("json", "pickle"), repeats=2)
+
+    assert list(results.keys()) == ["json", "pickle"]
+    for format_results in results.values():
+        assert list(format_results.keys()) == ["message", "label", "misc"]
+        for result in format_results.values():
+            assert result["size"] > 0 and result["encode"] > 0 and result["decode"] > 0
+
+
 def test_benchmark_case(tmp_path: Path):
     case = bm.BenchmarkCase(
         name="",
@@ -0,0 +1,49 @@
+import pytest
+
+from chatsky.utils.compression import CompressionCodec, decompress, lz4_available, zstd_available
+
+DATA = b'{"text": "' + b"long response " * 100 + b'"}'
+
+
+@pytest.mark.parametrize(
+    "algorithm",
+    [
+        "zlib",
+        "lzma",
+        pytest.param("zstd", marks=pytest.mark.skipif(not zstd_available, reason="zstandard missing")),
+        pytest.param("lz4", marks=pytest.mark.skipif(not lz4_available, reason="lz4 missing")),
+    ],
+)
+def test_compression_round_trip(algorithm):
+    codec = CompressionCodec(algorithm)
+    compressed = codec.compress(DATA)
+    assert len(compressed) < len(DATA)
+    assert compressed[0] not in DATA[:1]
+    assert decompress(compressed) == DATA
+
+
+def test_uncompressed_data():
+    codec = CompressionCodec("zlib", min_size=len(DATA) + 1)
+    assert codec.compress(DATA) == DATA
+    assert CompressionCodec("zlib", min_size=0).compress(b"{}") == b"{}"
+    assert decompress(DATA) == DATA
+    assert decompress(b"") == b""
+
+
+@pytest.mark.skipif(not zstd_available, reason="zstandard missing")
+def test_zstd_dictionary():
+    import zstandard
+
+    samples = [b'{"text": "response number %d", "misc": {"key": "value"}}' % i for i in range(1000)]
+    dictionary = zstandard.train_dictionary(1024, samples).as_bytes()
+    codec = CompressionCodec("zstd", min_size=0, zstd_dictionary=dictionary)
+    plain = CompressionCodec("zstd", min_size=0)
+    assert len(codec.compress(samples[0])) < len(plain.compress(samples[0] * 2))
+    assert decompress(codec.compress(samples[0])) == samples[0]
+
+
+def test_wrong_codec():
+    with pytest.raises(ValueError):
+        CompressionCodec("unknown")
+    with pytest.raises(ValueError):
+        CompressionCodec("zlib", zstd_dictionary=b"dictionary")
@@ -0,0 +1,33 @@
+import pytest
+
+from chatsky.utils.key_ranges import KeyRanges
+
+
+def test_ranges_merge_and_split():
+    keys = KeyRanges([5, 1, 2, 3])
+    assert keys.ranges == [(1, 3), (5, 5)]
+    assert len(keys) == 4 and list(keys) == [1, 2, 3, 5] and list(reversed(keys)) == [5, 3, 2, 1]
+
+    keys.add(4)
+    assert keys.ranges == [(1, 5)]
+    keys.discard(3)
+    keys.discard(7)
+    assert keys.ranges == [(1, 2), (4, 5)] and len(keys) == 4
+    assert 3 not in keys and 4 in keys and "4" not in keys
+
+    assert keys == {1, 2, 4, 5} and keys == KeyRanges.from_ranges([(4, 5), (1, 2)])
+    assert keys.copy() == keys and keys.copy() is not keys
+
+
+def test_ranges_queries():
+    keys = KeyRanges.from_ranges([(0, 9), (5, 14), (20, 21)])
+    assert keys.ranges == [(0, 14), (20, 21)] and len(keys) == 17
+    assert list(keys.between(13, 20)) == [13, 14, 20]
+    assert list(keys.between(last=2)) == [0, 1, 2]
+    assert keys.last(3) == [14, 20, 21] and keys.last(0) == [] and keys.last(100) == list(keys)
+    assert keys.index(20) == 15
+
+    with pytest.raises(ValueError):
+        keys.index(17)
+    with pytest.raises(ValueError):
+        KeyRanges.from_ranges([(2, 1)])
@@ -1,10 +1,13 @@
 from typing import Optional, Dict, Any
 
 import pytest
-from pydantic import BaseModel, field_serializer, field_validator
+from pydantic import BaseModel, TypeAdapter, field_serializer, field_validator
 from copy import deepcopy
 
 import chatsky.utils.devel.json_serialization as json_ser
+from chatsky.core import AbsoluteNodeLabel, Message
+from chatsky.core.ctx_utils import ContextMainInfo, FrameworkData
+from chatsky.utils.serialization import Serializer, loads, loads_python, msgpack_available
 
 
 class UnserializableClass:
@@ -158,3 +161,46 @@ class TestJSONPickleSerialization:
         reconstructed_obj = Class.model_validate(dump)
 
         assert reconstructed_obj.__pydantic_extra__ == deserialized_dict
+
+
+class TestBinarySerialization:
+    @pytest.fixture(scope="function")
+    def message(self):
+        return Message(text="text", misc={"key": ["value", 1]}, unserializable=UnserializableClass())
+
+    @pytest.mark.parametrize(
+        "format",
+        [
+            "json",
+            "pickle",
+            pytest.param("msgpack", marks=pytest.mark.skipif(not msgpack_available, reason="Msgpack is missing")),
+        ],
+    )
+    def test_round_trip(self, format: str, message: Message):
+        serializer = Serializer(format)
+        for adapter, value in [
+            (TypeAdapter(Message), message),
+            (TypeAdapter(AbsoluteNodeLabel), AbsoluteNodeLabel(flow_name="flow", node_name="node")),
+        ]:
+            data = serializer.dumps(adapter, value)
+            assert loads(adapter, data) == value
+            assert serializer.loads(adapter, data) == value
+        assert loads_python(serializer.dumps_model(FrameworkData())) == FrameworkData().model_dump(mode="json")
+
+    def test_pickle_extras(self, message: Message):
+        adapter = TypeAdapter(Message)
+        json_data = Serializer("json").dumps(adapter, message)
+        pickle_data = Serializer("pickle").dumps(adapter, message)
+        assert pickle_data.startswith(b"\x11")
+        assert len(pickle_data) < len(json_data)
+
+    def test_main_info(self):
+        ctx_info = ContextMainInfo(misc={"key": "value"})
+        ctx_info._serializer = Serializer("pickle")
+        dump = ctx_info.model_dump()
+        assert dump["misc"].startswith(b"\x11")
+        assert ContextMainInfo.model_validate(dump) == ctx_info
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            Serializer("xml")